@@ -3,6 +3,7 @@ from google.oauth2 import service_account
 from typing import Optional, List
 import os
 from dotenv import load_dotenv
+from app.schemas.restaurant import LIST_FIELDS, SEARCH_FIELDS, parse_fields
 
 # Load environment variables
 load_dotenv(dotenv_path=".fork_env")
@@ -31,6 +32,11 @@ except Exception as e:
     raise ValueError(f"Failed to load Google Cloud credentials: {e}")
 
 
+def _select_columns(fields: Optional[List[str]], default: List[str]) -> str:
+    """SELECT list for `fields`; every name is checked against RESTAURANT_COLUMNS (ValueError otherwise)"""
+    return ", ".join(parse_fields(",".join(fields) if fields else None, default))
+
+
 def query_restaurants(
     skip: int = 0,
     limit: int = 100,
@@ -40,13 +46,15 @@ def query_restaurants(
     badge: Optional[str] = None,
     reputation_label: Optional[str] = None,
     cluster: Optional[int] = None,
-    order_by: Optional[str] = "Recalculated_Score DESC"
+    order_by: Optional[str] = "Recalculated_Score DESC",
+    fields: Optional[List[str]] = None
 ) -> List[dict]:
     """
     Query restaurants with available filters and sorting.
+    Only `fields` (column names from RESTAURANT_COLUMNS, LIST_FIELDS by default) are read and returned.
     """
     query = f"""
-    SELECT *
+    SELECT {_select_columns(fields, LIST_FIELDS)}
     FROM `{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}`
     WHERE TRUE
     """
@@ -70,12 +78,13 @@ def query_restaurants(
     return [dict(row) for row in rows]
 
 
-def search_restaurants(query_text: str, limit: int = 50) -> List[dict]:
+def search_restaurants(query_text: str, limit: int = 50, fields: Optional[List[str]] = None) -> List[dict]:
     """
     Fuzzy search across searchable fields.
+    Only `fields` (column names from RESTAURANT_COLUMNS, SEARCH_FIELDS by default) are read and returned.
     """
     query = f"""
-    SELECT *
+    SELECT {_select_columns(fields, SEARCH_FIELDS)}
     FROM `{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}`
     WHERE
         LOWER(Name) LIKE '%{query_text.lower()}%' OR
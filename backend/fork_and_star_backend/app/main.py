@@ -1,31 +1,70 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from app.routers import restaurants, recommendation
+from fastapi.responses import JSONResponse
+from app.routers import admin, restaurants, recommendation
+from app.middleware import install_middleware
+from app.services.metrics import TimedJSONResponse, metrics_response
+from app.services.profiler import ProfiledRoute
+from app.services.timing import request_logger
+
+# One JSON line per request (method, route, status, total and per-stage durations)
+_request_log_handler = logging.StreamHandler()
+_request_log_handler.setFormatter(logging.Formatter("%(message)s"))
+request_logger.addHandler(_request_log_handler)
+request_logger.setLevel(logging.INFO)
+request_logger.propagate = False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background BigQuery check + snapshot warm-up; probes read its last result
+    recommendation.readiness.start()
+    yield
+    recommendation.readiness.stop()
+
 
 app = FastAPI(
     title="Fork & Star API",
     description="Backend for Fork & Star — premium restaurant recommendation system",
     version="1.0.0",
+    default_response_class=TimedJSONResponse,
+    lifespan=lifespan,
 )
+# Sync endpoints record their thread so the profiler samples only the request being profiled
+app.router.route_class = ProfiledRoute
 
-# CORS
+# Middleware stack (CORS origins for the frontend)
 origins = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
 ]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+install_middleware(app, recommendation.catalog, origins)
 
 # Routers
 app.include_router(restaurants.router)
 app.include_router(recommendation.router)
+app.include_router(admin.router)
 
 # Root route
 @app.get("/")
 def root():
-    return {"message": "🚀 Fork & Star backend running"}
\ No newline at end of file
+    return {"message": "🚀 Fork & Star backend running"}
+
+# Liveness: the process is serving requests (no I/O)
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+# Readiness: last background BigQuery check succeeded and the catalog snapshot is loaded
+@app.get("/ready")
+def ready():
+    status = recommendation.readiness.status()
+    # Informational: an open circuit is covered by stale results, so it does not fail readiness
+    status["bigquery_circuit"] = recommendation.client.breaker.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
@@ -0,0 +1,38 @@
+from typing import List
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from app.services.conditional import ConditionalGetMiddleware
+from app.services.metrics import MetricsMiddleware
+from app.services.profiler import ProfilerMiddleware
+from app.services.request_context import RequestContextMiddleware
+from app.services.response_cache import ResponseCacheMiddleware
+from app.services.snapshot import DataVersionMiddleware, SnapshotStore
+from app.services.timing import ServerTimingMiddleware
+
+
+def install_middleware(app: FastAPI, store: SnapshotStore, origins: List[str]):
+    """Add the middleware stack in order; the first one added is the innermost"""
+    # Encoded-bytes cache (identity/gzip/brotli) for hot read-only routes, keyed by data version
+    app.add_middleware(ResponseCacheMiddleware, store=store)
+    # ETag / Cache-Control / 304 for the routes in CACHE_CONTROL (inside RequestContext, so the route is known)
+    app.add_middleware(ConditionalGetMiddleware, store=store)
+    # Records the matched route for per-endpoint query budgets and marks responses built from stale results
+    app.add_middleware(RequestContextMiddleware)
+    # Pins each request to one catalog snapshot and reports it as X-Data-Version
+    app.add_middleware(DataVersionMiddleware, store=store)
+    # Per-stage span timings: Server-Timing header, request log line, slow-request buffer
+    app.add_middleware(ServerTimingMiddleware)
+    # Admin-only sampling profiler (X-Profile: 1 or ?_profile=1 with X-Admin-Token)
+    app.add_middleware(ProfilerMiddleware)
+    # Request latency per route template (covers everything but CORS)
+    app.add_middleware(MetricsMiddleware)
+    # CORS outermost: 304s and cached hits are answered inside it and still get the headers for
+    # the caller's Origin, and no per-origin header ever reaches the response cache
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Server-Timing", "X-Data-Version", "ETag", "X-Data-Stale", "X-Stale-Age-Seconds"],
+    )
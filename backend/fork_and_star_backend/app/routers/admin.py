@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from app.services.admin_auth import admin_enabled, admin_token_valid
+from app.services.profiler import ProfiledRoute
+from app.services.query_stats import STATS_SORTS, query_stats
+from app.services.timing import slow_requests
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    """Admin endpoints need X-Admin-Token to match ADMIN_TOKEN; without ADMIN_TOKEN they are disabled"""
+    if not admin_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not admin_token_valid(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)], route_class=ProfiledRoute)
+
+
+# 1. Recent slow requests with their per-stage timings
+@router.get("/slow-requests")
+def get_slow_requests(limit: int = Query(50, ge=1, le=1000)):
+    """Newest slow requests from the ring buffer"""
+    return {
+        "threshold_ms": slow_requests.threshold_ms,
+        "capacity": slow_requests.capacity,
+        "requests": slow_requests.recent(limit),
+    }
+
+
+# 2. Empty the slow-request buffer
+@router.delete("/slow-requests")
+def clear_slow_requests():
+    slow_requests.clear()
+    return {"cleared": True}
+
+
+# 3. BigQuery statistics per query fingerprint (literals and parameters stripped)
+@router.get("/queries")
+def get_query_stats(sort: str = "total_time", limit: int = Query(50, ge=1, le=500)):
+    """Query shapes ranked by total time, count, p95 latency or bytes"""
+    if sort not in STATS_SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort. Choose from: {list(STATS_SORTS.keys())}")
+    return {"sort": sort, "fingerprints": query_stats.summary(sort, limit)}
+
+
+# 4. Recent slow queries with their parameters
+@router.get("/slow-queries")
+def get_slow_queries(limit: int = Query(50, ge=1, le=1000)):
+    return {
+        "threshold_ms": query_stats.slow_ms,
+        "capacity": query_stats.capacity,
+        "queries": query_stats.slow_queries(limit),
+    }
+
+
+# 5. Reset query statistics and the slow-query log
+@router.delete("/queries")
+def reset_query_stats():
+    query_stats.reset()
+    return {"cleared": True}
@@ -1,11 +1,33 @@
 import os
 import time
-from fastapi import APIRouter, HTTPException
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query, Response
 from google.cloud import bigquery
 from google.oauth2 import service_account
 from dotenv import load_dotenv
 from typing import List, Dict, Any
 from pathlib import Path
+from app.services.similarity import SIMILARITY_WEIGHTS, pairwise_similarity, pairwise_difference, matrix_to_list
+from app.services.snapshot import SnapshotStore
+from app.services.snapshot_disk import snapshot_disk_from_env
+from app.services.readiness import ReadinessProbe
+from app.services.query_guard import GuardedClient
+from app.services.timing import span
+from app.services.metrics import TimedJSONResponse
+from app.services.profiler import ProfiledRoute
+from app.schemas.restaurant import (
+    ClusterMapSummary, DataFreshness, DiscoveryMapResponse, FilteredRestaurant, FilterResponse, HeatmapCell, MapPoint,
+)
+from app.services.cluster_profiles import ClusterProfiles, build_cluster_profiles, build_map_cluster_profiles
+from app.services.rollups import SORT_COLUMNS, build_rollups
+from app.services.leaderboards import METRIC_COLUMNS, build_leaderboards
+from app.services.sampler import build_sampler
+from app.services import market_gaps
+from app.services.rising_stars import build_rising_star_features
+from app.services.sustainability import SustainabilityReport, build_sustainability_baseline
+from app.services.green_recommendations import GreenCandidates, find_base_restaurant
+from app.services.histograms import build_histogram, build_score_distribution
+from app.services.quantiles import QUANTILE_FIELDS, build_quantile_sketches
 
 load_dotenv('.fork_env')
 
@@ -59,7 +81,39 @@ try:
 except Exception as e:
     raise ValueError(f"Failed to load Google Cloud credentials: {e}")
 
-router = APIRouter(prefix="/recommendations", tags=["recommendations"])
+# Every query goes through the per-endpoint byte/latency budgets (QUERY_BUDGETS)
+client = GuardedClient(client)
+
+router = APIRouter(prefix="/recommendations", tags=["recommendations"], route_class=ProfiledRoute)
+
+# In-memory catalog (one row per Base_ID) shared by endpoints that aggregate locally;
+# quantile sketches are built as part of each load. With SNAPSHOT_DIR set, the columns
+# are memory-mapped from disk and shared by every worker process.
+catalog = SnapshotStore(
+    client,
+    FULL_TABLE_NAME,
+    prewarm={"quantile_sketches": build_quantile_sketches},
+    disk=snapshot_disk_from_env(),
+)
+
+# Periodic BigQuery check and snapshot warm-up behind /ready (started with the app)
+readiness = ReadinessProbe(client, FULL_TABLE_NAME, catalog)
+
+def _cluster_profiles():
+    """Shared cluster-profile store, rebuilt once per data version"""
+    return catalog.get().derived("cluster_profiles", build_cluster_profiles)
+
+def _map_cluster_profiles():
+    """Cluster profiles over the restaurants placed on discovery maps, rebuilt once per data version"""
+    return catalog.get().derived("map_cluster_profiles", build_map_cluster_profiles)
+
+def _rollups():
+    """Per-country and per-cuisine rollups, rebuilt once per data version"""
+    return catalog.get().derived("rollups", build_rollups)
+
+def _leaderboards():
+    """Per-metric leaderboards, updated incrementally on each data version"""
+    return catalog.get().derived("leaderboards", build_leaderboards)
 
 # DEBUG ENDPOINTS - Add these first to understand your data
 @router.get("/debug/sample-data")
@@ -83,6 +137,8 @@ def get_sample_data():
         """
         results = list(client.query(query).result())
         return [dict(row) for row in results]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -101,6 +157,8 @@ def check_momentum_data():
         """
         result = list(client.query(query).result())[0]
         return dict(result)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -162,6 +220,8 @@ def get_filters():
             "badges": badges,
             "clusters": clusters
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -210,6 +270,8 @@ def get_explanation(restaurant_name: str):
             "restaurant_name": restaurant_name,
             "explanation": row[0]["Explainability_Text"]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -243,6 +305,8 @@ def get_restaurants_in_cluster(cluster_id: int, limit: int = 10):
         if not rows:
             raise HTTPException(status_code=404, detail="No cluster matches found.")
         return [dict(row) for row in rows]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -271,6 +335,8 @@ def similarity_matrix(restaurant_name: str):
         if not rows:
             raise HTTPException(status_code=404, detail="No similarity data found.")
         return [dict(row) for row in rows]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -301,6 +367,8 @@ def get_restaurant_by_id(id: int):
         if not rows:
             raise HTTPException(status_code=404, detail="Restaurant not found.")
         return dict(rows[0])
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -334,11 +402,13 @@ def get_diverse_recommendations(restaurant_name: str, limit: int = 10):
         if not rows:
             raise HTTPException(status_code=404, detail="No recommendations found.")
         return [dict(row) for row in rows]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # 9. FIXED - Multi-Filter Search
-@router.get("/filter")
+@router.get("/filter", response_model=FilterResponse)
 def filter_restaurants(
     cuisine: str = None,
     country: str = None,
@@ -400,13 +470,13 @@ def filter_restaurants(
         total_count = list(client.query(count_query, job_config=count_job_config).result())[0]["total_count"]
         
         if total_count == 0:
-            return {
-                "restaurants": [],
-                "page": page,
-                "limit": limit,
-                "total_results": 0,
-                "message": "No restaurants match the specified filters"
-            }
+            return TimedJSONResponse(FilterResponse.model_construct(
+                restaurants=[],
+                page=page,
+                limit=limit,
+                total_results=0,
+                message="No restaurants match the specified filters"
+            ))
         
         query = f"""
             SELECT DISTINCT
@@ -430,12 +500,16 @@ def filter_restaurants(
         job_config = bigquery.QueryJobConfig(query_parameters=params)
         results = list(client.query(query, job_config=job_config).result())
         
-        return {
-            "restaurants": [dict(row) for row in results],
-            "page": page,
-            "limit": limit,
-            "total_results": total_count,
-            "filters_applied": {
+        # Rows are already typed by BigQuery: construct without re-validating each field and
+        # return the response directly so FastAPI skips jsonable_encoder
+        with span("rows"):
+            restaurants = [FilteredRestaurant.model_construct(**row) for row in results]
+        return TimedJSONResponse(FilterResponse.model_construct(
+            restaurants=restaurants,
+            page=page,
+            limit=limit,
+            total_results=total_count,
+            filters_applied={
                 "cuisine": cuisine,
                 "country": country,
                 "reputation": reputation,
@@ -445,7 +519,9 @@ def filter_restaurants(
                 "cluster": cluster,
                 "score_color": score_color
             }
-        }
+        ))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -468,104 +544,153 @@ def get_analytics_overview():
         """
         result = list(client.query(query).result())[0]
         return dict(result)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # 11. Get top restaurants by various metrics
+TOP_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "cuisine": "cuisine",
+    "country": "country",
+    "stars": "stars",
+    "score": "score",
+    "momentum": "momentum",
+    "green_score": "green",
+    "reputation": "reputation",
+    "badges": "badges"
+}
+
 @router.get("/top/{metric}")
-def get_top_restaurants(metric: str, limit: int = 10):
-    """Get top restaurants by specified metric (stars, score, momentum)"""
+def get_top_restaurants(
+    metric: str,
+    limit: int = 10,
+    country: str = None,
+    cuisine: str = None,
+    cluster: int = None
+):
+    """Get top restaurants by specified metric (stars, score, momentum, green), optionally within a country, cuisine or cluster"""
     try:
-        valid_metrics = {
-            "stars": "Base_Star_Rating",
-            "score": "Base_Recalculated_Score", 
-            "momentum": "Base_Momentum_Score_Num"
-        }
+        if metric not in METRIC_COLUMNS:
+            raise HTTPException(status_code=400, detail=f"Invalid metric. Choose from: {list(METRIC_COLUMNS.keys())}")
         
-        if metric not in valid_metrics:
-            raise HTTPException(status_code=400, detail=f"Invalid metric. Choose from: {list(valid_metrics.keys())}")
+        partitions = {"country": country, "cuisine": cuisine, "cluster": cluster}
+        selected = {dimension: key for dimension, key in partitions.items() if key is not None}
+        if len(selected) > 1:
+            raise HTTPException(status_code=400, detail="Filter by at most one of country, cuisine or cluster")
+        dimension, key = next(iter(selected.items()), ("all", "all"))
         
-        order_column = valid_metrics[metric]
-        
-        query = f"""
-            SELECT DISTINCT
-                Base_ID as id,
-                Base_Name as name,
-                Base_Cuisine as cuisine,
-                Base_Country as country,
-                Base_Star_Rating as stars,
-                Base_Recalculated_Score as score,
-                Base_Momentum_Score_Num as momentum,
-                Base_Reputation_Label as reputation,
-                Base_Badge_List as badges
-            FROM `{FULL_TABLE_NAME}`
-            WHERE {order_column} IS NOT NULL
-            ORDER BY {order_column} DESC
-            LIMIT @limit
-        """
-        
-        job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("limit", "INT64", limit)
-        ])
-        results = list(client.query(query, job_config=job_config).result())
+        # Leaderboards are kept sorted per data version, so this is an O(limit) slice
+        snapshot = catalog.get()
+        ids = _leaderboards().top_ids(metric, dimension, key, limit)
         
         return {
             "metric": metric,
-            "restaurants": [dict(row) for row in results]
+            "partition": None if dimension == "all" else {dimension: key},
+            "restaurants": snapshot.records([snapshot.row_by_id[int(rid)] for rid in ids], TOP_FIELDS)
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 12. Compare up to MAX_COMPARE_IDS restaurants with a pairwise similarity breakdown
+MAX_COMPARE_IDS = 20
+
+def _fetch_restaurants_by_ids(ids: List[int]) -> Dict[int, dict]:
+    """Fetch one row per Base_ID for all requested IDs in a single query"""
+    query = f"""
+        SELECT
+            Base_ID as id,
+            ANY_VALUE(Base_Name) as name,
+            ANY_VALUE(Base_Cuisine) as cuisine,
+            ANY_VALUE(Base_Country) as country,
+            ANY_VALUE(Base_Star_Rating) as stars,
+            ANY_VALUE(Base_Recalculated_Score) as score,
+            ANY_VALUE(Base_Momentum_Score_Num) as momentum,
+            ANY_VALUE(Base_Reputation_Label) as reputation,
+            ANY_VALUE(Base_Badge_List) as badges,
+            ANY_VALUE(Base_Cluster) as cluster,
+            ANY_VALUE(Base_Score_Color) as score_color,
+            AVG(green_focus_score) as green_score
+        FROM `{FULL_TABLE_NAME}`
+        WHERE Base_ID IN UNNEST(@ids)
+        GROUP BY Base_ID
+    """
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ArrayQueryParameter("ids", "INT64", ids)
+    ])
+    return {row["id"]: dict(row) for row in client.query(query, job_config=job_config).result()}
+
+@router.get("/compare")
+def compare_many_restaurants(ids: List[int] = Query(..., description=f"2 to {MAX_COMPARE_IDS} restaurant IDs")):
+    """Compare several restaurants with a region/cuisine/green/reputation similarity matrix"""
+    try:
+        # Keep the caller's order but drop repeated IDs
+        unique_ids = list(dict.fromkeys(ids))
+        if len(unique_ids) < 2:
+            raise HTTPException(status_code=400, detail="Provide at least 2 distinct restaurant IDs")
+        if len(unique_ids) > MAX_COMPARE_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_COMPARE_IDS} restaurant IDs can be compared")
+        
+        found = _fetch_restaurants_by_ids(unique_ids)
+        missing = [rid for rid in unique_ids if rid not in found]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Restaurants not found: {missing}")
+        
+        restaurants = [found[rid] for rid in unique_ids]
+        components = pairwise_similarity(restaurants)
+        
+        # Flatten the upper triangle into ranked pairs for list views
+        rows, cols = np.triu_indices(len(restaurants), k=1)
+        order = np.argsort(-components["overall"][rows, cols], kind="stable")
+        pairs = [
+            {
+                "id_a": unique_ids[rows[k]],
+                "id_b": unique_ids[cols[k]],
+                **{
+                    f"{name}_score": None if np.isnan(components[name][rows[k], cols[k]]) else round(float(components[name][rows[k], cols[k]]), 3)
+                    for name in SIMILARITY_WEIGHTS
+                },
+                "similarity_score": round(float(components["overall"][rows[k], cols[k]]), 3)
+            }
+            for k in order
+        ]
+        
+        return {
+            "ids": unique_ids,
+            "restaurants": restaurants,
+            "similarity_matrix": {
+                "components": list(SIMILARITY_WEIGHTS.keys()),
+                "weights": SIMILARITY_WEIGHTS,
+                **{name: matrix_to_list(matrix) for name, matrix in components.items()}
+            },
+            "pairs": pairs,
+            "comparison": {
+                "star_difference": matrix_to_list(pairwise_difference(restaurants, "stars"), digits=2),
+                "score_difference": matrix_to_list(pairwise_difference(restaurants, "score"), digits=2)
+            }
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# 12. FIXED - Compare two restaurants directly
 @router.get("/compare/{restaurant1_id}/{restaurant2_id}")
 def compare_restaurants(restaurant1_id: int, restaurant2_id: int):
-    """Compare two restaurants side by side - FIXED VERSION"""
+    """Compare two restaurants side by side"""
     try:
-        # First check if the IDs exist
-        check_query = f"""
-            SELECT Base_ID
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_ID IN (@id1, @id2)
-            GROUP BY Base_ID
-        """
-        
-        check_job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("id1", "INT64", restaurant1_id),
-            bigquery.ScalarQueryParameter("id2", "INT64", restaurant2_id)
-        ])
-        existing_ids = [row["Base_ID"] for row in client.query(check_query, job_config=check_job_config).result()]
+        found = _fetch_restaurants_by_ids([restaurant1_id, restaurant2_id])
         
-        if restaurant1_id not in existing_ids:
+        if restaurant1_id not in found:
             raise HTTPException(status_code=404, detail=f"Restaurant with ID {restaurant1_id} not found")
-        if restaurant2_id not in existing_ids:
+        if restaurant2_id not in found:
             raise HTTPException(status_code=404, detail=f"Restaurant with ID {restaurant2_id} not found")
         
-        query = f"""
-            SELECT DISTINCT
-                Base_ID as id,
-                Base_Name as name,
-                Base_Cuisine as cuisine,
-                Base_Country as country,
-                Base_Star_Rating as stars,
-                Base_Recalculated_Score as score,
-                Base_Momentum_Score_Num as momentum,
-                Base_Reputation_Label as reputation,
-                Base_Badge_List as badges,
-                Base_Cluster as cluster,
-                Base_Score_Color as score_color
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_ID IN (@id1, @id2)
-            ORDER BY Base_ID
-        """
-        
-        job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("id1", "INT64", restaurant1_id),
-            bigquery.ScalarQueryParameter("id2", "INT64", restaurant2_id)
-        ])
-        results = list(client.query(query, job_config=job_config).result())
-        
-        restaurant1 = next((dict(r) for r in results if r["id"] == restaurant1_id), None)
-        restaurant2 = next((dict(r) for r in results if r["id"] == restaurant2_id), None)
+        restaurant1 = found[restaurant1_id]
+        restaurant2 = found[restaurant2_id]
         
         return {
             "restaurant1": restaurant1,
@@ -610,31 +735,37 @@ def get_nearby_restaurants(umap1: float, umap2: float, radius: float = 0.5, limi
         results = list(client.query(query, job_config=job_config).result())
         
         return [dict(row) for row in results]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # 14. Get cluster analysis and explainability
 @router.get("/clusters/analysis")
-def get_cluster_analysis():
+def get_cluster_analysis(response: Response):
     """Get analysis of all clusters with their characteristics"""
     try:
-        query = f"""
-            SELECT
-                Base_Cluster as cluster_id,
-                Base_Cluster_Explainability_Label as cluster_description,
-                COUNT(DISTINCT Base_ID) as restaurant_count,
-                AVG(Base_Star_Rating) as avg_stars,
-                AVG(Base_Recalculated_Score) as avg_score,
-                STRING_AGG(DISTINCT Base_Cuisine ORDER BY Base_Cuisine LIMIT 5) as top_cuisines,
-                STRING_AGG(DISTINCT Base_Country ORDER BY Base_Country LIMIT 5) as top_countries
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_Cluster IS NOT NULL
-            GROUP BY Base_Cluster, Base_Cluster_Explainability_Label
-            ORDER BY restaurant_count DESC
-        """
-        
-        results = list(client.query(query).result())
-        return [dict(row) for row in results]
+        profiles = _cluster_profiles()
+        freshness = profiles.metadata()
+        response.headers["X-Data-Version"] = str(freshness["data_version"])
+        response.headers["X-Data-Built-At"] = freshness["built_at"]
+        response.headers["X-Data-Age-Seconds"] = str(freshness["age_seconds"])
+        
+        analysis = []
+        for cluster_id in profiles.by_size():
+            profile = profiles.profile(cluster_id)
+            analysis.append({
+                "cluster_id": cluster_id,
+                "cluster_description": profile["cluster_description"],
+                "restaurant_count": profile["restaurant_count"],
+                "avg_stars": profile["avg_stars"],
+                "avg_score": profile["avg_score"],
+                "top_cuisines": profile["top_cuisines"],
+                "top_countries": profile["top_countries"]
+            })
+        return analysis
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -674,119 +805,90 @@ def get_recommendation_quality(restaurant_name: str):
             "base_restaurant": restaurant_name,
             "recommendations": [dict(row) for row in results]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # 16. Random restaurant discovery
+DISCOVER_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "cuisine": "cuisine",
+    "country": "country",
+    "stars": "stars",
+    "score_color": "score_color",
+    "badges": "badges",
+    "reputation": "reputation"
+}
+
 @router.get("/discover/random")
 def discover_random_restaurants(
     count: int = 5,
     min_stars: float = None,
     cuisine: str = None,
-    country: str = None
+    country: str = None,
+    seed: int = Query(None, ge=0),
+    weighted: bool = False
 ):
-    """Discover random restaurants with optional filters"""
+    """Discover random restaurants with optional filters; pass seed for reproducible pages and weighted=true to favour higher scores"""
     try:
-        conditions = ["1=1"]
-        params = [bigquery.ScalarQueryParameter("count", "INT64", count)]
-        
-        if min_stars:
-            conditions.append("Base_Star_Rating >= @min_stars")
-            params.append(bigquery.ScalarQueryParameter("min_stars", "FLOAT64", min_stars))
-        if cuisine:
-            conditions.append("Base_Cuisine = @cuisine")
-            params.append(bigquery.ScalarQueryParameter("cuisine", "STRING", cuisine))
-        if country:
-            conditions.append("Base_Country = @country")
-            params.append(bigquery.ScalarQueryParameter("country", "STRING", country))
-        
-        where_clause = " AND ".join(conditions)
-        
-        query = f"""
-            SELECT DISTINCT
-                Base_ID as id,
-                Base_Name as name,
-                Base_Cuisine as cuisine,
-                Base_Country as country,
-                Base_Star_Rating as stars,
-                Base_Score_Color as score_color,
-                Base_Badge_List as badges,
-                Base_Reputation_Label as reputation
-            FROM `{FULL_TABLE_NAME}`
-            WHERE {where_clause}
-            ORDER BY RAND()
-            LIMIT @count
-        """
-        
-        job_config = bigquery.QueryJobConfig(query_parameters=params)
-        results = list(client.query(query, job_config=job_config).result())
-        
-        return [dict(row) for row in results]
+        # Sample distinct restaurants from in-memory filter indexes instead of ORDER BY RAND()
+        snapshot = catalog.get()
+        sampler = snapshot.derived("discovery_sampler", build_sampler)
+        rows = sampler.sample(
+            count,
+            cuisine=cuisine,
+            country=country,
+            min_stars=min_stars if min_stars else None,
+            seed=seed,
+            weight_by_score=weighted
+        )
+        return snapshot.records(rows.tolist(), DISCOVER_FIELDS)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# 17. FIXED - Trending restaurants (high momentum)
+# 17. Trending restaurants (high momentum)
+TRENDING_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "cuisine": "cuisine",
+    "country": "country",
+    "stars": "stars",
+    "badges": "badges",
+    "reputation": "reputation"
+}
+
 @router.get("/trending")
 def get_trending_restaurants(limit: int = 10):
-    """Get restaurants with highest momentum scores - FIXED VERSION"""
+    """Get restaurants with highest momentum scores"""
     try:
-        # First check if momentum data exists
-        check_query = f"""
-            SELECT COUNT(*) as count
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_Momentum_Score_Num IS NOT NULL AND Base_Momentum_Score_Num > 0
-        """
-        
-        count_result = list(client.query(check_query).result())[0]
+        snapshot = catalog.get()
+        boards = _leaderboards()
         
-        if count_result["count"] == 0:
+        # Whether momentum data exists is decided once per data version
+        if boards.has_positive_momentum:
+            ids = boards.positive_top_ids("momentum", limit)
+            score_field, score_column = "momentum_score", "momentum"
+            message = "Showing trending restaurants by momentum score"
+        else:
             # Fallback to recalculated score
-            query = f"""
-                SELECT DISTINCT
-                    Base_ID as id,
-                    Base_Name as name,
-                    Base_Cuisine as cuisine,
-                    Base_Country as country,
-                    Base_Star_Rating as stars,
-                    Base_Recalculated_Score as calculated_score,
-                    Base_Badge_List as badges,
-                    Base_Reputation_Label as reputation
-                FROM `{FULL_TABLE_NAME}`
-                WHERE Base_Recalculated_Score IS NOT NULL
-                ORDER BY Base_Recalculated_Score DESC
-                LIMIT @limit
-            """
+            ids = boards.top_ids("score", limit=limit).tolist()
+            score_field, score_column = "calculated_score", "score"
             message = "Using calculated score as momentum data not available"
-        else:
-            query = f"""
-                SELECT DISTINCT
-                    Base_ID as id,
-                    Base_Name as name,
-                    Base_Cuisine as cuisine,
-                    Base_Country as country,
-                    Base_Star_Rating as stars,
-                    Base_Momentum_Score_Num as momentum_score,
-                    Base_Badge_List as badges,
-                    Base_Reputation_Label as reputation
-                FROM `{FULL_TABLE_NAME}`
-                WHERE Base_Momentum_Score_Num IS NOT NULL AND Base_Momentum_Score_Num > 0
-                ORDER BY Base_Momentum_Score_Num DESC
-                LIMIT @limit
-            """
-            message = "Showing trending restaurants by momentum score"
-        
-        job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("limit", "INT64", limit)
-        ])
-        results = list(client.query(query, job_config=job_config).result())
         
-        if not results:
+        rows = [snapshot.row_by_id[rid] for rid in ids]
+        if not rows:
             raise HTTPException(status_code=404, detail="No trending restaurants found")
         
         return {
             "message": message,
-            "trending_restaurants": [dict(row) for row in results]
+            "trending_restaurants": snapshot.records(rows, {**TRENDING_FIELDS, score_field: score_column})
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -870,6 +972,8 @@ def get_all_tags():
             },
             "all_tags": all_tags
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -877,35 +981,29 @@ def get_all_tags():
 # 19. Check BigQuery connection health
 @router.get("/health")
 def health_check():
-    """Check BigQuery connection health"""
+    """Check BigQuery connection health (from the background readiness check, no query per call)"""
     try:
-        # Simple query to test connection
-        test_query = f"""
-            SELECT 
-                COUNT(*) as total_records,
-                COUNT(DISTINCT Base_ID) as unique_restaurants,
-                MAX(Base_Star_Rating) as max_stars,
-                MIN(Base_Star_Rating) as min_stars
-            FROM `{FULL_TABLE_NAME}`
-            LIMIT 1
-        """
-        
-        start_time = time.time()
-        result = list(client.query(test_query).result())[0]
-        query_time = time.time() - start_time
+        status = readiness.status()
+        if not status["bigquery"]["ok"]:
+            raise RuntimeError(status["bigquery"].get("error"))
+        
+        database_info = {"total_records": status["bigquery"]["num_rows"]}
+        if status["snapshot"]["loaded"]:
+            snapshot = catalog.get()
+            stars = snapshot["stars"]
+            has_stars = bool((~np.isnan(stars)).any())
+            database_info["unique_restaurants"] = snapshot.size
+            database_info["star_rating_range"] = {
+                "min": float(np.nanmin(stars)) if has_stars else None,
+                "max": float(np.nanmax(stars)) if has_stars else None
+            }
         
         return {
             "status": "healthy",
             "bigquery_connection": "connected",
-            "query_response_time_seconds": round(query_time, 3),
-            "database_info": {
-                "total_records": result["total_records"],
-                "unique_restaurants": result["unique_restaurants"],
-                "star_rating_range": {
-                    "min": result["min_stars"],
-                    "max": result["max_stars"]
-                }
-            },
+            "query_response_time_seconds": status["bigquery"]["latency_seconds"],
+            "checked_seconds_ago": status["bigquery"].get("age_seconds"),
+            "database_info": database_info,
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime())
         }
     except Exception as e:
@@ -947,7 +1045,8 @@ def get_restaurant_by_name(restaurant_name: str):
         job_config = bigquery.QueryJobConfig(query_parameters=[
             bigquery.ScalarQueryParameter("restaurant_name", "STRING", restaurant_name)
         ])
-        results = list(client.query(query, job_config=job_config).result())
+        with span("rows"):
+            results = list(client.query(query, job_config=job_config).result())
         
         if not results:
             # Try partial match as fallback
@@ -977,7 +1076,8 @@ def get_restaurant_by_name(restaurant_name: str):
             partial_job_config = bigquery.QueryJobConfig(query_parameters=[
                 bigquery.ScalarQueryParameter("restaurant_name_partial", "STRING", f"%{restaurant_name}%")
             ])
-            partial_results = list(client.query(partial_query, job_config=partial_job_config).result())
+            with span("rows"):
+                partial_results = [dict(row) for row in client.query(partial_query, job_config=partial_job_config).result()]
             
             if not partial_results:
                 raise HTTPException(status_code=404, detail=f"Restaurant '{restaurant_name}' not found")
@@ -985,19 +1085,20 @@ def get_restaurant_by_name(restaurant_name: str):
             return {
                 "exact_match": False,
                 "searched_for": restaurant_name,
-                "suggestions": [dict(row) for row in partial_results],
+                "suggestions": partial_results,
                 "message": f"No exact match found for '{restaurant_name}'. Here are similar restaurants:"
             }
         
-        restaurant_data = dict(results[0])
-        
-        # Add additional computed fields
-        restaurant_data["has_badges"] = bool(restaurant_data["badges"])
-        restaurant_data["badge_count"] = len(restaurant_data["badges"].split(",")) if restaurant_data["badges"] else 0
-        restaurant_data["coordinates"] = {
-            "umap_x": restaurant_data["umap_x"],
-            "umap_y": restaurant_data["umap_y"]
-        }
+        with span("process"):
+            restaurant_data = dict(results[0])
+            
+            # Add additional computed fields
+            restaurant_data["has_badges"] = bool(restaurant_data["badges"])
+            restaurant_data["badge_count"] = len(restaurant_data["badges"].split(",")) if restaurant_data["badges"] else 0
+            restaurant_data["coordinates"] = {
+                "umap_x": restaurant_data["umap_x"],
+                "umap_y": restaurant_data["umap_y"]
+            }
         
         return {
             "exact_match": True,
@@ -1015,76 +1116,35 @@ def get_restaurant_by_name(restaurant_name: str):
 def get_score_distribution():
     """Get score distribution buckets for graphs or UI heatmaps"""
     try:
-        # Star rating distribution
-        star_distribution_query = f"""
-            SELECT
-                CAST(FLOOR(Base_Star_Rating * 2) / 2 AS FLOAT64) as star_bucket,
-                COUNT(*) as count,
-                ROUND(AVG(Base_Recalculated_Score), 2) as avg_calculated_score
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_Star_Rating IS NOT NULL
-            GROUP BY star_bucket
-            ORDER BY star_bucket
-        """
-        
-        # Calculated score distribution (10 buckets)
-        score_distribution_query = f"""
-            SELECT
-                CASE 
-                    WHEN Base_Recalculated_Score < 10 THEN '0-10'
-                    WHEN Base_Recalculated_Score < 20 THEN '10-20'
-                    WHEN Base_Recalculated_Score < 30 THEN '20-30'
-                    WHEN Base_Recalculated_Score < 40 THEN '30-40'
-                    WHEN Base_Recalculated_Score < 50 THEN '40-50'
-                    WHEN Base_Recalculated_Score < 60 THEN '50-60'
-                    WHEN Base_Recalculated_Score < 70 THEN '60-70'
-                    WHEN Base_Recalculated_Score < 80 THEN '70-80'
-                    WHEN Base_Recalculated_Score < 90 THEN '80-90'
-                    ELSE '90-100'
-                END as score_bucket,
-                COUNT(*) as count,
-                MIN(Base_Recalculated_Score) as min_score,
-                MAX(Base_Recalculated_Score) as max_score,
-                ROUND(AVG(Base_Recalculated_Score), 2) as avg_score
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_Recalculated_Score IS NOT NULL
-            GROUP BY score_bucket
-            ORDER BY min_score
-        """
-        
-        # Cluster distribution
-        cluster_distribution_query = f"""
-            SELECT
-                Base_Cluster as cluster_id,
-                COUNT(*) as restaurant_count,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars,
-                ROUND(AVG(Base_Recalculated_Score), 2) as avg_score,
-                MAX(Base_Cluster_Explainability_Label) as cluster_description
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_Cluster IS NOT NULL
-            GROUP BY Base_Cluster
-            ORDER BY restaurant_count DESC
-        """
-        
-        # Country distribution (top 15)
-        country_distribution_query = f"""
-            SELECT
-                Base_Country as country,
-                COUNT(*) as restaurant_count,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars,
-                ROUND(AVG(Base_Recalculated_Score), 2) as avg_score
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_Country IS NOT NULL
-            GROUP BY Base_Country
-            ORDER BY restaurant_count DESC
-            LIMIT 15
-        """
-        
-        # Execute all queries
-        star_dist = [dict(row) for row in client.query(star_distribution_query).result()]
-        score_dist = [dict(row) for row in client.query(score_distribution_query).result()]
-        cluster_dist = [dict(row) for row in client.query(cluster_distribution_query).result()]
-        country_dist = [dict(row) for row in client.query(country_distribution_query).result()]
+        # Star and score buckets are single histogram passes over the catalog, once per data version
+        distributions = catalog.get().derived("score_distribution", build_score_distribution)
+        star_dist = distributions["star_rating"]
+        score_dist = distributions["calculated_score"]
+        
+        # Cluster distribution comes from the shared cluster-profile store
+        profiles = _cluster_profiles()
+        cluster_dist = []
+        for cluster_id in profiles.by_size():
+            profile = profiles.profile(cluster_id)
+            cluster_dist.append({
+                "cluster_id": cluster_id,
+                "restaurant_count": profile["restaurant_count"],
+                "avg_stars": profile["avg_stars"],
+                "avg_score": profile["avg_score"],
+                "cluster_description": profile["cluster_description"]
+            })
+        
+        # Country distribution (top 15) from the per-country rollup
+        countries = _rollups()["country"]
+        country_dist = []
+        for i in np.lexsort((np.arange(len(countries.keys)), -countries.counts))[:15].tolist():
+            overview = countries.overview(i)
+            country_dist.append({
+                "country": overview["country"],
+                "restaurant_count": overview["total_restaurants"],
+                "avg_stars": overview["avg_stars"],
+                "avg_score": overview["avg_score"]
+            })
         
         # Calculate totals
         total_restaurants = sum(bucket["count"] for bucket in star_dist)
@@ -1102,7 +1162,8 @@ def get_score_distribution():
                 },
                 "clusters": {
                     "buckets": cluster_dist,
-                    "description": "Distribution by restaurant clusters"
+                    "description": "Distribution by restaurant clusters",
+                    "freshness": profiles.metadata()
                 },
                 "countries": {
                     "buckets": country_dist,
@@ -1116,6 +1177,8 @@ def get_score_distribution():
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -1124,134 +1187,17 @@ def get_score_distribution():
 def get_related_clusters(cluster_id: int, limit: int = 3):
     """Recommend nearby clusters or overlapping themes"""
     try:
-        # First, get characteristics of the input cluster
-        cluster_info_query = f"""
-            SELECT
-                Base_Cluster as cluster_id,
-                ANY_VALUE(Base_Cluster_Explainability_Label) as cluster_description,
-                COUNT(*) as restaurant_count,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars,
-                ROUND(AVG(Base_Recalculated_Score), 2) as avg_score,
-                STRING_AGG(DISTINCT Base_Cuisine ORDER BY Base_Cuisine LIMIT 5) as top_cuisines,
-                STRING_AGG(DISTINCT Base_Country ORDER BY Base_Country LIMIT 5) as top_countries,
-                STRING_AGG(DISTINCT Base_Reputation_Label ORDER BY Base_Reputation_Label LIMIT 3) as top_reputations,
-                AVG(Base_UMAP_1) as avg_umap_x,
-                AVG(Base_UMAP_2) as avg_umap_y
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_Cluster = @cluster_id
-            GROUP BY Base_Cluster
-        """
-        
-        cluster_job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("cluster_id", "INT64", cluster_id)
-        ])
-        cluster_info = list(client.query(cluster_info_query, job_config=cluster_job_config).result())
+        # Cluster profiles are materialized once per data version, so this is pure lookup
+        profiles = _cluster_profiles()
         
-        if not cluster_info:
+        if cluster_id not in profiles:
             raise HTTPException(status_code=404, detail=f"Cluster {cluster_id} not found")
         
-        source_cluster = dict(cluster_info[0])
-        
-        # Find related clusters using multiple similarity measures
-        related_clusters_query = f"""
-            WITH cluster_stats AS (
-                SELECT
-                    Base_Cluster as cluster_id,
-                    ANY_VALUE(Base_Cluster_Explainability_Label) as cluster_description,
-                    COUNT(*) as restaurant_count,
-                    ROUND(AVG(Base_Star_Rating), 2) as avg_stars,
-                    ROUND(AVG(Base_Recalculated_Score), 2) as avg_score,
-                    STRING_AGG(DISTINCT Base_Cuisine ORDER BY Base_Cuisine LIMIT 5) as top_cuisines,
-                    STRING_AGG(DISTINCT Base_Country ORDER BY Base_Country LIMIT 5) as top_countries,
-                    STRING_AGG(DISTINCT Base_Reputation_Label ORDER BY Base_Reputation_Label LIMIT 3) as top_reputations,
-                    AVG(Base_UMAP_1) as avg_umap_x,
-                    AVG(Base_UMAP_2) as avg_umap_y
-                FROM `{FULL_TABLE_NAME}`
-                WHERE Base_Cluster IS NOT NULL AND Base_Cluster != @cluster_id
-                GROUP BY Base_Cluster
-            ),
-            cluster_similarity AS (
-                SELECT
-                    cluster_id,
-                    cluster_description,
-                    restaurant_count,
-                    avg_stars,
-                    avg_score,
-                    top_cuisines,
-                    top_countries,
-                    top_reputations,
-                    -- Geographic similarity (UMAP distance)
-                    SQRT(POW(avg_umap_x - @source_umap_x, 2) + POW(avg_umap_y - @source_umap_y, 2)) as umap_distance,
-                    -- Star rating similarity
-                    ABS(avg_stars - @source_avg_stars) as star_diff,
-                    -- Score similarity
-                    ABS(avg_score - @source_avg_score) as score_diff,
-                    -- Size similarity (restaurant count)
-                    ABS(restaurant_count - @source_restaurant_count) as size_diff
-                FROM cluster_stats
-            )
-            SELECT
-                cluster_id,
-                cluster_description,
-                restaurant_count,
-                avg_stars,
-                avg_score,
-                top_cuisines,
-                top_countries,
-                top_reputations,
-                umap_distance,
-                star_diff,
-                score_diff,
-                size_diff,
-                -- Calculate overall similarity score (lower is more similar)
-                (umap_distance * 0.4 + star_diff * 0.3 + (score_diff/10) * 0.2 + (size_diff/50) * 0.1) as similarity_score,
-                CASE 
-                    WHEN umap_distance < 1.0 THEN 'Geographically Similar'
-                    WHEN star_diff < 0.3 THEN 'Similar Quality Level'
-                    WHEN score_diff < 5 THEN 'Similar Overall Score'
-                    ELSE 'Thematically Related'
-                END as similarity_reason
-            FROM cluster_similarity
-            ORDER BY similarity_score ASC
-            LIMIT @limit
-        """
-        
-        related_job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("cluster_id", "INT64", cluster_id),
-            bigquery.ScalarQueryParameter("source_umap_x", "FLOAT64", source_cluster["avg_umap_x"]),
-            bigquery.ScalarQueryParameter("source_umap_y", "FLOAT64", source_cluster["avg_umap_y"]),
-            bigquery.ScalarQueryParameter("source_avg_stars", "FLOAT64", source_cluster["avg_stars"]),
-            bigquery.ScalarQueryParameter("source_avg_score", "FLOAT64", source_cluster["avg_score"]),
-            bigquery.ScalarQueryParameter("source_restaurant_count", "INT64", source_cluster["restaurant_count"]),
-            bigquery.ScalarQueryParameter("limit", "INT64", limit)
-        ])
-        
-        related_clusters = [dict(row) for row in client.query(related_clusters_query, job_config=related_job_config).result()]
-        
-        # Get sample restaurants from each related cluster
-        for cluster in related_clusters:
-            sample_query = f"""
-                SELECT
-                    Base_Name as name,
-                    Base_Cuisine as cuisine,
-                    Base_Country as country,
-                    Base_Star_Rating as stars,
-                    Base_Recalculated_Score as score
-                FROM `{FULL_TABLE_NAME}`
-                WHERE Base_Cluster = @cluster_id
-                ORDER BY Base_Recalculated_Score DESC
-                LIMIT 3
-            """
-            
-            sample_job_config = bigquery.QueryJobConfig(query_parameters=[
-                bigquery.ScalarQueryParameter("cluster_id", "INT64", cluster["cluster_id"])
-            ])
-            cluster["sample_restaurants"] = [dict(row) for row in client.query(sample_query, job_config=sample_job_config).result()]
-        
         return {
-            "source_cluster": source_cluster,
-            "related_clusters": related_clusters,
-            "recommendation_message": f"Based on Cluster {cluster_id}, you might also enjoy these similar clusters"
+            "source_cluster": profiles.profile(cluster_id),
+            "related_clusters": profiles.related(cluster_id, limit),
+            "recommendation_message": f"Based on Cluster {cluster_id}, you might also enjoy these similar clusters",
+            "cluster_profile_freshness": profiles.metadata()
         }
         
     except HTTPException:
@@ -1265,90 +1211,21 @@ def get_related_clusters(cluster_id: int, limit: int = 3):
 def explore_by_country(country: str, limit: int = 15, sort_by: str = "score"):
     """Curated discovery per region/country"""
     try:
-        valid_sorts = {
-            "score": "Base_Recalculated_Score",
-            "stars": "Base_Star_Rating", 
-            "momentum": "Base_Momentum_Score_Num"
-        }
-        
-        if sort_by not in valid_sorts:
+        if sort_by not in SORT_COLUMNS:
             sort_by = "score"
         
-        sort_column = valid_sorts[sort_by]
-        
-        # Get country overview
-        overview_query = f"""
-            SELECT
-                Base_Country as country,
-                COUNT(DISTINCT Base_ID) as total_restaurants,
-                COUNT(DISTINCT Base_Cuisine) as cuisines_available,
-                COUNT(DISTINCT Base_Cluster) as clusters_represented,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars,
-                ROUND(AVG(Base_Recalculated_Score), 2) as avg_score,
-                STRING_AGG(DISTINCT Base_Cuisine ORDER BY Base_Cuisine LIMIT 8) as top_cuisines,
-                STRING_AGG(DISTINCT Base_Reputation_Label ORDER BY Base_Reputation_Label LIMIT 5) as reputation_types
-            FROM `{FULL_TABLE_NAME}`
-            WHERE LOWER(Base_Country) = LOWER(@country)
-            GROUP BY Base_Country
-        """
-        
-        overview_job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("country", "STRING", country)
-        ])
-        overview_result = list(client.query(overview_query, job_config=overview_job_config).result())
+        # Country rollups are precomputed once per data version
+        rollup = _rollups()["country"]
+        group = rollup.find(country)
         
-        if not overview_result:
+        if group is None:
             raise HTTPException(status_code=404, detail=f"No restaurants found for country: {country}")
         
-        overview = dict(overview_result[0])
-        
-        # Get top restaurants
-        restaurants_query = f"""
-            SELECT DISTINCT
-                Base_ID as id,
-                Base_Name as name,
-                Base_Cuisine as cuisine,
-                Base_Country as country,
-                Base_Star_Rating as stars,
-                Base_Recalculated_Score as score,
-                Base_Momentum_Score_Num as momentum,
-                Base_Reputation_Label as reputation,
-                Base_Badge_List as badges,
-                Base_Cluster as cluster,
-                Base_Score_Color as score_color
-            FROM `{FULL_TABLE_NAME}`
-            WHERE LOWER(Base_Country) = LOWER(@country)
-            AND {sort_column} IS NOT NULL
-            ORDER BY {sort_column} DESC
-            LIMIT @limit
-        """
-        
-        restaurants_job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("country", "STRING", country),
-            bigquery.ScalarQueryParameter("limit", "INT64", limit)
-        ])
-        restaurants = [dict(row) for row in client.query(restaurants_query, job_config=restaurants_job_config).result()]
-        
-        # Get cuisine breakdown
-        cuisine_query = f"""
-            SELECT 
-                Base_Cuisine as cuisine,
-                COUNT(*) as restaurant_count,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars
-            FROM `{FULL_TABLE_NAME}`
-            WHERE LOWER(Base_Country) = LOWER(@country)
-            GROUP BY Base_Cuisine
-            ORDER BY restaurant_count DESC
-            LIMIT 10
-        """
-        
-        cuisine_breakdown = [dict(row) for row in client.query(cuisine_query, job_config=overview_job_config).result()]
-        
         return {
             "country": country,
-            "overview": overview,
-            "top_restaurants": restaurants,
-            "cuisine_breakdown": cuisine_breakdown,
+            "overview": rollup.overview(group),
+            "top_restaurants": rollup.top_restaurants(group, sort_by, limit),
+            "cuisine_breakdown": rollup.breakdown_for(group),
             "sorted_by": sort_by,
             "message": f"Exploring top restaurants in {country}"
         }
@@ -1364,90 +1241,21 @@ def explore_by_country(country: str, limit: int = 15, sort_by: str = "score"):
 def explore_by_cuisine(cuisine: str, limit: int = 15, sort_by: str = "score"):
     """Curated discovery per cuisine type"""
     try:
-        valid_sorts = {
-            "score": "Base_Recalculated_Score",
-            "stars": "Base_Star_Rating", 
-            "momentum": "Base_Momentum_Score_Num"
-        }
-        
-        if sort_by not in valid_sorts:
+        if sort_by not in SORT_COLUMNS:
             sort_by = "score"
         
-        sort_column = valid_sorts[sort_by]
+        # Cuisine rollups are precomputed once per data version
+        rollup = _rollups()["cuisine"]
+        group = rollup.find(cuisine)
         
-        # Get cuisine overview
-        overview_query = f"""
-            SELECT
-                Base_Cuisine as cuisine,
-                COUNT(DISTINCT Base_ID) as total_restaurants,
-                COUNT(DISTINCT Base_Country) as countries_available,
-                COUNT(DISTINCT Base_Cluster) as clusters_represented,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars,
-                ROUND(AVG(Base_Recalculated_Score), 2) as avg_score,
-                STRING_AGG(DISTINCT Base_Country ORDER BY Base_Country LIMIT 8) as top_countries,
-                STRING_AGG(DISTINCT Base_Reputation_Label ORDER BY Base_Reputation_Label LIMIT 5) as reputation_types
-            FROM `{FULL_TABLE_NAME}`
-            WHERE LOWER(Base_Cuisine) = LOWER(@cuisine)
-            GROUP BY Base_Cuisine
-        """
-        
-        overview_job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("cuisine", "STRING", cuisine)
-        ])
-        overview_result = list(client.query(overview_query, job_config=overview_job_config).result())
-        
-        if not overview_result:
+        if group is None:
             raise HTTPException(status_code=404, detail=f"No restaurants found for cuisine: {cuisine}")
         
-        overview = dict(overview_result[0])
-        
-        # Get top restaurants
-        restaurants_query = f"""
-            SELECT DISTINCT
-                Base_ID as id,
-                Base_Name as name,
-                Base_Cuisine as cuisine,
-                Base_Country as country,
-                Base_Star_Rating as stars,
-                Base_Recalculated_Score as score,
-                Base_Momentum_Score_Num as momentum,
-                Base_Reputation_Label as reputation,
-                Base_Badge_List as badges,
-                Base_Cluster as cluster,
-                Base_Score_Color as score_color
-            FROM `{FULL_TABLE_NAME}`
-            WHERE LOWER(Base_Cuisine) = LOWER(@cuisine)
-            AND {sort_column} IS NOT NULL
-            ORDER BY {sort_column} DESC
-            LIMIT @limit
-        """
-        
-        restaurants_job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("cuisine", "STRING", cuisine),
-            bigquery.ScalarQueryParameter("limit", "INT64", limit)
-        ])
-        restaurants = [dict(row) for row in client.query(restaurants_query, job_config=restaurants_job_config).result()]
-        
-        # Get country breakdown
-        country_query = f"""
-            SELECT 
-                Base_Country as country,
-                COUNT(*) as restaurant_count,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars
-            FROM `{FULL_TABLE_NAME}`
-            WHERE LOWER(Base_Cuisine) = LOWER(@cuisine)
-            GROUP BY Base_Country
-            ORDER BY restaurant_count DESC
-            LIMIT 10
-        """
-        
-        country_breakdown = [dict(row) for row in client.query(country_query, job_config=overview_job_config).result()]
-        
         return {
             "cuisine": cuisine,
-            "overview": overview,
-            "top_restaurants": restaurants,
-            "country_breakdown": country_breakdown,
+            "overview": rollup.overview(group),
+            "top_restaurants": rollup.top_restaurants(group, sort_by, limit),
+            "country_breakdown": rollup.breakdown_for(group),
             "sorted_by": sort_by,
             "message": f"Exploring top {cuisine} restaurants worldwide"
         }
@@ -1466,167 +1274,15 @@ def market_gap_analysis(
 ):
     """Analyze market gaps and investment opportunities"""
     try:
-        # Analyze geographic gaps using grid-based approach
-        geographic_gaps_query = f"""
-            WITH grid_analysis AS (
-                SELECT
-                    FLOOR(Base_UMAP_1 / @grid_size) * @grid_size as grid_x,
-                    FLOOR(Base_UMAP_2 / @grid_size) * @grid_size as grid_y,
-                    COUNT(*) as restaurant_count,
-                    AVG(Base_Star_Rating) as avg_stars,
-                    AVG(Base_Recalculated_Score) as avg_score,
-                    COUNT(DISTINCT Base_Cuisine) as cuisine_diversity,
-                    STRING_AGG(DISTINCT Base_Cuisine ORDER BY Base_Cuisine LIMIT 5) as cuisines_present,
-                    STRING_AGG(DISTINCT Base_Country ORDER BY Base_Country LIMIT 3) as countries_present
-                FROM `{FULL_TABLE_NAME}`
-                WHERE Base_UMAP_1 IS NOT NULL AND Base_UMAP_2 IS NOT NULL
-                GROUP BY grid_x, grid_y
-            ),
-            neighboring_grids AS (
-                SELECT 
-                    g1.grid_x,
-                    g1.grid_y,
-                    g1.restaurant_count,
-                    g1.avg_stars,
-                    g1.avg_score,
-                    g1.cuisine_diversity,
-                    g1.cuisines_present,
-                    g1.countries_present,
-                    AVG(g2.restaurant_count) as neighbor_avg_count,
-                    AVG(g2.avg_stars) as neighbor_avg_stars
-                FROM grid_analysis g1
-                LEFT JOIN grid_analysis g2 ON (
-                    ABS(g1.grid_x - g2.grid_x) <= @grid_size AND 
-                    ABS(g1.grid_y - g2.grid_y) <= @grid_size AND
-                    (g1.grid_x != g2.grid_x OR g1.grid_y != g2.grid_y)
-                )
-                GROUP BY g1.grid_x, g1.grid_y, g1.restaurant_count, g1.avg_stars, g1.avg_score, g1.cuisine_diversity, g1.cuisines_present, g1.countries_present
-            ),
-            opportunity_analysis AS (
-                SELECT
-                    grid_x,
-                    grid_y,
-                    restaurant_count,
-                    avg_stars,
-                    avg_score,
-                    cuisine_diversity,
-                    cuisines_present,
-                    countries_present,
-                    neighbor_avg_count,
-                    neighbor_avg_stars,
-                    CASE 
-                        WHEN restaurant_count < @min_threshold AND neighbor_avg_count >= @min_threshold AND neighbor_avg_stars >= 4.0 THEN 'High Opportunity'
-                        WHEN restaurant_count < @min_threshold AND neighbor_avg_count >= 2 THEN 'Medium Opportunity'
-                        WHEN restaurant_count = 0 AND neighbor_avg_count > 0 THEN 'Underserved Area'
-                        ELSE 'Saturated'
-                    END as opportunity_level,
-                    -- Calculate opportunity score
-                    CASE 
-                        WHEN restaurant_count < @min_threshold AND neighbor_avg_count >= @min_threshold AND neighbor_avg_stars >= 4.0 THEN 100
-                        WHEN restaurant_count < @min_threshold AND neighbor_avg_count >= 2 THEN 75
-                        WHEN restaurant_count = 0 AND neighbor_avg_count > 0 THEN 50
-                        ELSE 10
-                    END as opportunity_score
-                FROM neighboring_grids
-            )
-            SELECT
-                grid_x,
-                grid_y,
-                restaurant_count,
-                ROUND(avg_stars, 2) as avg_stars,
-                ROUND(avg_score, 2) as avg_score,
-                cuisine_diversity,
-                cuisines_present,
-                countries_present,
-                ROUND(neighbor_avg_count, 1) as neighbor_avg_count,
-                ROUND(neighbor_avg_stars, 2) as neighbor_avg_stars,
-                opportunity_level,
-                opportunity_score
-            FROM opportunity_analysis
-            WHERE opportunity_level != 'Saturated'
-            ORDER BY 
-                opportunity_score DESC,
-                neighbor_avg_stars DESC
-            LIMIT 20
-        """
-        
-        gap_job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("grid_size", "FLOAT64", umap_grid_size),
-            bigquery.ScalarQueryParameter("min_threshold", "INT64", min_restaurants_threshold)
-        ])
-        geographic_gaps = [dict(row) for row in client.query(geographic_gaps_query, job_config=gap_job_config).result()]
-        
-        # Analyze cuisine gaps
-        cuisine_gap_query = f"""
-            WITH cuisine_country_matrix AS (
-                SELECT 
-                    Base_Country as country,
-                    Base_Cuisine as cuisine,
-                    COUNT(*) as restaurant_count,
-                    AVG(Base_Star_Rating) as avg_stars,
-                    AVG(Base_Recalculated_Score) as avg_score
-                FROM `{FULL_TABLE_NAME}`
-                WHERE Base_Country IS NOT NULL AND Base_Cuisine IS NOT NULL
-                GROUP BY Base_Country, Base_Cuisine
-            ),
-            country_stats AS (
-                SELECT 
-                    country,
-                    COUNT(DISTINCT cuisine) as total_cuisines,
-                    SUM(restaurant_count) as total_restaurants,
-                    AVG(avg_stars) as country_avg_stars
-                FROM cuisine_country_matrix
-                GROUP BY country
-                HAVING total_restaurants >= 5  -- Focus on countries with sufficient data
-            ),
-            popular_cuisines AS (
-                SELECT 
-                    cuisine,
-                    COUNT(DISTINCT country) as countries_present,
-                    SUM(restaurant_count) as global_count
-                FROM cuisine_country_matrix
-                GROUP BY cuisine
-                HAVING countries_present >= 3  -- Cuisines present in multiple countries
-                ORDER BY global_count DESC
-                LIMIT 10
-            )
-            SELECT 
-                cs.country,
-                pc.cuisine,
-                cs.total_restaurants as country_total_restaurants,
-                ROUND(cs.country_avg_stars, 2) as country_avg_stars,
-                pc.global_count as cuisine_global_popularity,
-                'Missing Popular Cuisine' as gap_type,
-                ROUND(cs.country_avg_stars * pc.global_count / 100, 2) as opportunity_score
-            FROM country_stats cs
-            CROSS JOIN popular_cuisines pc
-            WHERE NOT EXISTS (
-                SELECT 1 FROM cuisine_country_matrix ccm 
-                WHERE ccm.country = cs.country AND ccm.cuisine = pc.cuisine
-            )
-            AND cs.total_restaurants >= 10  -- Focus on established markets
-            ORDER BY opportunity_score DESC
-            LIMIT 15
-        """
-        
-        cuisine_gaps = [dict(row) for row in client.query(cuisine_gap_query).result()]
-        
-        # Calculate overall market metrics
-        market_overview_query = f"""
-            SELECT
-                COUNT(DISTINCT Base_ID) as total_restaurants,
-                COUNT(DISTINCT Base_Cuisine) as total_cuisines,
-                COUNT(DISTINCT Base_Country) as total_countries,
-                COUNT(DISTINCT Base_Cluster) as total_clusters,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars,
-                ROUND(MIN(Base_UMAP_1), 2) as min_umap_x,
-                ROUND(MAX(Base_UMAP_1), 2) as max_umap_x,
-                ROUND(MIN(Base_UMAP_2), 2) as min_umap_y,
-                ROUND(MAX(Base_UMAP_2), 2) as max_umap_y
-            FROM `{FULL_TABLE_NAME}`
-        """
-        
-        market_overview = dict(list(client.query(market_overview_query).result())[0])
+        # Grid and cuisine gaps are computed locally and cached per parameters and data version
+        snapshot = catalog.get()
+        geographic_gaps = snapshot.memo(
+            "market_gaps.geographic",
+            (umap_grid_size, min_restaurants_threshold, min_star_rating),
+            lambda: market_gaps.geographic_gaps(snapshot, umap_grid_size, min_restaurants_threshold, min_star_rating)
+        )
+        cuisine_gaps = snapshot.derived("market_gaps.cuisine", market_gaps.cuisine_gaps)
+        market_overview = snapshot.derived("market_gaps.overview", market_gaps.market_overview)
         
         # Add some derived insights
         high_opportunity_zones = [g for g in geographic_gaps if g["opportunity_level"] == "High Opportunity"]
@@ -1660,6 +1316,10 @@ def market_gap_analysis(
             ]
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1673,103 +1333,13 @@ def predict_rising_stars(
 ):
     """Predict restaurants likely to gain recognition using momentum analysis"""
     try:
-        # Analyze momentum patterns and predict rising stars
-        rising_stars_query = f"""
-            WITH momentum_analysis AS (
-                SELECT
-                    Base_ID as id,
-                    Base_Name as name,
-                    Base_Cuisine as cuisine,
-                    Base_Country as country,
-                    Base_Star_Rating as current_stars,
-                    Base_Recalculated_Score as current_score,
-                    Base_Momentum_Score_Num as momentum,
-                    Base_Cluster as cluster,
-                    Base_Badge_List as badges,
-                    Base_Reputation_Label as current_reputation,
-                    Base_UMAP_1 as umap_x,
-                    Base_UMAP_2 as umap_y,
-                    -- Calculate momentum percentile
-                    PERCENT_RANK() OVER (ORDER BY Base_Momentum_Score_Num) as momentum_percentile,
-                    -- Calculate score vs stars ratio (undervalued indicator)
-                    CASE 
-                        WHEN Base_Star_Rating > 0 THEN Base_Recalculated_Score / Base_Star_Rating
-                        ELSE 0
-                    END as score_star_ratio
-                FROM `{FULL_TABLE_NAME}`
-                WHERE Base_Momentum_Score_Num IS NOT NULL
-                AND Base_Star_Rating IS NOT NULL
-                AND Base_Star_Rating <= @current_star_max  -- Focus on restaurants not already at the top
-                AND Base_Recalculated_Score IS NOT NULL
-            ),
-            cluster_performance AS (
-                SELECT 
-                    cluster,
-                    AVG(current_stars) as cluster_avg_stars,
-                    AVG(momentum) as cluster_avg_momentum,
-                    COUNT(*) as cluster_size
-                FROM momentum_analysis
-                WHERE cluster IS NOT NULL
-                GROUP BY cluster
-            ),
-            predictions AS (
-                SELECT 
-                    ma.*,
-                    cp.cluster_avg_stars,
-                    cp.cluster_avg_momentum,
-                    -- Rising star prediction score
-                    (
-                        (ma.momentum_percentile * 0.4) +  -- High momentum weight
-                        (CASE WHEN ma.score_star_ratio > 20 THEN 0.3 ELSE ma.score_star_ratio/20 * 0.3 END) +  -- Undervalued weight
-                        (CASE WHEN ma.current_stars >= cp.cluster_avg_stars THEN 0.2 ELSE 0.1 END) +  -- Cluster comparison
-                        (CASE WHEN ma.momentum > cp.cluster_avg_momentum THEN 0.1 ELSE 0.05 END)  -- Above cluster momentum
-                    ) as rising_star_score,
-                    CASE 
-                        WHEN ma.momentum_percentile > 0.8 AND ma.score_star_ratio > 15 THEN 'Very High Potential'
-                        WHEN ma.momentum_percentile > 0.6 AND ma.score_star_ratio > 10 THEN 'High Potential'
-                        WHEN ma.momentum_percentile > 0.4 OR ma.score_star_ratio > 8 THEN 'Medium Potential'
-                        ELSE 'Low Potential'
-                    END as potential_category,
-                    CASE 
-                        WHEN ma.current_stars < 3.5 THEN 'Breakthrough Candidate'
-                        WHEN ma.current_stars < 4.0 THEN 'Recognition Candidate'
-                        ELSE 'Elite Advancement Candidate'
-                    END as advancement_type
-                FROM momentum_analysis ma
-                LEFT JOIN cluster_performance cp ON ma.cluster = cp.cluster
-            )
-            SELECT 
-                id, name, cuisine, country, current_stars, current_score, momentum,
-                cluster, badges, current_reputation, umap_x, umap_y,
-                momentum_percentile, score_star_ratio, rising_star_score,
-                potential_category, advancement_type,
-                cluster_avg_stars, cluster_avg_momentum
-            FROM predictions
-            WHERE potential_category IN ('Very High Potential', 'High Potential', 'Medium Potential')
-            ORDER BY rising_star_score DESC
-            LIMIT @limit
-        """
-        
-        job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("current_star_max", "FLOAT64", current_star_max),
-            bigquery.ScalarQueryParameter("limit", "INT64", limit)
-        ])
-        rising_stars = [dict(row) for row in client.query(rising_stars_query, job_config=job_config).result()]
-        
-        # Get momentum distribution for context
-        momentum_stats_query = f"""
-            SELECT 
-                COUNT(*) as total_restaurants,
-                AVG(Base_Momentum_Score_Num) as avg_momentum,
-                MIN(Base_Momentum_Score_Num) as min_momentum,
-                MAX(Base_Momentum_Score_Num) as max_momentum,
-                APPROX_QUANTILES(Base_Momentum_Score_Num, 10)[OFFSET(8)] as momentum_80th_percentile,
-                APPROX_QUANTILES(Base_Momentum_Score_Num, 10)[OFFSET(9)] as momentum_90th_percentile
-            FROM `{MOMENTUM_STATS_TABLE}`
-            WHERE Base_Momentum_Score_Num IS NOT NULL
-        """
-        
-        momentum_stats = dict(list(client.query(momentum_stats_query).result())[0])
+        # Features are computed once per data version; each star cap is ranked once and cached
+        snapshot = catalog.get()
+        features = snapshot.derived("rising_star_features", build_rising_star_features)
+        ranking = snapshot.memo("rising_stars", current_star_max, lambda: features.rank(current_star_max))
+        rising_stars = ranking.top(limit, momentum_threshold)
+        momentum_stats = features.momentum_stats
+        profiles = _cluster_profiles()
         
         # Categorize predictions
         predictions_by_category = {
@@ -1789,6 +1359,7 @@ def predict_rising_stars(
                 "focus": f"Restaurants with ≤{current_star_max} stars showing high momentum"
             },
             "momentum_context": momentum_stats,
+            "cluster_profile_freshness": profiles.metadata(),
             "rising_stars": rising_stars,
             "predictions_by_category": predictions_by_category,
             "summary": {
@@ -1799,12 +1370,14 @@ def predict_rising_stars(
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # 26. Interactive Discovery Maps - Visual clustering data
-@router.get("/maps/discovery")
+@router.get("/maps/discovery", response_model=DiscoveryMapResponse)
 def discovery_maps_data(
     cluster_focus: int = None,
     min_stars: float = None,
@@ -1855,30 +1428,21 @@ def discovery_maps_data(
         job_config = bigquery.QueryJobConfig(query_parameters=params)
         restaurants = [dict(row) for row in client.query(restaurants_query, job_config=job_config).result()]
         
-        # Get cluster centroids and boundaries
-        cluster_analysis_query = f"""
-            SELECT
-                Base_Cluster as cluster_id,
-                ANY_VALUE(Base_Cluster_Explainability_Label) as cluster_name,
-                COUNT(*) as restaurant_count,
-                AVG(Base_UMAP_1) as centroid_x,
-                AVG(Base_UMAP_2) as centroid_y,
-                MIN(Base_UMAP_1) as min_x,
-                MAX(Base_UMAP_1) as max_x,
-                MIN(Base_UMAP_2) as min_y,
-                MAX(Base_UMAP_2) as max_y,
-                AVG(Base_Star_Rating) as avg_stars,
-                AVG(Base_Recalculated_Score) as avg_score,
-                STRING_AGG(DISTINCT Base_Cuisine ORDER BY Base_Cuisine LIMIT 5) as top_cuisines,
-                STRING_AGG(DISTINCT Base_Country ORDER BY Base_Country LIMIT 5) as top_countries
-            FROM `{FULL_TABLE_NAME}`
-            WHERE {where_clause}
-            AND Base_Cluster IS NOT NULL
-            GROUP BY Base_Cluster
-            ORDER BY restaurant_count DESC
-        """
-        
-        clusters = [dict(row) for row in client.query(cluster_analysis_query, job_config=job_config).result()]
+        # Cluster centroids and boundaries only cover restaurants with map coordinates, like the
+        # points above; filtered maps profile the matching subset of the in-memory catalog
+        if cluster_focus is None and min_stars is None and not cuisine_filter:
+            profiles = _map_cluster_profiles()
+        else:
+            snapshot = catalog.get()
+            mask = ~np.isnan(snapshot["umap_x"]) & ~np.isnan(snapshot["umap_y"])
+            if cluster_focus is not None:
+                mask &= snapshot["cluster"] == cluster_focus
+            if min_stars is not None:
+                mask &= snapshot["stars"] >= min_stars
+            if cuisine_filter:
+                mask &= snapshot["cuisine"].mask(cuisine_filter)
+            profiles = ClusterProfiles(snapshot, rows=np.flatnonzero(mask))
+        clusters = [ClusterMapSummary.model_construct(**profiles.map_summary(cluster_id)) for cluster_id in profiles.by_size()]
         
         # Calculate map boundaries
         if restaurants:
@@ -1928,10 +1492,12 @@ def discovery_maps_data(
                 grid["avg_score"] = round(grid["avg_score"] / grid["count"], 2)
                 grid["cuisines"] = list(grid["cuisines"])
         
-        heatmap_data = list(density_data.values())
+        heatmap_data = [HeatmapCell.model_construct(**grid) for grid in density_data.values()]
+        with span("rows"):
+            points = [MapPoint.model_construct(**restaurant) for restaurant in restaurants]
         
-        return {
-            "map_config": {
+        return TimedJSONResponse(DiscoveryMapResponse.model_construct(
+            map_config={
                 "bounds": map_bounds,
                 "total_points": len(restaurants),
                 "filters_applied": {
@@ -1940,10 +1506,11 @@ def discovery_maps_data(
                     "cuisine_filter": cuisine_filter
                 }
             },
-            "restaurants": restaurants,
-            "clusters": clusters,
-            "heatmap_data": heatmap_data,
-            "visualization_layers": {
+            restaurants=points,
+            clusters=clusters,
+            cluster_profile_freshness=DataFreshness.model_construct(**profiles.metadata()),
+            heatmap_data=heatmap_data,
+            visualization_layers={
                 "restaurants": "Individual restaurant points with details",
                 "clusters": "Cluster centroids and boundaries", 
                 "heatmap": f"Density grid ({grid_size} unit squares)",
@@ -1955,8 +1522,10 @@ def discovery_maps_data(
                     "Cuisine type filtering"
                 ]
             }
-        }
+        ))
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -1965,139 +1534,19 @@ def discovery_maps_data(
 def sustainability_trends(min_green_score: float = 0.0, limit: int = 50):
     """Analyze sustainability trends across restaurants"""
     try:
-        # Green focus by country analysis
-        country_green_query = f"""
-            SELECT
-                Base_Country as country,
-                COUNT(DISTINCT Base_ID) as restaurant_count,
-                ROUND(AVG(green_focus_score), 3) as avg_green_score,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars,
-                ROUND(AVG(Base_Recalculated_Score), 2) as avg_overall_score,
-                COUNT(CASE WHEN green_focus_score > 0.7 THEN 1 END) as high_green_restaurants,
-                ROUND(COUNT(CASE WHEN green_focus_score > 0.7 THEN 1 END) * 100.0 / COUNT(*), 1) as green_percentage
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_Country IS NOT NULL 
-            AND green_focus_score IS NOT NULL
-            AND green_focus_score >= @min_green_score
-            GROUP BY Base_Country
-            HAVING restaurant_count >= 5
-            ORDER BY avg_green_score DESC
-            LIMIT 15
-        """
-        
-        # Green focus by cuisine analysis
-        cuisine_green_query = f"""
-            SELECT
-                Base_Cuisine as cuisine,
-                COUNT(DISTINCT Base_ID) as restaurant_count,
-                ROUND(AVG(green_focus_score), 3) as avg_green_score,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars,
-                COUNT(CASE WHEN green_focus_score > 0.7 THEN 1 END) as high_green_restaurants,
-                ROUND(COUNT(CASE WHEN green_focus_score > 0.7 THEN 1 END) * 100.0 / COUNT(*), 1) as green_percentage
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_Cuisine IS NOT NULL 
-            AND green_focus_score IS NOT NULL
-            AND green_focus_score >= @min_green_score
-            GROUP BY Base_Cuisine
-            HAVING restaurant_count >= 5
-            ORDER BY avg_green_score DESC
-            LIMIT 10
-        """
-        
-        # Green vs Star Rating correlation
-        correlation_query = f"""
-            SELECT
-                CASE 
-                    WHEN green_focus_score >= 0.8 THEN 'Very High Green (0.8+)'
-                    WHEN green_focus_score >= 0.6 THEN 'High Green (0.6-0.8)'
-                    WHEN green_focus_score >= 0.4 THEN 'Medium Green (0.4-0.6)'
-                    WHEN green_focus_score >= 0.2 THEN 'Low Green (0.2-0.4)'
-                    ELSE 'Very Low Green (0-0.2)'
-                END as green_level,
-                COUNT(*) as restaurant_count,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars,
-                ROUND(AVG(Base_Recalculated_Score), 2) as avg_score,
-                ROUND(AVG(Base_Momentum_Score_Num), 2) as avg_momentum
-            FROM `{FULL_TABLE_NAME}`
-            WHERE green_focus_score IS NOT NULL 
-            AND Base_Star_Rating IS NOT NULL
-            GROUP BY green_level
-            ORDER BY 
-                CASE green_level
-                    WHEN 'Very High Green (0.8+)' THEN 1
-                    WHEN 'High Green (0.6-0.8)' THEN 2
-                    WHEN 'Medium Green (0.4-0.6)' THEN 3
-                    WHEN 'Low Green (0.2-0.4)' THEN 4
-                    WHEN 'Very Low Green (0-0.2)' THEN 5
-                END
-        """
-        
-        # Top green restaurants
-        top_green_query = f"""
-            SELECT
-                Base_ID as id,
-                Base_Name as name,
-                Base_Cuisine as cuisine,
-                Base_Country as country,
-                ROUND(green_focus_score, 3) as green_score,
-                Base_Star_Rating as stars,
-                ROUND(Base_Recalculated_Score, 2) as overall_score,
-                Base_Badge_List as badges,
-                Base_Cluster as cluster
-            FROM `{FULL_TABLE_NAME}`
-            WHERE green_focus_score IS NOT NULL
-            AND green_focus_score >= @min_green_score
-            GROUP BY Base_ID, Base_Name, Base_Cuisine, Base_Country, green_focus_score, Base_Star_Rating, Base_Recalculated_Score, Base_Badge_List, Base_Cluster
-            ORDER BY green_focus_score DESC
-            LIMIT @limit
-        """
-        
-        # Green clusters analysis
-        cluster_green_query = f"""
-            SELECT
-                Base_Cluster as cluster_id,
-                ANY_VALUE(Base_Cluster_Explainability_Label) as cluster_description,
-                COUNT(DISTINCT Base_ID) as restaurant_count,
-                ROUND(AVG(green_focus_score), 3) as avg_green_score,
-                ROUND(AVG(Base_Star_Rating), 2) as avg_stars,
-                COUNT(CASE WHEN green_focus_score > 0.6 THEN 1 END) as high_green_count,
-                ROUND(COUNT(CASE WHEN green_focus_score > 0.6 THEN 1 END) * 100.0 / COUNT(*), 1) as green_percentage
-            FROM `{FULL_TABLE_NAME}`
-            WHERE Base_Cluster IS NOT NULL 
-            AND green_focus_score IS NOT NULL
-            GROUP BY Base_Cluster
-            HAVING restaurant_count >= 10
-            ORDER BY avg_green_score DESC
-            LIMIT 10
-        """
-        
-        # Overall sustainability statistics
-        overall_stats_query = f"""
-            SELECT
-                COUNT(*) as total_restaurants,
-                ROUND(AVG(green_focus_score), 3) as global_avg_green_score,
-                ROUND(MIN(green_focus_score), 3) as min_green_score,
-                ROUND(MAX(green_focus_score), 3) as max_green_score,
-                COUNT(CASE WHEN green_focus_score > 0.8 THEN 1 END) as very_high_green_count,
-                COUNT(CASE WHEN green_focus_score > 0.6 THEN 1 END) as high_green_count,
-                COUNT(CASE WHEN green_focus_score > 0.4 THEN 1 END) as medium_green_count,
-                ROUND(COUNT(CASE WHEN green_focus_score > 0.6 THEN 1 END) * 100.0 / COUNT(*), 1) as high_green_percentage
-            FROM `{FULL_TABLE_NAME}`
-            WHERE green_focus_score IS NOT NULL
-        """
-        
-        # Execute all queries
-        job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("min_green_score", "FLOAT64", min_green_score),
-            bigquery.ScalarQueryParameter("limit", "INT64", limit)
-        ])
-        
-        country_results = [dict(row) for row in client.query(country_green_query, job_config=job_config).result()]
-        cuisine_results = [dict(row) for row in client.query(cuisine_green_query, job_config=job_config).result()]
-        correlation_results = [dict(row) for row in client.query(correlation_query).result()]
-        top_green_results = [dict(row) for row in client.query(top_green_query, job_config=job_config).result()]
-        cluster_results = [dict(row) for row in client.query(cluster_green_query).result()]
-        overall_stats = dict(list(client.query(overall_stats_query).result())[0])
+        # Threshold-independent aggregates are built once per data version; the rest are
+        # memoized per bucket of thresholds that select the same restaurants
+        snapshot = catalog.get()
+        baseline = snapshot.derived("sustainability", build_sustainability_baseline)
+        bucket = baseline.bucket(min_green_score)
+        report = snapshot.memo("sustainability", bucket, lambda: SustainabilityReport(snapshot, baseline, bucket))
+        
+        country_results = report.countries
+        cuisine_results = report.cuisines
+        correlation_results = baseline.correlation
+        top_green_results = report.top_green(limit)
+        cluster_results = baseline.clusters
+        overall_stats = baseline.overall
         
         return {
             "sustainability_overview": {
@@ -2132,6 +1581,8 @@ def sustainability_trends(min_green_score: float = 0.0, limit: int = 50):
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -2147,36 +1598,13 @@ def get_green_recommendations(
 ):
     """Recommend similar green restaurants to users browsing green-focused places"""
     try:
-        # First, get the base restaurant's green characteristics
-        base_restaurant_query = f"""
-            SELECT DISTINCT
-                Base_ID as id,
-                Base_Name as name,
-                Base_Cuisine as cuisine,
-                Base_Country as country,
-                green_focus_score as green_score,
-                Base_Star_Rating as stars,
-                Base_Recalculated_Score as overall_score,
-                Base_Cluster as cluster,
-                Base_UMAP_1 as umap_x,
-                Base_UMAP_2 as umap_y,
-                Base_Badge_List as badges
-            FROM `{FULL_TABLE_NAME}`
-            WHERE LOWER(Base_Name) = LOWER(@restaurant_name)
-            AND green_focus_score IS NOT NULL
-            LIMIT 1
-        """
+        # First, get the base restaurant's green characteristics from the in-memory catalog
+        snapshot = catalog.get()
+        base_restaurant = find_base_restaurant(snapshot, restaurant_name)
         
-        base_job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("restaurant_name", "STRING", restaurant_name)
-        ])
-        base_result = list(client.query(base_restaurant_query, job_config=base_job_config).result())
-        
-        if not base_result:
+        if base_restaurant is None:
             raise HTTPException(status_code=404, detail=f"Green restaurant '{restaurant_name}' not found")
         
-        base_restaurant = dict(base_result[0])
-        
         # Check if the base restaurant is actually green-focused
         if base_restaurant["green_score"] < min_green_score:
             return {
@@ -2186,66 +1614,16 @@ def get_green_recommendations(
                 "alternative_action": "Try /analytics/sustainability/trends for top green restaurants"
             }
         
+        # Candidates at or above the threshold are packed once per threshold bucket, with their market context
+        baseline = snapshot.derived("sustainability", build_sustainability_baseline)
+        bucket = baseline.bucket(min_green_score)
+        candidates = snapshot.memo("green_candidates", bucket, lambda: GreenCandidates(snapshot, baseline, bucket))
+        green_context = candidates.context
+        
         # Find green restaurants with similar characteristics
         if prioritize_green:
-            # Prioritize green score similarity with cuisine/location matching
-            green_recommendations_query = f"""
-                WITH green_candidates AS (
-                    SELECT
-                        Base_ID as id,
-                        Base_Name as name,
-                        Base_Cuisine as cuisine,
-                        Base_Country as country,
-                        green_focus_score as green_score,
-                        Base_Star_Rating as stars,
-                        Base_Recalculated_Score as overall_score,
-                        Base_Cluster as cluster,
-                        Base_UMAP_1 as umap_x,
-                        Base_UMAP_2 as umap_y,
-                        Base_Badge_List as badges,
-                        Base_Reputation_Label as reputation,
-                        -- Calculate green similarity score
-                        ABS(green_focus_score - @base_green_score) as green_diff,
-                        -- Geographic similarity (UMAP distance)
-                        SQRT(POW(Base_UMAP_1 - @base_umap_x, 2) + POW(Base_UMAP_2 - @base_umap_y, 2)) as geo_distance,
-                        -- Cuisine match bonus
-                        CASE WHEN Base_Cuisine = @base_cuisine THEN 0.3 ELSE 0.0 END as cuisine_bonus,
-                        -- Country match bonus
-                        CASE WHEN Base_Country = @base_country THEN 0.2 ELSE 0.0 END as country_bonus
-                    FROM `{FULL_TABLE_NAME}`
-                    WHERE green_focus_score >= @min_green_score
-                    AND Base_ID != @base_id
-                    AND Base_Name IS NOT NULL
-                    GROUP BY Base_ID, Base_Name, Base_Cuisine, Base_Country, green_focus_score, Base_Star_Rating, Base_Recalculated_Score, Base_Cluster, Base_UMAP_1, Base_UMAP_2, Base_Badge_List, Base_Reputation_Label
-                ),
-                scored_recommendations AS (
-                    SELECT
-                        *,
-                        -- Calculate overall green recommendation score
-                        (
-                            (1.0 - green_diff) * 0.4 +  -- Green similarity (40%)
-                            (1.0 / (1.0 + geo_distance)) * 0.2 +  -- Geographic proximity (20%)
-                            cuisine_bonus +  -- Cuisine match (30%)
-                            country_bonus +  -- Country match (20%)
-                            (stars / 5.0) * 0.1  -- Quality factor (10%)
-                        ) as recommendation_score,
-                        CASE 
-                            WHEN green_diff < 0.1 THEN 'Very Similar Green Focus'
-                            WHEN green_diff < 0.2 THEN 'Similar Green Focus'
-                            WHEN green_diff < 0.3 THEN 'Moderately Green'
-                            ELSE 'Different Green Level'
-                        END as green_similarity_level
-                    FROM green_candidates
-                )
-                SELECT
-                    id, name, cuisine, country, green_score, stars, overall_score,
-                    cluster, badges, reputation, recommendation_score, green_similarity_level,
-                    ROUND(geo_distance, 2) as geographic_distance,
-                    ROUND(green_diff, 3) as green_score_difference
-                FROM scored_recommendations
-                ORDER BY recommendation_score DESC
-                LIMIT @limit
-            """
+            # Prioritize green score similarity with cuisine/location matching, scored in one vectorized pass
+            recommendations = candidates.recommend(base_restaurant, limit)
         else:
             # Use existing recommendation data but filter for green restaurants
             green_recommendations_query = f"""
@@ -2271,36 +1649,12 @@ def get_green_recommendations(
                 LIMIT @limit
             """
         
-        # Execute the recommendation query
-        rec_job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("restaurant_name", "STRING", restaurant_name),
-            bigquery.ScalarQueryParameter("base_id", "INT64", base_restaurant["id"]),
-            bigquery.ScalarQueryParameter("base_green_score", "FLOAT64", base_restaurant["green_score"]),
-            bigquery.ScalarQueryParameter("base_umap_x", "FLOAT64", base_restaurant["umap_x"]),
-            bigquery.ScalarQueryParameter("base_umap_y", "FLOAT64", base_restaurant["umap_y"]),
-            bigquery.ScalarQueryParameter("base_cuisine", "STRING", base_restaurant["cuisine"]),
-            bigquery.ScalarQueryParameter("base_country", "STRING", base_restaurant["country"]),
-            bigquery.ScalarQueryParameter("min_green_score", "FLOAT64", min_green_score),
-            bigquery.ScalarQueryParameter("limit", "INT64", limit)
-        ])
-        
-        recommendations = [dict(row) for row in client.query(green_recommendations_query, job_config=rec_job_config).result()]
-        
-        # Get green context for the recommendations
-        green_context_query = f"""
-            SELECT
-                ROUND(AVG(green_focus_score), 3) as avg_green_score,
-                COUNT(DISTINCT Base_ID) as total_green_restaurants,
-                COUNT(CASE WHEN green_focus_score > 0.8 THEN 1 END) as very_high_green_count,
-                COUNT(CASE WHEN green_focus_score > 0.6 THEN 1 END) as high_green_count
-            FROM `{FULL_TABLE_NAME}`
-            WHERE green_focus_score >= @min_green_score
-        """
-        
-        context_job_config = bigquery.QueryJobConfig(query_parameters=[
-            bigquery.ScalarQueryParameter("min_green_score", "FLOAT64", min_green_score)
-        ])
-        green_context = dict(list(client.query(green_context_query, job_config=context_job_config).result())[0])
+            rec_job_config = bigquery.QueryJobConfig(query_parameters=[
+                bigquery.ScalarQueryParameter("restaurant_name", "STRING", restaurant_name),
+                bigquery.ScalarQueryParameter("min_green_score", "FLOAT64", min_green_score),
+                bigquery.ScalarQueryParameter("limit", "INT64", limit)
+            ])
+            recommendations = [dict(row) for row in client.query(green_recommendations_query, job_config=rec_job_config).result()]
         
         # Categorize recommendations by green level
         green_categories = {
@@ -2333,6 +1687,85 @@ def get_green_recommendations(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+# 29. Histograms over any numeric field with custom bins, optionally per cluster or country
+@router.get("/metrics/histogram")
+def get_histogram(
+    field: str = "score",
+    bins: str = "10",
+    group_by: str = None,
+    measure: str = None
+):
+    """Histogram of stars, score, momentum or green; bins is a bin count or comma-separated edges (inf allowed)"""
+    try:
+        snapshot = catalog.get()
+        spec = (field, bins.replace(" ", ""), group_by, measure)
+        histogram = snapshot.memo(
+            "histograms", spec,
+            lambda: build_histogram(snapshot, field, bins, group_by, measure),
+            maxsize=128
+        )
+        return histogram.to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+# 30. Dashboard percentiles from per-country and per-cluster quantile sketches
+@router.get("/metrics/percentiles")
+def get_percentiles(
+    fields: str = "stars,score,momentum,green",
+    country: str = None,
+    cluster: str = None,
+    percentiles: str = "10,50,90"
+):
+    """Approximate percentiles per field for a country or cluster, or a comma-separated union of them"""
+    try:
+        requested_fields = [f.strip() for f in fields.split(",") if f.strip()]
+        invalid = [f for f in requested_fields if f not in QUANTILE_FIELDS]
+        if not requested_fields or invalid:
+            raise HTTPException(status_code=400, detail=f"Invalid fields. Choose from: {list(QUANTILE_FIELDS.keys())}")
+        if country and cluster:
+            raise HTTPException(status_code=400, detail="Filter by at most one of country or cluster")
+        try:
+            points = [float(p) for p in percentiles.split(",") if p.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="percentiles must be comma-separated numbers between 0 and 100")
+        if not points or any(p < 0 or p > 100 for p in points):
+            raise HTTPException(status_code=400, detail="percentiles must be comma-separated numbers between 0 and 100")
+        
+        sketches = catalog.get().derived("quantile_sketches", build_quantile_sketches)
+        dimension = "country" if country else "cluster" if cluster else "all"
+        raw_keys = (country or cluster or "all").split(",")
+        try:
+            keys = sorted({sketches.normalize(dimension, key) for key in raw_keys if key.strip()}, key=str)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="cluster must be comma-separated integers")
+        found = [key for key in keys if key in sketches.groups[dimension]]
+        
+        results = {}
+        for field in requested_fields:
+            sketch = sketches.union(field, dimension, found)
+            values = sketch.quantiles([p / 100 for p in points]) if sketch else [None] * len(points)
+            results[field] = {
+                "count": sketch.n if sketch else 0,
+                "percentiles": {f"p{p:g}": value for p, value in zip(points, values)}
+            }
+        
+        return {
+            "dimension": dimension,
+            "groups": found,
+            "missing_groups": [key for key in keys if key not in sketches.groups[dimension]],
+            "fields": results,
+            "approximate_rank_error": round(1.7 / sketches.k, 4),
+            "data_version": sketches.version
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
 # 1. Get Recommendations by Restaurant Name (CATCH-ALL - MUST BE LAST)
 @router.get("/{restaurant_name}")
 def get_recommendations(restaurant_name: str, limit: int = 10):
@@ -2379,5 +1812,7 @@ def get_recommendations(restaurant_name: str, limit: int = 10):
         
         return recommendations
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
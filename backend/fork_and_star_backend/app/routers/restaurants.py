@@ -3,6 +3,10 @@ from google.cloud import bigquery
 from google.oauth2 import service_account
 import os
 from dotenv import load_dotenv
+from app.schemas.restaurant import LIST_FIELDS, SEARCH_FIELDS, parse_fields
+from app.services.profiler import ProfiledRoute
+from app.services.query_guard import GuardedClient
+from app.services.timing import span
 
 # Load environment variables
 load_dotenv(".fork_env")
@@ -30,7 +34,10 @@ try:
 except Exception as e:
     raise ValueError(f"Failed to load Google Cloud credentials: {e}")
 
-router = APIRouter(prefix="/restaurants", tags=["restaurants"])
+# Every query goes through the per-endpoint byte/latency budgets (QUERY_BUDGETS)
+client = GuardedClient(client)
+
+router = APIRouter(prefix="/restaurants", tags=["restaurants"], route_class=ProfiledRoute)
 
 @router.get("/")
 def get_restaurants(
@@ -41,11 +48,14 @@ def get_restaurants(
     badge: str = None,
     reputation_label: str = None,
     cluster: int = None,
-    order_by: str = "Recalculated_Score DESC"
+    order_by: str = "Recalculated_Score DESC",
+    fields: str = Query(None, description="Comma-separated columns to return, or 'all'; defaults to a lean list-view projection")
 ):
     try:
+        # Only the requested columns are read (BigQuery bills per column) and returned
+        columns = parse_fields(fields, LIST_FIELDS)
         query = f"""
-            SELECT *
+            SELECT {", ".join(columns)}
             FROM `{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}`
             WHERE TRUE
         """
@@ -63,25 +73,27 @@ def get_restaurants(
         query += f" ORDER BY {order_by} LIMIT {limit} OFFSET {skip}"
 
         rows = client.query(query).result()
-        return [dict(row) for row in rows]
+        with span("rows"):
+            return [dict(row) for row in rows]
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/search")
-def search_restaurants(q: str, limit: int = 10):
+def search_restaurants(
+    q: str,
+    limit: int = 10,
+    fields: str = Query(None, description="Comma-separated columns to return, or 'all'; defaults to a lean search projection")
+):
     try:
-        # Return complete restaurant data for search results
+        # Only the requested columns are read (BigQuery bills per column) and returned
+        columns = parse_fields(fields, SEARCH_FIELDS)
         query = f"""
-            SELECT 
-                ID as id,
-                Name as name,
-                Cuisine as cuisine,
-                Country as country,
-                City as city,
-                Reputation_Label as reputation,
-                Badge_List as badges,
-                Cluster as cluster
+            SELECT {", ".join(columns)}
             FROM `{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}`
             WHERE
                 LOWER(Name) LIKE '%{q.lower()}%' OR
@@ -91,7 +103,12 @@ def search_restaurants(q: str, limit: int = 10):
             LIMIT {limit}
         """
         rows = client.query(query).result()
-        return [dict(row) for row in rows]
+        with span("rows"):
+            return [dict(row) for row in rows]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -108,5 +125,7 @@ def get_stats():
         """
         row = list(client.query(query).result())[0]
         return dict(row)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
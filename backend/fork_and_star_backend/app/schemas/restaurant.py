@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 class RestaurantBase(BaseModel):
     name: str
@@ -23,4 +23,126 @@ class RestaurantOut(RestaurantBase):
     id: int
 
     class Config:
-        from_attributes = True  # ✅ This is the new way in Pydantic v2
\ No newline at end of file
+        from_attributes = True  # ✅ This is the new way in Pydantic v2
+
+
+# Columns of the restaurants table that clients may request with `fields=`
+RESTAURANT_COLUMNS = [
+    "ID",
+    "Name",
+    "City",
+    "Country",
+    "Cuisine",
+    "Reputation_Label",
+    "Badge_List",
+    "Cluster",
+    "Star_Rating",
+    "Recalculated_Score",
+    "Momentum_Score",
+]
+
+# Lean default projections for list views
+LIST_FIELDS = ["ID", "Name", "City", "Country", "Cuisine", "Reputation_Label", "Badge_List", "Star_Rating", "Momentum_Score"]
+SEARCH_FIELDS = ["ID", "Name", "City", "Country", "Cuisine", "Reputation_Label", "Badge_List"]
+
+
+def parse_fields(fields: Optional[str], default: List[str]) -> List[str]:
+    """
+    Resolve a comma-separated `fields=` value against RESTAURANT_COLUMNS (case-insensitive).
+    Empty means the default projection and "all" means every whitelisted column.
+    Raises ValueError for unknown columns.
+    """
+    if not fields or not fields.strip():
+        return list(default)
+    if fields.strip().lower() == "all":
+        return list(RESTAURANT_COLUMNS)
+    lookup = {column.lower(): column for column in RESTAURANT_COLUMNS}
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field.lower() not in lookup]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}. Choose from: {RESTAURANT_COLUMNS}")
+    return list(dict.fromkeys(lookup[field.lower()] for field in requested))
+
+
+# Response schemas for the large recommendation payloads. Endpoints build them with
+# model_construct (rows come from BigQuery or the snapshot, already typed) and render them
+# with pydantic-core directly, skipping per-field validation and jsonable_encoder.
+
+class MapPoint(BaseModel):
+    id: int
+    name: Optional[str] = None
+    x: Optional[float] = None
+    y: Optional[float] = None
+    cuisine: Optional[str] = None
+    country: Optional[str] = None
+    stars: Optional[float] = None
+    score: Optional[float] = None
+    cluster: Optional[int] = None
+    score_color: Optional[str] = None
+    badges: Optional[str] = None
+    reputation: Optional[str] = None
+    momentum: Optional[float] = None
+
+
+class ClusterMapSummary(BaseModel):
+    cluster_id: int
+    cluster_name: Optional[str] = None
+    restaurant_count: int
+    centroid_x: Optional[float] = None
+    centroid_y: Optional[float] = None
+    min_x: Optional[float] = None
+    max_x: Optional[float] = None
+    min_y: Optional[float] = None
+    max_y: Optional[float] = None
+    avg_stars: Optional[float] = None
+    avg_score: Optional[float] = None
+    top_cuisines: str = ""
+    top_countries: str = ""
+
+
+class HeatmapCell(BaseModel):
+    x: float
+    y: float
+    count: int
+    avg_stars: float
+    avg_score: float
+    cuisines: List[str]
+
+
+class DataFreshness(BaseModel):
+    data_version: int
+    built_at: str
+    age_seconds: float
+
+
+class DiscoveryMapResponse(BaseModel):
+    map_config: Dict[str, Any]
+    restaurants: List[MapPoint]
+    clusters: List[ClusterMapSummary]
+    cluster_profile_freshness: DataFreshness
+    heatmap_data: List[HeatmapCell]
+    visualization_layers: Dict[str, Any]
+
+
+class FilteredRestaurant(BaseModel):
+    id: int
+    name: Optional[str] = None
+    cuisine: Optional[str] = None
+    country: Optional[str] = None
+    reputation: Optional[str] = None
+    stars: Optional[float] = None
+    score_color: Optional[str] = None
+    badges: Optional[str] = None
+    momentum: Optional[str] = None
+    cluster: Optional[int] = None
+    score: Optional[float] = None
+
+
+class FilterResponse(BaseModel):
+    restaurants: List[FilteredRestaurant]
+    page: int
+    limit: int
+    total_results: int
+    # Only one of these is sent: the filters on a hit, the message when nothing matched
+    filters_applied: Optional[Dict[str, Any]] = None
+    message: Optional[str] = None
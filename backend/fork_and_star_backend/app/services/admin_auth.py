@@ -0,0 +1,13 @@
+import hmac
+import os
+from typing import Optional
+
+
+def admin_enabled() -> bool:
+    return bool(os.getenv("ADMIN_TOKEN"))
+
+
+def admin_token_valid(token: Optional[str]) -> bool:
+    """True when token matches ADMIN_TOKEN (always False while ADMIN_TOKEN is unset)"""
+    expected = os.getenv("ADMIN_TOKEN")
+    return bool(expected and token and hmac.compare_digest(token, expected))
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+from app.services.metrics import BREAKER_STATE
+
+# Thresholds over a sliding window of recent BigQuery calls
+BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "60"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+# Calls slower than BREAKER_SLOW_SECONDS count as slow; too many slow calls open the circuit too
+BREAKER_SLOW_SECONDS = float(os.getenv("BREAKER_SLOW_SECONDS", "10"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+# How long the circuit stays open before one trial call is let through
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    Closed: every call goes through and its outcome is recorded. Once the window holds at
+    least min_calls and the error or slow-call rate reaches its threshold the circuit opens and
+    calls are refused for open_seconds. Then it is half-open: a single trial call goes through,
+    and its outcome closes the circuit again or re-opens it.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = BREAKER_WINDOW_SECONDS,
+        min_calls: int = BREAKER_MIN_CALLS,
+        error_rate: float = BREAKER_ERROR_RATE,
+        slow_seconds: float = BREAKER_SLOW_SECONDS,
+        slow_rate: float = BREAKER_SLOW_RATE,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._trial_started: Optional[float] = None
+        # (finished_at, failed, slow) per call
+        self._calls = deque()
+        self._lock = threading.Lock()
+        BREAKER_STATE.set(_STATE_VALUES[CLOSED])
+
+    def _set_state(self, state: str):
+        self.state = state
+        BREAKER_STATE.set(_STATE_VALUES[state])
+
+    def _open(self, now: float):
+        self._set_state(OPEN)
+        self.opened_at = now
+        self._trial_started = None
+        self._calls.clear()
+
+    def allow(self) -> bool:
+        """Whether a call may go to BigQuery now"""
+        now = self.clock()
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at >= self.open_seconds:
+                self._set_state(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                # A trial that never reported back (e.g. answered from a cache) is replaced after a while
+                if self._trial_started is None or now - self._trial_started >= self.open_seconds:
+                    self._trial_started = now
+                    return True
+            return False
+
+    def record(self, seconds: float, failed: bool):
+        now = self.clock()
+        slow = seconds >= self.slow_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now)
+                else:
+                    self._set_state(CLOSED)
+                    self._trial_started = None
+                return
+            if self.state == OPEN:
+                return  # a call started before the circuit opened
+            self._calls.append((now, failed, slow))
+            while self._calls and now - self._calls[0][0] > self.window_seconds:
+                self._calls.popleft()
+            calls = len(self._calls)
+            if calls < self.min_calls:
+                return
+            errors = sum(1 for _, call_failed, _ in self._calls if call_failed)
+            slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+            if errors / calls >= self.error_rate or slow_calls / calls >= self.slow_rate:
+                self._open(now)
+
+    def retry_after(self) -> float:
+        """Seconds until the next trial call is allowed (0 unless open)"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(self.open_seconds - (self.clock() - self.opened_at), 0.0)
+
+    def status(self) -> dict:
+        with self._lock:
+            calls = len(self._calls)
+            errors = sum(1 for _, failed, _ in self._calls if failed)
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "window_error_rate": round(errors / calls, 3) if calls else 0.0,
+            }
+
+
+# Shared by every GuardedClient: they all talk to the same BigQuery
+bigquery_breaker = CircuitBreaker()
@@ -0,0 +1,173 @@
+import time
+import numpy as np
+from typing import List, Optional
+from app.services.snapshot import CatalogSnapshot
+from app.services.grouping import group_index, group_count, group_mean, group_min_max, group_top_labels, group_top_rows
+
+SAMPLE_FIELDS = {
+    "name": "name",
+    "cuisine": "cuisine",
+    "country": "country",
+    "stars": "stars",
+    "score": "score",
+}
+
+# Weights of the related-cluster distance (lower is more similar)
+UMAP_WEIGHT = 0.4
+STAR_WEIGHT = 0.3
+SCORE_WEIGHT = 0.2
+SIZE_WEIGHT = 0.1
+
+
+def _round(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+class ClusterProfiles:
+    """
+    Per-cluster aggregates and the cluster-to-cluster distance matrix for one snapshot.
+    Pass rows to profile a filtered subset of the catalog instead of all of it.
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot, rows: Optional[np.ndarray] = None):
+        self.version = snapshot.version
+        self.built_at = time.time()
+        cluster = snapshot["cluster"]
+        if rows is None:
+            rows = np.arange(snapshot.size)
+        rows = rows[~np.isnan(cluster[rows])]
+        self.cluster_ids, inverse = group_index(cluster[rows].astype(np.int64))
+        n = len(self.cluster_ids)
+        self.position = {int(cid): i for i, cid in enumerate(self.cluster_ids.tolist())}
+
+        self.counts = group_count(inverse, n)
+        self.avg_stars = group_mean(inverse, n, snapshot["stars"][rows])
+        self.avg_score = group_mean(inverse, n, snapshot["score"][rows])
+        self.avg_momentum = group_mean(inverse, n, snapshot["momentum"][rows])
+        self.centroid_x = group_mean(inverse, n, snapshot["umap_x"][rows])
+        self.centroid_y = group_mean(inverse, n, snapshot["umap_y"][rows])
+        self.min_x, self.max_x = group_min_max(inverse, n, snapshot["umap_x"][rows])
+        self.min_y, self.max_y = group_min_max(inverse, n, snapshot["umap_y"][rows])
+
+        self.descriptions = [labels[0] if labels else None for labels in group_top_labels(inverse, n, snapshot["cluster_label"], rows, 1)]
+        self.top_cuisines = group_top_labels(inverse, n, snapshot["cuisine"], rows, 5)
+        self.top_countries = group_top_labels(inverse, n, snapshot["country"], rows, 5)
+        self.top_reputations = group_top_labels(inverse, n, snapshot["reputation"], rows, 3)
+        self.samples = [
+            snapshot.records(sample_rows.tolist(), SAMPLE_FIELDS)
+            for sample_rows in group_top_rows(inverse, n, snapshot["score"], rows, k=3)
+        ]
+
+        # Pairwise component differences between every pair of clusters
+        self.umap_distance = np.sqrt(
+            (self.centroid_x[:, None] - self.centroid_x[None, :]) ** 2
+            + (self.centroid_y[:, None] - self.centroid_y[None, :]) ** 2
+        )
+        stars = np.round(self.avg_stars, 2)
+        score = np.round(self.avg_score, 2)
+        self.star_diff = np.abs(stars[:, None] - stars[None, :])
+        self.score_diff = np.abs(score[:, None] - score[None, :])
+        self.size_diff = np.abs(self.counts[:, None] - self.counts[None, :]).astype(np.float64)
+        self.distance = (
+            self.umap_distance * UMAP_WEIGHT
+            + self.star_diff * STAR_WEIGHT
+            + (self.score_diff / 10) * SCORE_WEIGHT
+            + (self.size_diff / 50) * SIZE_WEIGHT
+        )
+
+    def __contains__(self, cluster_id: int) -> bool:
+        return cluster_id in self.position
+
+    def metadata(self) -> dict:
+        """Staleness information for responses served from this store"""
+        return {
+            "data_version": self.version,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.built_at)),
+            "age_seconds": round(time.time() - self.built_at, 1),
+        }
+
+    def by_size(self) -> List[int]:
+        """Cluster ids ordered by restaurant count, largest first"""
+        order = np.lexsort((self.cluster_ids, -self.counts))
+        return [int(cid) for cid in self.cluster_ids[order]]
+
+    def map_summary(self, cluster_id: int) -> dict:
+        """Centroid, bounding box and headline stats for discovery maps"""
+        i = self.position[cluster_id]
+        return {
+            "cluster_id": cluster_id,
+            "cluster_name": self.descriptions[i],
+            "restaurant_count": int(self.counts[i]),
+            "centroid_x": _round(self.centroid_x[i], 6),
+            "centroid_y": _round(self.centroid_y[i], 6),
+            "min_x": _round(self.min_x[i], 6),
+            "max_x": _round(self.max_x[i], 6),
+            "min_y": _round(self.min_y[i], 6),
+            "max_y": _round(self.max_y[i], 6),
+            "avg_stars": _round(self.avg_stars[i]),
+            "avg_score": _round(self.avg_score[i]),
+            "top_cuisines": ",".join(self.top_cuisines[i]),
+            "top_countries": ",".join(self.top_countries[i]),
+        }
+
+    def profile(self, cluster_id: int) -> dict:
+        i = self.position[cluster_id]
+        return {
+            "cluster_id": cluster_id,
+            "cluster_description": self.descriptions[i],
+            "restaurant_count": int(self.counts[i]),
+            "avg_stars": _round(self.avg_stars[i]),
+            "avg_score": _round(self.avg_score[i]),
+            "top_cuisines": ",".join(self.top_cuisines[i]),
+            "top_countries": ",".join(self.top_countries[i]),
+            "top_reputations": ",".join(self.top_reputations[i]),
+            "avg_umap_x": _round(self.centroid_x[i], 6),
+            "avg_umap_y": _round(self.centroid_y[i], 6),
+        }
+
+    def related(self, cluster_id: int, limit: int = 3) -> List[dict]:
+        """Closest clusters to cluster_id by the weighted UMAP/stars/score/size distance"""
+        source = self.position[cluster_id]
+        distances = self.distance[source]
+        # NaN distances (clusters without coordinates or ratings) sort last, like NULLs in ORDER BY ASC
+        candidates = np.flatnonzero(np.arange(len(distances)) != source)
+        order = candidates[np.lexsort((distances[candidates], np.isnan(distances[candidates])))][:max(limit, 0)]
+
+        related = []
+        for i in order.tolist():
+            umap_distance = self.umap_distance[source, i]
+            star_diff = self.star_diff[source, i]
+            score_diff = self.score_diff[source, i]
+            if umap_distance < 1.0:
+                reason = "Geographically Similar"
+            elif star_diff < 0.3:
+                reason = "Similar Quality Level"
+            elif score_diff < 5:
+                reason = "Similar Overall Score"
+            else:
+                reason = "Thematically Related"
+
+            entry = self.profile(int(self.cluster_ids[i]))
+            entry.pop("avg_umap_x")
+            entry.pop("avg_umap_y")
+            entry.update({
+                "umap_distance": _round(umap_distance, 6),
+                "star_diff": _round(star_diff),
+                "score_diff": _round(score_diff),
+                "size_diff": int(self.size_diff[source, i]),
+                "similarity_score": _round(self.distance[source, i], 6),
+                "similarity_reason": reason,
+                "sample_restaurants": self.samples[i],
+            })
+            related.append(entry)
+        return related
+
+
+def build_cluster_profiles(snapshot: CatalogSnapshot) -> ClusterProfiles:
+    return ClusterProfiles(snapshot)
+
+
+def build_map_cluster_profiles(snapshot: CatalogSnapshot) -> ClusterProfiles:
+    """Profiles over the restaurants that have map coordinates, as shown on discovery maps"""
+    mask = ~np.isnan(snapshot["umap_x"]) & ~np.isnan(snapshot["umap_y"])
+    return ClusterProfiles(snapshot, rows=np.flatnonzero(mask))
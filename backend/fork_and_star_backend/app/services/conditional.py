@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode
+from app.services.request_context import current_endpoint
+from app.services.snapshot import SnapshotStore
+
+# Cache-Control per route template; every route listed here also gets an ETag and 304 handling.
+# Override or extend with CACHE_CONTROL, a JSON object of route -> header value (null disables).
+DEFAULT_CACHE_POLICIES: Dict[str, str] = {
+    "/recommendations/filters/options": "public, max-age=300, stale-while-revalidate=86400",
+    "/recommendations/tags": "public, max-age=300, stale-while-revalidate=86400",
+    "/recommendations/clusters/analysis": "public, max-age=60, stale-while-revalidate=3600",
+    "/recommendations/maps/discovery": "public, max-age=60, stale-while-revalidate=600",
+}
+
+# Query parameters that never change the payload
+IGNORED_PARAMS = {"_profile"}
+
+
+def load_cache_policies(raw: Optional[str] = None) -> Dict[str, str]:
+    """DEFAULT_CACHE_POLICIES overlaid with the CACHE_CONTROL environment variable"""
+    raw = os.getenv("CACHE_CONTROL") if raw is None else raw
+    policies = dict(DEFAULT_CACHE_POLICIES)
+    if raw:
+        try:
+            policies.update(json.loads(raw))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"CACHE_CONTROL is not valid JSON: {e}")
+    return {route: value for route, value in policies.items() if value}
+
+
+def normalized_query(query_string: bytes) -> str:
+    """Query string with parameters sorted and no-op ones dropped, so equivalent URLs share a key"""
+    pairs = parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+    return urlencode(sorted((k, v) for k, v in pairs if k not in IGNORED_PARAMS))
+
+
+def make_etag(content_hash: str, endpoint: str, query: str) -> str:
+    """Strong validator: same catalog data, route and parameters always render the same bytes"""
+    digest = hashlib.sha1(f"{endpoint}?{query}".encode("utf-8")).hexdigest()[:16]
+    return f'"{content_hash[:16]}-{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+class ConditionalGetMiddleware:
+    """
+    Pure ASGI middleware adding ETag and Cache-Control to the configured GET routes and
+    answering a matching If-None-Match with 304 before the endpoint runs (no query, no
+    rendering). The ETag comes from the content hash of the catalog snapshot the request is
+    pinned to, so it holds across workers and restarts rather than following the per-process
+    version counter.
+    """
+
+    def __init__(self, app, store: SnapshotStore, policies: Optional[Dict[str, str]] = None):
+        self.app = app
+        self.store = store
+        self.policies = load_cache_policies() if policies is None else policies
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        cache_control = self.policies.get(current_endpoint.get())
+        snapshot = self.store.pin_snapshot() if cache_control else None
+        if snapshot is None:
+            # Not a cached route, or no data to validate against yet
+            await self.app(scope, receive, send)
+            return
+
+        etag = make_etag(snapshot.content_hash, current_endpoint.get(), normalized_query(scope.get("query_string", b"")))
+        headers = dict(scope.get("headers") or [])
+        if_none_match = headers.get(b"if-none-match")
+        if if_none_match and etag_matches(if_none_match.decode("latin-1"), etag):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", etag.encode("latin-1")), (b"cache-control", cache_control.encode("latin-1"))],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                extra = [(b"etag", etag.encode("latin-1")), (b"cache-control", cache_control.encode("latin-1"))]
+                kept = [(k, v) for k, v in message.get("headers", []) if k.lower() not in (b"etag", b"cache-control")]
+                message = {**message, "headers": kept + extra}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,125 @@
+import numpy as np
+from typing import List, Optional
+from app.services.snapshot import CatalogSnapshot
+from app.services.sustainability import SustainabilityBaseline
+
+BASE_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "cuisine": "cuisine",
+    "country": "country",
+    "green_score": "green",
+    "stars": "stars",
+    "overall_score": "score",
+    "cluster": "cluster",
+    "umap_x": "umap_x",
+    "umap_y": "umap_y",
+    "badges": "badges",
+}
+
+RECOMMENDATION_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "cuisine": "cuisine",
+    "country": "country",
+    "green_score": "green",
+    "stars": "stars",
+    "overall_score": "score",
+    "cluster": "cluster",
+    "badges": "badges",
+    "reputation": "reputation",
+}
+
+# Columns of the candidate feature block
+GREEN, UMAP_X, UMAP_Y, STARS = range(4)
+
+
+def _optional(value: float, digits: int) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def find_base_restaurant(snapshot: CatalogSnapshot, restaurant_name: str) -> Optional[dict]:
+    """First restaurant whose name matches case-insensitively and that has a green score"""
+    rows = np.flatnonzero(snapshot["name"].mask(restaurant_name) & ~np.isnan(snapshot["green"]))
+    if len(rows) == 0:
+        return None
+    return snapshot.records([int(rows[0])], BASE_FIELDS)[0]
+
+
+class GreenCandidates:
+    """
+    Named restaurants at or above one green threshold, packed into a contiguous float32
+    feature block (green, umap_x, umap_y, stars) with the threshold's market context.
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot, baseline: SustainabilityBaseline, bucket: int):
+        self.snapshot = snapshot
+        qualifying = baseline.by_green[:bucket]
+        green = snapshot["green"][qualifying]
+        self.context = {
+            "avg_green_score": _optional(green.mean(), 3) if len(green) else None,
+            "total_green_restaurants": int(len(qualifying)),
+            "very_high_green_count": int(np.count_nonzero(green > 0.8)),
+            "high_green_count": int(np.count_nonzero(green > 0.6)),
+        }
+
+        self.rows = np.sort(qualifying[snapshot["name"].codes[qualifying] >= 0])
+        self.ids = snapshot.ids[self.rows]
+        self.features = np.ascontiguousarray(
+            np.column_stack([snapshot[column][self.rows] for column in ("green", "umap_x", "umap_y", "stars")]),
+            dtype=np.float32,
+        )
+        self.cuisine = snapshot["cuisine"].codes[self.rows]
+        self.country = snapshot["country"].codes[self.rows]
+
+    def recommend(self, base: dict, limit: int) -> List[dict]:
+        """Top candidates by the green recommendation score, best first"""
+        snapshot = self.snapshot
+        base_row = snapshot.row_by_id[base["id"]]
+        features = self.features
+        nan = np.float32(np.nan)
+        base_green, base_x, base_y = (
+            np.float32(nan if base[key] is None else base[key]) for key in ("green_score", "umap_x", "umap_y")
+        )
+        base_cuisine = snapshot["cuisine"].codes[base_row]
+        base_country = snapshot["country"].codes[base_row]
+
+        green_diff = np.abs(features[:, GREEN] - base_green)
+        geo_distance = np.sqrt((features[:, UMAP_X] - base_x) ** 2 + (features[:, UMAP_Y] - base_y) ** 2)
+        score = (
+            (1.0 - green_diff) * 0.4
+            + (1.0 / (1.0 + geo_distance)) * 0.2
+            + np.where((self.cuisine == base_cuisine) & (base_cuisine >= 0), 0.3, 0.0).astype(np.float32)
+            + np.where((self.country == base_country) & (base_country >= 0), 0.2, 0.0).astype(np.float32)
+            + (features[:, STARS] / 5.0) * 0.1
+        )
+
+        # Unscored candidates (missing stars or coordinates) sort last, like NULLs under ORDER BY DESC
+        keys = np.where(np.isnan(score), -np.inf, score)
+        keys[self.ids == base["id"]] = np.nan
+        eligible = np.flatnonzero(~np.isnan(keys))
+        k = min(max(limit, 0), len(eligible))
+        if k == 0:
+            return []
+        if k < len(eligible):
+            eligible = eligible[np.argpartition(-keys[eligible], k - 1)[:k]]
+        top = eligible[np.lexsort((self.ids[eligible], -keys[eligible]))]
+
+        recommendations = snapshot.records(self.rows[top].tolist(), RECOMMENDATION_FIELDS)
+        for recommendation, i in zip(recommendations, top.tolist()):
+            diff = float(green_diff[i])
+            if diff < 0.1:
+                level = "Very Similar Green Focus"
+            elif diff < 0.2:
+                level = "Similar Green Focus"
+            elif diff < 0.3:
+                level = "Moderately Green"
+            else:
+                level = "Different Green Level"
+            recommendation.update({
+                "recommendation_score": _optional(score[i], 6),
+                "green_similarity_level": level,
+                "geographic_distance": _optional(geo_distance[i], 2),
+                "green_score_difference": _optional(green_diff[i], 3),
+            })
+        return recommendations
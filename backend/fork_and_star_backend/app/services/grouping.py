@@ -0,0 +1,72 @@
+import numpy as np
+from typing import List, Tuple
+from app.services.snapshot import Categorical
+
+
+def group_index(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct group keys and, for every row, the position of its key (rows must be pre-filtered for NULLs)"""
+    return np.unique(keys, return_inverse=True)
+
+
+def group_count(inverse: np.ndarray, n_groups: int) -> np.ndarray:
+    return np.bincount(inverse, minlength=n_groups)
+
+
+def group_mean(inverse: np.ndarray, n_groups: int, values: np.ndarray) -> np.ndarray:
+    """NaN-aware per-group mean (NaN for groups with no non-NULL values), like SQL AVG"""
+    present = ~np.isnan(values)
+    sums = np.bincount(inverse[present], weights=values[present], minlength=n_groups)
+    counts = np.bincount(inverse[present], minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def group_min_max(inverse: np.ndarray, n_groups: int, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    lows = np.full(n_groups, np.inf)
+    highs = np.full(n_groups, -np.inf)
+    present = ~np.isnan(values)
+    np.minimum.at(lows, inverse[present], values[present])
+    np.maximum.at(highs, inverse[present], values[present])
+    lows[np.isinf(lows)] = np.nan
+    highs[np.isinf(highs)] = np.nan
+    return lows, highs
+
+
+def group_distinct(inverse: np.ndarray, n_groups: int, column: Categorical, rows: np.ndarray) -> np.ndarray:
+    """COUNT(DISTINCT column) per group"""
+    codes = column.codes[rows]
+    present = codes >= 0
+    n_categories = max(len(column.categories), 1)
+    pairs = np.unique(inverse[present].astype(np.int64) * n_categories + codes[present])
+    return np.bincount(pairs // n_categories, minlength=n_groups)
+
+
+def group_top_labels(inverse: np.ndarray, n_groups: int, column: Categorical, rows: np.ndarray, k: int) -> List[List[str]]:
+    """Most frequent labels per group (ties broken alphabetically), NULLs ignored"""
+    codes = column.codes[rows]
+    present = codes >= 0
+    n_categories = max(len(column.categories), 1)
+    pairs, counts = np.unique(inverse[present].astype(np.int64) * n_categories + codes[present], return_counts=True)
+    groups = pairs // n_categories
+    labels = pairs % n_categories
+    # Categories are sorted, so code order is alphabetical order
+    order = np.lexsort((labels, -counts, groups))
+    top: List[List[str]] = [[] for _ in range(n_groups)]
+    for group, label in zip(groups[order].tolist(), labels[order].tolist()):
+        if len(top[group]) < k:
+            top[group].append(str(column.categories[label]))
+    return top
+
+
+def group_top_rows(inverse: np.ndarray, n_groups: int, values: np.ndarray, rows: np.ndarray, k: int = None) -> List[np.ndarray]:
+    """Row indices per group ordered by values descending, NULLs dropped; first k only when k is given"""
+    present = ~np.isnan(values[rows])
+    kept_rows = rows[present]
+    kept_groups = inverse[present]
+    order = np.lexsort((-values[kept_rows], kept_groups))
+    sorted_rows = kept_rows[order]
+    bounds = np.searchsorted(kept_groups[order], np.arange(n_groups + 1))
+    return [
+        sorted_rows[bounds[g]:bounds[g + 1]] if k is None else sorted_rows[bounds[g]:min(bounds[g] + k, bounds[g + 1])]
+        for g in range(n_groups)
+    ]
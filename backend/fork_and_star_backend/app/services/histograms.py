@@ -0,0 +1,212 @@
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+from app.services.snapshot import CatalogSnapshot
+from app.services.grouping import group_index
+
+HISTOGRAM_FIELDS = {
+    "stars": "stars",
+    "score": "score",
+    "momentum": "momentum",
+    "green": "green",
+}
+
+HISTOGRAM_GROUPS = ["cluster", "country"]
+
+MAX_BINS = 200
+
+
+def _round(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def _edge(value: float):
+    """JSON-safe bin edge (open ends become None)"""
+    return None if np.isinf(value) else float(value)
+
+
+def parse_bins(spec: str) -> Tuple[Optional[int], Optional[Tuple[float, ...]]]:
+    """'10' -> 10 equal-width bins; '0,10,20,inf' -> explicit edges"""
+    parts = [part.strip() for part in spec.split(",") if part.strip()]
+    if len(parts) == 1:
+        try:
+            count = int(parts[0])
+        except ValueError:
+            raise ValueError(f"Invalid bins '{spec}': give a bin count or at least two comma-separated edges")
+        if not 1 <= count <= MAX_BINS:
+            raise ValueError(f"Bin count must be between 1 and {MAX_BINS}")
+        return count, None
+    try:
+        edges = tuple(float(part) for part in parts)
+    except ValueError:
+        raise ValueError(f"Invalid bins '{spec}': edges must be numbers")
+    if len(edges) < 2 or len(edges) - 1 > MAX_BINS:
+        raise ValueError(f"Give between 2 and {MAX_BINS + 1} bin edges")
+    if any(np.isnan(edge) for edge in edges) or any(b <= a for a, b in zip(edges, edges[1:])):
+        raise ValueError("Bin edges must be strictly increasing")
+    return None, edges
+
+
+def equal_width_edges(values: np.ndarray, count: int) -> np.ndarray:
+    present = values[~np.isnan(values)]
+    if len(present) == 0:
+        return np.linspace(0.0, 1.0, count + 1)
+    return np.histogram_bin_edges(present, bins=count)
+
+
+def bin_index(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Bin of each value like np.histogram (half-open bins, last bin closed); -1 when outside or NULL"""
+    n_bins = len(edges) - 1
+    index = np.searchsorted(edges, values, side="right") - 1
+    index[values == edges[-1]] = n_bins - 1
+    index[(index < 0) | (index >= n_bins) | np.isnan(values)] = -1
+    return index
+
+
+class Histogram:
+    """Per-bin count, min, max and mean of a field (and optionally the mean of a second measure), per group"""
+
+    def __init__(
+        self,
+        snapshot: CatalogSnapshot,
+        field: str,
+        edges: Sequence[float],
+        group_by: Optional[str] = None,
+        measure: Optional[str] = None,
+    ):
+        self.field = field
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.group_by = group_by
+        self.measure = measure
+        values = snapshot[HISTOGRAM_FIELDS[field]]
+        n_bins = len(self.edges) - 1
+
+        bins = bin_index(values, self.edges)
+        rows = np.flatnonzero(bins >= 0)
+        if group_by == "cluster":
+            cluster = snapshot["cluster"]
+            rows = rows[~np.isnan(cluster[rows])]
+            keys, groups = group_index(cluster[rows].astype(np.int64))
+            self.keys = [int(key) for key in keys.tolist()]
+        elif group_by is not None:
+            labels = snapshot[group_by]
+            rows = rows[labels.codes[rows] >= 0]
+            keys, groups = group_index(labels.codes[rows])
+            self.keys = [str(labels.categories[key]) for key in keys.tolist()]
+        else:
+            groups = np.zeros(len(rows), dtype=np.int64)
+            self.keys = [None]
+
+        # One pass: every statistic is a bincount over the flattened (group, bin) cell
+        n_cells = len(self.keys) * n_bins
+        cells = groups * n_bins + bins[rows]
+        selected = values[rows]
+        self.counts = np.bincount(cells, minlength=n_cells).reshape(-1, n_bins)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.means = (np.bincount(cells, weights=selected, minlength=n_cells).reshape(-1, n_bins) / self.counts)
+        lows = np.full(n_cells, np.inf)
+        highs = np.full(n_cells, -np.inf)
+        np.minimum.at(lows, cells, selected)
+        np.maximum.at(highs, cells, selected)
+        self.mins = np.where(np.isinf(lows), np.nan, lows).reshape(-1, n_bins)
+        self.maxs = np.where(np.isinf(highs), np.nan, highs).reshape(-1, n_bins)
+
+        self.measure_means = None
+        if measure is not None:
+            extra = snapshot[HISTOGRAM_FIELDS[measure]][rows]
+            present = ~np.isnan(extra)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self.measure_means = (
+                    np.bincount(cells[present], weights=extra[present], minlength=n_cells)
+                    / np.bincount(cells[present], minlength=n_cells)
+                ).reshape(-1, n_bins)
+
+    def buckets(self, g: int = 0, non_empty: bool = False) -> List[dict]:
+        buckets = []
+        for b in range(len(self.edges) - 1):
+            count = int(self.counts[g, b])
+            if non_empty and count == 0:
+                continue
+            bucket = {
+                "lower": _edge(self.edges[b]),
+                "upper": _edge(self.edges[b + 1]),
+                "count": count,
+                "min": _optional(self.mins[g, b]),
+                "max": _optional(self.maxs[g, b]),
+                "avg": _round(self.means[g, b]),
+            }
+            if self.measure_means is not None:
+                bucket[f"avg_{self.measure}"] = _round(self.measure_means[g, b])
+            buckets.append(bucket)
+        return buckets
+
+    def to_dict(self) -> dict:
+        result = {
+            "field": self.field,
+            "edges": [_edge(edge) for edge in self.edges.tolist()],
+            "group_by": self.group_by,
+            "measure": self.measure,
+        }
+        if self.group_by is None:
+            result["total"] = int(self.counts[0].sum())
+            result["buckets"] = self.buckets()
+        else:
+            result["groups"] = [
+                {"group": key, "total": int(self.counts[g].sum()), "buckets": self.buckets(g)}
+                for g, key in enumerate(self.keys)
+            ]
+        return result
+
+
+def build_histogram(snapshot: CatalogSnapshot, field: str, bins: str, group_by: Optional[str] = None, measure: Optional[str] = None) -> Histogram:
+    """Validate a bin spec and compute its histogram (raises ValueError for bad specs)"""
+    if field not in HISTOGRAM_FIELDS:
+        raise ValueError(f"Invalid field. Choose from: {list(HISTOGRAM_FIELDS.keys())}")
+    if measure is not None and measure not in HISTOGRAM_FIELDS:
+        raise ValueError(f"Invalid measure. Choose from: {list(HISTOGRAM_FIELDS.keys())}")
+    if group_by is not None and group_by not in HISTOGRAM_GROUPS:
+        raise ValueError(f"Invalid group_by. Choose from: {HISTOGRAM_GROUPS}")
+    count, edges = parse_bins(bins)
+    if edges is None:
+        edges = equal_width_edges(snapshot[HISTOGRAM_FIELDS[field]], count)
+    return Histogram(snapshot, field, edges, group_by, measure)
+
+
+# Fixed buckets of the /metrics/score-distribution dashboard
+SCORE_BUCKET_EDGES = [-np.inf, 10, 20, 30, 40, 50, 60, 70, 80, 90, np.inf]
+SCORE_BUCKET_LABELS = ["0-10", "10-20", "20-30", "30-40", "40-50", "50-60", "60-70", "70-80", "80-90", "90-100"]
+
+
+def half_star_edges(stars: np.ndarray) -> np.ndarray:
+    """0.5-wide edges covering every rating, so each rating falls in [FLOOR(stars * 2) / 2, +0.5)"""
+    present = stars[~np.isnan(stars)]
+    if len(present) == 0:
+        return np.array([0.0, 0.5])
+    low = np.floor(present.min() * 2) / 2
+    high = np.floor(present.max() * 2) / 2 + 0.5
+    return np.arange(int(round((high - low) * 2)) + 1) * 0.5 + low
+
+
+def build_score_distribution(snapshot: CatalogSnapshot) -> dict:
+    """Star (0.5 increments) and score (10-point) buckets, non-empty only"""
+    stars = Histogram(snapshot, "stars", half_star_edges(snapshot["stars"]), measure="score")
+    scores = Histogram(snapshot, "score", SCORE_BUCKET_EDGES)
+    star_dist = [
+        {"star_bucket": bucket["lower"], "count": bucket["count"], "avg_calculated_score": bucket["avg_score"]}
+        for bucket in stars.buckets(non_empty=True)
+    ]
+    score_dist = [
+        {
+            "score_bucket": label,
+            "count": bucket["count"],
+            "min_score": bucket["min"],
+            "max_score": bucket["max"],
+            "avg_score": bucket["avg"],
+        }
+        for label, bucket in zip(SCORE_BUCKET_LABELS, scores.buckets())
+        if bucket["count"] > 0
+    ]
+    return {"star_rating": star_dist, "calculated_score": score_dist}
@@ -0,0 +1,125 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from app.services.snapshot import CatalogSnapshot
+
+METRIC_COLUMNS = {
+    "stars": "stars",
+    "score": "score",
+    "momentum": "momentum",
+    "green": "green",
+}
+
+# "all" is the single global partition; the rest partition the catalog by label or cluster id
+PARTITIONS = ["all", "country", "cuisine", "cluster"]
+
+PartitionKey = Tuple[str, object]
+
+
+def _partition_keys(snapshot: CatalogSnapshot, dimension: str) -> np.ndarray:
+    """Per-row partition key (None when the row has no value for the dimension)"""
+    if dimension == "all":
+        return np.full(snapshot.size, "all", dtype=object)
+    if dimension == "cluster":
+        cluster = snapshot["cluster"]
+        return np.array([None if np.isnan(c) else int(c) for c in cluster.tolist()], dtype=object)
+    labels = snapshot[dimension]
+    # Match LOWER(x) = LOWER(@x) semantics used by the rest of the API
+    lowered = np.array([c.lower() for c in labels.categories.tolist()] + [None], dtype=object)
+    return lowered[labels.codes]
+
+
+def _members(keys: np.ndarray) -> Dict[object, np.ndarray]:
+    present = np.flatnonzero(keys != None)  # noqa: E711 - element-wise comparison on an object array
+    if len(present) == 0:
+        return {}
+    order = present[np.argsort(keys[present].astype(str), kind="stable")]
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    ends = np.r_[starts[1:], len(order)]
+    return {sorted_keys[s]: order[s:e] for s, e in zip(starts, ends)}
+
+
+class Leaderboards:
+    """
+    Base_IDs ranked by each metric, globally and per country/cuisine/cluster partition.
+    Built incrementally from the previous data version: only partitions that gained,
+    lost or changed a restaurant are re-sorted.
+    """
+
+    incremental = True
+
+    def __init__(self, snapshot: CatalogSnapshot, previous: Optional["Leaderboards"] = None):
+        self.version = snapshot.version
+        order = np.argsort(snapshot.ids, kind="stable")
+        self.ids = snapshot.ids[order]
+        self.values = {metric: snapshot[column][order] for metric, column in METRIC_COLUMNS.items()}
+        self.keys = {dimension: _partition_keys(snapshot, dimension)[order] for dimension in PARTITIONS}
+        self.boards: Dict[str, Dict[PartitionKey, np.ndarray]] = {metric: {} for metric in METRIC_COLUMNS}
+        self.rebuilt_partitions = 0
+
+        changed = self._changed_ids(previous)
+        for dimension in PARTITIONS:
+            members = _members(self.keys[dimension])
+            affected = self._affected(dimension, changed, previous)
+            for key, rows in members.items():
+                partition = (dimension, key)
+                reusable = previous is not None and partition not in affected and partition in previous.boards["score"]
+                if not reusable:
+                    self.rebuilt_partitions += 1
+                for metric in METRIC_COLUMNS:
+                    self.boards[metric][partition] = (
+                        previous.boards[metric][partition] if reusable else self._rank(rows, self.values[metric])
+                    )
+
+        # Decided once per data version instead of with a COUNT(*) on every request
+        momentum = self.values["momentum"]
+        self.has_positive_momentum = bool(np.any(momentum[~np.isnan(momentum)] > 0))
+
+    def _rank(self, rows: np.ndarray, values: np.ndarray) -> np.ndarray:
+        rows = rows[~np.isnan(values[rows])]
+        return self.ids[rows[np.lexsort((self.ids[rows], -values[rows]))]]
+
+    def _changed_ids(self, previous: Optional["Leaderboards"]) -> np.ndarray:
+        """Base_IDs added, removed, or whose metrics or partition keys moved since previous"""
+        if previous is None or len(previous.ids) == 0:
+            return self.ids
+        position = np.minimum(np.searchsorted(previous.ids, self.ids), len(previous.ids) - 1)
+        existed = previous.ids[position] == self.ids
+        changed = ~existed
+        for metric, values in self.values.items():
+            before = previous.values[metric][position]
+            same = (before == values) | (np.isnan(before) & np.isnan(values))
+            changed |= existed & ~same
+        for dimension, keys in self.keys.items():
+            changed |= existed & (previous.keys[dimension][position] != keys)
+        removed = np.setdiff1d(previous.ids, self.ids, assume_unique=True)
+        return np.union1d(self.ids[changed], removed)
+
+    def _affected(self, dimension: str, changed: np.ndarray, previous: Optional["Leaderboards"]) -> set:
+        """Partitions of dimension that contain a changed Base_ID before or after the refresh"""
+        if previous is None:
+            return set()
+        affected = set()
+        for board in (self, previous):
+            rows = np.flatnonzero(np.isin(board.ids, changed))
+            affected.update((dimension, key) for key in board.keys[dimension][rows].tolist() if key is not None)
+        return affected
+
+    def top_ids(self, metric: str, dimension: str = "all", key: object = "all", limit: int = 10) -> np.ndarray:
+        """First `limit` Base_IDs of a partition, best first (an O(K) slice)"""
+        if isinstance(key, str) and dimension != "all":
+            key = key.lower()
+        board = self.boards[metric].get((dimension, key))
+        if board is None:
+            return np.empty(0, dtype=np.int64)
+        return board[:max(limit, 0)]
+
+    def positive_top_ids(self, metric: str, limit: int = 10) -> List[int]:
+        """Global top Base_IDs whose metric is strictly positive"""
+        ids = self.top_ids(metric, limit=limit)
+        values = self.values[metric][np.searchsorted(self.ids, ids)]
+        return ids[values > 0].tolist()
+
+
+def build_leaderboards(snapshot: CatalogSnapshot) -> Leaderboards:
+    return Leaderboards(snapshot, previous=snapshot.inherited("leaderboards"))
@@ -0,0 +1,189 @@
+import numpy as np
+from scipy import sparse
+from typing import List, Optional
+from app.services.snapshot import CatalogSnapshot
+
+# Refuse grids that would not fit comfortably in memory (tiny umap_grid_size values)
+MAX_GRID_CELLS = 1_000_000
+
+HIGH_OPPORTUNITY_MIN_STARS = 4.0
+
+
+def _round(value: float, digits: int) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _box3(grid: np.ndarray) -> np.ndarray:
+    """Sum over each cell's 3x3 neighbourhood (zero padded), i.e. a convolution with a ones kernel"""
+    padded = np.pad(grid, 1)
+    rows, cols = grid.shape
+    return sum(padded[dx:dx + rows, dy:dy + cols] for dx in range(3) for dy in range(3))
+
+
+def _distinct_labels(snapshot: CatalogSnapshot, column: str, rows: np.ndarray, limit: int) -> str:
+    """Alphabetical distinct labels, like STRING_AGG(DISTINCT x ORDER BY x LIMIT n)"""
+    labels = snapshot[column]
+    codes = np.unique(labels.codes[rows])
+    codes = codes[codes >= 0][:limit]
+    return ",".join(labels.categories[codes].tolist())
+
+
+def geographic_gaps(snapshot: CatalogSnapshot, grid_size: float, min_threshold: int, min_star_rating: float, limit: int = 20) -> List[dict]:
+    """
+    Opportunity cells on a UMAP grid: a 2-D histogram of restaurants plus 3x3 neighbour
+    averages over occupied cells, replacing the cell-by-cell self-join.
+    """
+    if grid_size <= 0:
+        raise ValueError("umap_grid_size must be positive")
+
+    x, y = snapshot["umap_x"], snapshot["umap_y"]
+    rows = np.flatnonzero(~np.isnan(x) & ~np.isnan(y))
+    if len(rows) == 0:
+        return []
+
+    gx = np.floor(x[rows] / grid_size).astype(np.int64)
+    gy = np.floor(y[rows] / grid_size).astype(np.int64)
+    origin_x, origin_y = gx.min(), gy.min()
+    width, height = int(gx.max() - origin_x + 1), int(gy.max() - origin_y + 1)
+    if width * height > MAX_GRID_CELLS:
+        raise ValueError(
+            f"umap_grid_size {grid_size} produces {width * height} grid cells (max {MAX_GRID_CELLS}); use a larger grid size"
+        )
+    cell = (gx - origin_x) * height + (gy - origin_y)
+    n_cells = width * height
+
+    stars = snapshot["stars"][rows]
+    score = snapshot["score"][rows]
+    rated = ~np.isnan(stars)
+    scored = ~np.isnan(score)
+
+    counts = np.bincount(cell, minlength=n_cells).reshape(width, height)
+    star_counts = np.bincount(cell[rated], minlength=n_cells).reshape(width, height)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_stars = np.bincount(cell[rated], weights=stars[rated], minlength=n_cells).reshape(width, height) / star_counts
+        avg_score = (
+            np.bincount(cell[scored], weights=score[scored], minlength=n_cells)
+            / np.bincount(cell[scored], minlength=n_cells)
+        ).reshape(width, height)
+
+    cuisine_codes = snapshot["cuisine"].codes[rows]
+    has_cuisine = cuisine_codes >= 0
+    distinct_pairs = np.unique(cell[has_cuisine] * max(len(snapshot["cuisine"].categories), 1) + cuisine_codes[has_cuisine])
+    cuisine_diversity = np.bincount(
+        distinct_pairs // max(len(snapshot["cuisine"].categories), 1), minlength=n_cells
+    ).reshape(width, height)
+
+    # Neighbour averages over occupied cells only, excluding the cell itself
+    occupied = (counts > 0).astype(np.float64)
+    has_stars = ~np.isnan(avg_stars)
+    neighbour_cells = _box3(occupied) - occupied
+    neighbour_star_cells = _box3(has_stars.astype(np.float64)) - has_stars
+    stars_filled = np.where(has_stars, avg_stars, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        neighbor_avg_count = np.where(neighbour_cells > 0, (_box3(counts.astype(np.float64)) - counts) / neighbour_cells, np.nan)
+        neighbor_avg_stars = np.where(neighbour_star_cells > 0, (_box3(stars_filled) - stars_filled) / neighbour_star_cells, np.nan)
+
+    # Same precedence as the original CASE expression; NaN comparisons are false like NULLs.
+    # Only occupied cells are graded, so the "Underserved Area" (empty cell) branch never applies.
+    below = (counts > 0) & (counts < min_threshold)
+    high = below & (neighbor_avg_count >= min_threshold) & (neighbor_avg_stars >= HIGH_OPPORTUNITY_MIN_STARS)
+    medium = below & (neighbor_avg_count >= 2) & ~high
+    opportunity_score = np.select([high, medium], [100, 75], default=10)
+    levels = np.select([high, medium], ["High Opportunity", "Medium Opportunity"], default="Saturated")
+
+    # min_star_rating drops cells whose rated neighbours average below it
+    candidate = (high | medium) & ~(neighbor_avg_stars < min_star_rating)
+    cx, cy = np.nonzero(candidate)
+    order = np.lexsort((
+        cy,
+        cx,
+        -np.nan_to_num(neighbor_avg_stars[cx, cy], nan=-np.inf),
+        -opportunity_score[cx, cy],
+    ))[:limit]
+
+    gaps = []
+    for i, j in zip(cx[order].tolist(), cy[order].tolist()):
+        members = rows[cell == i * height + j]
+        gaps.append({
+            "grid_x": float((i + origin_x) * grid_size),
+            "grid_y": float((j + origin_y) * grid_size),
+            "restaurant_count": int(counts[i, j]),
+            "avg_stars": _round(avg_stars[i, j], 2),
+            "avg_score": _round(avg_score[i, j], 2),
+            "cuisine_diversity": int(cuisine_diversity[i, j]),
+            "cuisines_present": _distinct_labels(snapshot, "cuisine", members, 5) or None,
+            "countries_present": _distinct_labels(snapshot, "country", members, 3) or None,
+            "neighbor_avg_count": _round(neighbor_avg_count[i, j], 1),
+            "neighbor_avg_stars": _round(neighbor_avg_stars[i, j], 2),
+            "opportunity_level": str(levels[i, j]),
+            "opportunity_score": int(opportunity_score[i, j]),
+        })
+    return gaps
+
+
+def cuisine_gaps(snapshot: CatalogSnapshot, limit: int = 15) -> List[dict]:
+    """Popular cuisines (present in 3+ countries) missing from established markets (10+ restaurants)"""
+    countries, cuisines = snapshot["country"], snapshot["cuisine"]
+    rows = np.flatnonzero((countries.codes >= 0) & (cuisines.codes >= 0))
+    if len(rows) == 0:
+        return []
+    shape = (len(countries.categories), len(cuisines.categories))
+    r, c = countries.codes[rows], cuisines.codes[rows]
+    stars = snapshot["stars"][rows]
+    rated = ~np.isnan(stars)
+
+    # Sparse country x cuisine presence; duplicate entries are summed on conversion
+    presence = sparse.coo_matrix((np.ones(len(rows)), (r, c)), shape=shape).tocsr()
+    star_sums = sparse.coo_matrix((stars[rated], (r[rated], c[rated])), shape=shape).tocsr()
+    star_counts = sparse.coo_matrix((np.ones(int(rated.sum())), (r[rated], c[rated])), shape=shape).tocsr()
+
+    country_totals = np.asarray(presence.sum(axis=1)).ravel()
+    # Country average of its per-cuisine average stars (cells without ratings are skipped)
+    cell_counts = star_counts.tocoo()
+    cell_avg = np.asarray(star_sums[cell_counts.row, cell_counts.col]).ravel() / cell_counts.data
+    rated_cells = np.bincount(cell_counts.row, minlength=shape[0])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        country_avg_stars = np.bincount(cell_counts.row, weights=cell_avg, minlength=shape[0]) / rated_cells
+
+    countries_present = np.diff(presence.tocsc().indptr)
+    global_counts = np.asarray(presence.sum(axis=0)).ravel()
+    popular = np.flatnonzero(countries_present >= 3)
+    popular = popular[np.lexsort((popular, -global_counts[popular]))][:10]
+
+    established = np.flatnonzero(country_totals >= 10)
+    missing = presence[established][:, popular].toarray() == 0
+    ci, pi = np.nonzero(missing)
+    country_rows, cuisine_cols = established[ci], popular[pi]
+    scores = np.round(country_avg_stars[country_rows] * global_counts[cuisine_cols] / 100, 2)
+    # Countries without any rating have no score and sort last, like NULLs under ORDER BY DESC
+    order = np.lexsort((cuisine_cols, country_rows, -np.nan_to_num(scores, nan=-np.inf)))[:limit]
+
+    return [
+        {
+            "country": str(countries.categories[country_rows[k]]),
+            "cuisine": str(cuisines.categories[cuisine_cols[k]]),
+            "country_total_restaurants": int(country_totals[country_rows[k]]),
+            "country_avg_stars": _round(country_avg_stars[country_rows[k]], 2),
+            "cuisine_global_popularity": int(global_counts[cuisine_cols[k]]),
+            "gap_type": "Missing Popular Cuisine",
+            "opportunity_score": _round(scores[k], 2),
+        }
+        for k in order.tolist()
+    ]
+
+
+def market_overview(snapshot: CatalogSnapshot) -> dict:
+    x, y = snapshot["umap_x"], snapshot["umap_y"]
+    cluster = snapshot["cluster"]
+    stars = snapshot["stars"]
+    return {
+        "total_restaurants": snapshot.size,
+        "total_cuisines": len(snapshot["cuisine"].categories),
+        "total_countries": len(snapshot["country"].categories),
+        "total_clusters": len(np.unique(cluster[~np.isnan(cluster)])),
+        "avg_stars": _round(np.nanmean(stars), 2) if np.any(~np.isnan(stars)) else None,
+        "min_umap_x": _round(np.nanmin(x), 2) if np.any(~np.isnan(x)) else None,
+        "max_umap_x": _round(np.nanmax(x), 2) if np.any(~np.isnan(x)) else None,
+        "min_umap_y": _round(np.nanmin(y), 2) if np.any(~np.isnan(y)) else None,
+        "max_umap_y": _round(np.nanmax(y), 2) if np.any(~np.isnan(y)) else None,
+    }
@@ -0,0 +1,149 @@
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.responses import Response
+from app.services.request_context import current_endpoint, resolve_endpoint
+from app.services.serialization import ORJSONResponse
+from app.services.timing import span
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+BYTE_BUCKETS = [10 ** 6, 10 ** 7, 10 ** 8, 10 ** 9, 10 ** 10, 10 ** 11, 10 ** 12]
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "endpoint", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+QUERY_WALL_TIME = Histogram(
+    "bigquery_query_duration_seconds",
+    "Wall time from job submission until rows are available",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+QUERY_BYTES = Histogram(
+    "bigquery_bytes_processed",
+    "Bytes processed per query",
+    ["endpoint"],
+    buckets=BYTE_BUCKETS,
+)
+QUERY_SLOT_MS = Histogram(
+    "bigquery_slot_milliseconds",
+    "Slot milliseconds consumed per query",
+    ["endpoint"],
+    buckets=[10, 100, 1000, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7],
+)
+QUERY_ROWS = Histogram(
+    "bigquery_result_rows",
+    "Rows returned per query",
+    ["endpoint"],
+    buckets=[1, 10, 100, 1000, 10 ** 4, 10 ** 5, 10 ** 6],
+)
+QUERY_CACHE_HITS = Counter(
+    "bigquery_queries_total",
+    "Queries run, by whether BigQuery answered from its result cache",
+    ["endpoint", "cache_hit"],
+)
+
+ESTIMATED_BYTES = Histogram(
+    "bigquery_estimated_bytes",
+    "Bytes BigQuery would process, from dry runs of budgeted queries",
+    ["endpoint"],
+    buckets=BYTE_BUCKETS,
+)
+BUDGET_DECISIONS = Counter(
+    "bigquery_budget_decisions_total",
+    "Outcome of per-endpoint query budget checks",
+    ["endpoint", "decision"],
+)
+BREAKER_STATE = Gauge(
+    "bigquery_circuit_state",
+    "BigQuery circuit breaker state (0 closed, 1 half-open, 2 open)",
+)
+STALE_RESULTS = Counter(
+    "bigquery_stale_results_total",
+    "Queries answered with the last good result because BigQuery was unavailable",
+    ["endpoint", "reason"],
+)
+
+SNAPSHOT_VERSION = Gauge(
+    "catalog_data_version",
+    "Data version of the catalog snapshot being served",
+)
+SNAPSHOT_REFRESH_SECONDS = Histogram(
+    "catalog_refresh_duration_seconds",
+    "Time to reload and prewarm a new catalog snapshot in the background",
+    buckets=LATENCY_BUCKETS,
+)
+
+SERIALIZATION_TIME = Histogram(
+    "http_response_serialization_seconds",
+    "Time spent encoding response bodies",
+    ["endpoint"],
+    buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1],
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Lookups in in-process caches",
+    ["cache", "result"],
+)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_query(endpoint: str, job, started: float, rows: int = None):
+    """Observe wall time and job statistics once a query's rows are available"""
+    QUERY_WALL_TIME.labels(endpoint).observe(time.perf_counter() - started)
+    bytes_processed = getattr(job, "total_bytes_processed", None)
+    if bytes_processed is not None:
+        QUERY_BYTES.labels(endpoint).observe(bytes_processed)
+    slot_millis = getattr(job, "slot_millis", None)
+    if slot_millis is not None:
+        QUERY_SLOT_MS.labels(endpoint).observe(slot_millis)
+    if rows is not None:
+        QUERY_ROWS.labels(endpoint).observe(rows)
+    QUERY_CACHE_HITS.labels(endpoint, str(bool(getattr(job, "cache_hit", False))).lower()).inc()
+
+
+class TimedJSONResponse(ORJSONResponse):
+    """ORJSONResponse that records how long encoding the body took"""
+
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        with span("serialize"):
+            body = super().render(content)
+        SERIALIZATION_TIME.labels(current_endpoint.get()).observe(time.perf_counter() - started)
+        return body
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware observing request latency per method, route template and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(scope["method"], resolve_endpoint(scope), str(status["code"])).observe(
+                time.perf_counter() - started
+            )
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,221 @@
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+from urllib.parse import parse_qsl
+from fastapi.routing import APIRoute
+from app.services.admin_auth import admin_token_valid
+
+# Seconds between stack samples while a request is being profiled
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "2")) / 1000
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_FLAG = "_profile"
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the Python stacks that belong to one request from a background thread.
+
+    A thread's stack belongs to the request when it passes through the request's own
+    middleware frame (work on the event loop) or when it is the threadpool thread that
+    ProfiledRoute recorded for this request's sync endpoint. Stacks are trimmed to start
+    at that frame and counted in collapsed ("folded") form, outermost frame first.
+    """
+
+    def __init__(self, request_frame, scope, interval: float = PROFILE_INTERVAL):
+        self.request_frame = request_frame
+        self.scope = scope
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        # Idents of the threads running this request's sync endpoint right now
+        self.threads = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            endpoint = self.scope.get("endpoint")
+            endpoint_code = getattr(inspect.unwrap(endpoint), "__code__", None) if endpoint is not None else None
+            threads = set(self.threads)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = self._request_stack(frame, endpoint_code if thread_id in threads else None)
+                if stack:
+                    self.stacks[";".join(stack)] += 1
+                    self.samples += 1
+
+    def _request_stack(self, frame, endpoint_code) -> Optional[List[str]]:
+        """Stack from the request frame, or from endpoint_code on this request's endpoint thread"""
+        labels = []
+        while frame is not None:
+            labels.append(_label(frame))
+            if frame is self.request_frame or (endpoint_code is not None and frame.f_code is endpoint_code):
+                labels.reverse()
+                return labels
+            frame = frame.f_back
+        return None
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def self_time(self, limit: int = 20) -> List[dict]:
+        """Functions by samples spent in the function itself (the leaf of the stack)"""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [
+            {"function": name, "samples": count, "share": round(count / self.samples, 4)}
+            for name, count in leaves.most_common(limit)
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "interval_ms": self.interval * 1000,
+            "duration_ms": round(self.duration * 1000, 2),
+            "samples": self.samples,
+            "top_self": self.self_time(),
+            "collapsed": self.collapsed(),
+        }
+
+
+# Sampler of the request being profiled; copied into the threadpool thread that runs a sync endpoint
+current_sampler: ContextVar[Optional[StackSampler]] = ContextVar("current_sampler", default=None)
+
+
+def _record_thread(endpoint: Callable) -> Callable:
+    """Wrap a sync endpoint so a profiled request's sampler knows which thread runs it"""
+
+    @functools.wraps(endpoint)
+    def call(*args, **kwargs):
+        sampler = current_sampler.get()
+        if sampler is None:
+            return endpoint(*args, **kwargs)
+        thread_id = threading.get_ident()
+        sampler.threads.add(thread_id)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            sampler.threads.discard(thread_id)
+
+    return call
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose sync endpoint records its thread for the profiler (async endpoints run on the event loop)"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = _record_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def profile_requested(scope) -> bool:
+    """X-Profile header or ?_profile=1, from a caller holding the admin token"""
+    query_string = scope.get("query_string", b"")
+    raw_headers = scope.get("headers") or []
+    # Cheap pre-check so ordinary requests skip the parsing below
+    if PROFILE_QUERY_FLAG.encode() not in query_string and not any(name == PROFILE_HEADER for name, _ in raw_headers):
+        return False
+    headers = dict(raw_headers)
+    flag = headers.get(PROFILE_HEADER, b"").decode("latin-1")
+    if not flag:
+        query = dict(parse_qsl(query_string.decode("latin-1")))
+        flag = query.get(PROFILE_QUERY_FLAG, "")
+    if flag.lower() not in ("1", "true", "yes"):
+        return False
+    return admin_token_valid(headers.get(b"x-admin-token", b"").decode("latin-1"))
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware that runs an admin's request under the stack sampler and returns
+    {"status", "response", "profile"} in place of the original body. Requests without the
+    flag pass straight through without any sampling; one profile runs at a time.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            self._busy.release()
+
+    async def _profile(self, scope, receive, send):
+        start_message = {}
+        body = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+            elif message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+
+        sampler = StackSampler(sys._getframe(), scope)
+        token = current_sampler.set(sampler)
+        sampler.start()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            sampler.stop()
+            current_sampler.reset(token)
+
+        raw = b"".join(body)
+        headers = dict(start_message.get("headers", []))
+        if headers.get(b"content-type", b"").startswith(b"application/json"):
+            try:
+                response = json.loads(raw)
+            except ValueError:
+                response = raw.decode("utf-8", "replace")
+        else:
+            response = raw.decode("utf-8", "replace")
+        payload = json.dumps({
+            "status": start_message.get("status", 500),
+            "response": response,
+            "profile": sampler.to_dict(),
+        }).encode("utf-8")
+
+        # Keep the inner headers (Server-Timing and the like) apart from the ones describing the body
+        kept = [
+            (name, value) for name, value in start_message.get("headers", [])
+            if name.lower() not in (b"content-type", b"content-length", b"content-encoding")
+        ]
+        kept += [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode("latin-1")),
+            (b"x-profile-samples", str(sampler.samples).encode("latin-1")),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": kept})
+        await send({"type": "http.response.body", "body": payload})
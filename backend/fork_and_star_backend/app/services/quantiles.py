@@ -0,0 +1,173 @@
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from app.services.snapshot import CatalogSnapshot
+
+QUANTILE_FIELDS = {
+    "stars": "stars",
+    "score": "score",
+    "momentum": "momentum",
+    "green": "green",
+}
+
+# "all" is the single global group; country keys are lowercased like the rest of the API
+QUANTILE_DIMENSIONS = ["all", "country", "cluster"]
+
+DEFAULT_K = 200
+
+# Relative capacity of each level below the top one
+DECAY = 2 / 3
+
+
+class KLLSketch:
+    """
+    Mergeable KLL quantile sketch (Karnin, Lang & Liberty). Keeps O(k) items in
+    compactor levels where an item at level h stands for 2^h inputs; rank error
+    is roughly 1.7 / k of n with high probability.
+    """
+
+    def __init__(self, k: int = DEFAULT_K, seed: Union[int, Sequence[int]] = 0):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+        self._view: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * DECAY ** depth)), 2)
+
+    def _size(self) -> int:
+        return sum(len(level) for level in self.levels)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def _compress(self):
+        while self._size() >= self._max_size():
+            for h, level in enumerate(self.levels):
+                if len(level) < self._capacity(h):
+                    continue
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                level = np.sort(level)
+                # An odd item out stays behind; of the rest every other one (random phase) moves up
+                kept, paired = level[:len(level) % 2], level[len(level) % 2:]
+                promoted = paired[int(self._rng.integers(2))::2]
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                self.levels[h] = kept
+                break
+
+    def update(self, values: Iterable[float]):
+        """Add values (NaN is ignored, like NULL)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        # Feed in chunks no larger than the level-0 capacity so each compaction stays small
+        step = max(self._capacity(0), 2)
+        for start in range(0, len(values), step):
+            self.levels[0] = np.concatenate([self.levels[0], values[start:start + step]])
+            self._compress()
+        self._view = None
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """New sketch summarizing both inputs (neither input is modified)"""
+        k = max(self.k, other.k)
+        # Seeded from the inputs, not from self._rng: sketches in a snapshot are shared across
+        # requests and threads, and the same merge must give the same answer every time
+        merged = KLLSketch(k, seed=[self.n, other.n, k])
+        depth = max(len(self.levels), len(other.levels))
+        merged.levels = [
+            np.concatenate([
+                self.levels[h] if h < len(self.levels) else np.empty(0),
+                other.levels[h] if h < len(other.levels) else np.empty(0),
+            ])
+            for h in range(depth)
+        ]
+        merged.n = self.n + other.n
+        merged.min = min(self.min, other.min)
+        merged.max = max(self.max, other.max)
+        merged._compress()
+        return merged
+
+    def _sorted_view(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._view is None:
+            values = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+            order = np.argsort(values, kind="stable")
+            self._view = (values[order], np.cumsum(weights[order]))
+        return self._view
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.n == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        values, cumulative = self._sorted_view()
+        index = int(np.searchsorted(cumulative, q * cumulative[-1], side="left"))
+        return float(values[min(index, len(values) - 1)])
+
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        return [self.quantile(q) for q in qs]
+
+
+class QuantileSketches:
+    """KLL sketches of each numeric field, globally and per country and cluster, for one data version"""
+
+    def __init__(self, snapshot: CatalogSnapshot, k: int = DEFAULT_K):
+        self.version = snapshot.version
+        self.k = k
+        self.groups: Dict[str, Dict[object, np.ndarray]] = {
+            "all": {"all": np.arange(snapshot.size)},
+            "country": self._country_groups(snapshot),
+            "cluster": self._cluster_groups(snapshot),
+        }
+        self.sketches: Dict[Tuple[str, str, object], KLLSketch] = {}
+        for dimension, groups in self.groups.items():
+            for key, rows in groups.items():
+                for field, column in QUANTILE_FIELDS.items():
+                    sketch = KLLSketch(k)
+                    sketch.update(snapshot[column][rows])
+                    self.sketches[(field, dimension, key)] = sketch
+
+    def _country_groups(self, snapshot: CatalogSnapshot) -> Dict[object, np.ndarray]:
+        labels = snapshot["country"]
+        groups: Dict[object, List[int]] = {}
+        for code, category in enumerate(labels.categories.tolist()):
+            groups.setdefault(category.lower(), []).append(code)
+        return {key: np.flatnonzero(np.isin(labels.codes, codes)) for key, codes in groups.items()}
+
+    def _cluster_groups(self, snapshot: CatalogSnapshot) -> Dict[object, np.ndarray]:
+        cluster = snapshot["cluster"]
+        rows = np.flatnonzero(~np.isnan(cluster))
+        ids = cluster[rows].astype(np.int64)
+        return {int(cid): rows[ids == cid] for cid in np.unique(ids).tolist()}
+
+    def normalize(self, dimension: str, key: str) -> object:
+        """Query-string key -> group key (lowercased country, integer cluster id)"""
+        if dimension == "cluster":
+            return int(key)
+        if dimension == "country":
+            return key.strip().lower()
+        return "all"
+
+    def union(self, field: str, dimension: str, keys: Iterable[object]) -> Optional[KLLSketch]:
+        """Merged sketch of the given groups (None when none of them exist)"""
+        merged = None
+        for key in keys:
+            sketch = self.sketches.get((field, dimension, key))
+            if sketch is None:
+                continue
+            merged = sketch if merged is None else merged.merge(sketch)
+        return merged
+
+
+def build_quantile_sketches(snapshot: CatalogSnapshot) -> QuantileSketches:
+    return QuantileSketches(snapshot)
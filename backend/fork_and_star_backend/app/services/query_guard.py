@@ -0,0 +1,348 @@
+import concurrent.futures
+import fnmatch
+import json
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+from cachetools import LRUCache, TTLCache
+from fastapi import HTTPException
+from google.api_core import exceptions as api_exceptions
+from google.cloud import bigquery
+from app.services.circuit_breaker import CircuitBreaker, bigquery_breaker
+from app.services.metrics import BUDGET_DECISIONS, ESTIMATED_BYTES, STALE_RESULTS, record_cache, record_query
+from app.services.query_stats import query_stats
+from app.services.request_context import current_endpoint, current_request, mark_stale
+from app.services.timing import span
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("reject", "cached", "require_filters")
+
+# Budgets come from QUERY_BUDGETS, a JSON object keyed by route template (globs allowed, "*" for
+# every other route), e.g. {"/recommendations/maps/discovery": {"max_bytes": 500000000, "policy": "cached"}}
+DEFAULT_BUDGETS: Dict[str, dict] = {}
+
+# Total BigQuery time one request may spend; each query waits at most for what is left of it
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "30"))
+# Queries outside of requests (snapshot refreshes, revalidation) get their own timeout
+BACKGROUND_QUERY_TIMEOUT_SECONDS = float(os.getenv("BACKGROUND_QUERY_TIMEOUT_SECONDS", "300"))
+
+# Last good result of each request query, served (marked stale) while BigQuery is unavailable
+STALE_MAX_SECONDS = float(os.getenv("STALE_MAX_SECONDS", "3600"))
+STALE_CACHE_ROWS = int(os.getenv("STALE_CACHE_ROWS", "50000"))
+
+@dataclass(frozen=True)
+class QueryBudget:
+    max_bytes: Optional[int] = None
+    max_seconds: Optional[float] = None
+    policy: str = "reject"
+    # How long a result may stand in for an over-budget query under the "cached" policy
+    cache_seconds: float = 600
+
+
+class QueryBudgetExceeded(HTTPException):
+    """A query would exceed (or exceeded) its endpoint's budget and no fallback applies"""
+
+
+class BigQueryUnavailable(HTTPException):
+    """BigQuery is failing, too slow or behind an open circuit, and there is no result to fall back to"""
+
+
+_TIMEOUTS = (concurrent.futures.TimeoutError, TimeoutError, requests.exceptions.Timeout)
+
+# Failures that say BigQuery is unhealthy, as opposed to a bad query
+_OUTAGES = _TIMEOUTS + (
+    ConnectionError,
+    requests.exceptions.RequestException,
+    api_exceptions.ServerError,
+    api_exceptions.TooManyRequests,
+    api_exceptions.RetryError,
+)
+
+
+def load_budgets(raw: Optional[str] = None) -> Dict[str, QueryBudget]:
+    """DEFAULT_BUDGETS overlaid with the QUERY_BUDGETS environment variable (a JSON object)"""
+    raw = os.getenv("QUERY_BUDGETS") if raw is None else raw
+    config = dict(DEFAULT_BUDGETS)
+    if raw:
+        try:
+            config.update(json.loads(raw))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"QUERY_BUDGETS is not valid JSON: {e}")
+    budgets = {}
+    for pattern, settings in config.items():
+        if settings is None:
+            continue  # null disables a default budget
+        budget = QueryBudget(**settings)
+        if budget.policy not in POLICIES:
+            raise ValueError(f"Invalid policy '{budget.policy}' for {pattern}. Choose from: {list(POLICIES)}")
+        budgets[pattern] = budget
+    return budgets
+
+
+def _query_key(sql: str, job_config: Optional[bigquery.QueryJobConfig]) -> str:
+    params = [p.to_api_repr() for p in (job_config.query_parameters if job_config else [])]
+    return json.dumps([sql, params], sort_keys=True, default=str)
+
+
+class GuardedJob:
+    """Query job whose rows were already fetched within the budget (or served from the fallback cache)"""
+
+    def __init__(self, rows: List[Any], job=None, from_cache: bool = False):
+        self.rows = rows
+        self.job = job
+        self.from_cache = from_cache
+
+    def result(self, *args, **kwargs) -> List[Any]:
+        return self.rows
+
+    def __getattr__(self, name):
+        return getattr(self.job, name)
+
+
+def _observe(endpoint: str, sql: str, job_config, job, started: float, rows: Optional[int] = None, failed: bool = False):
+    """Metrics and per-fingerprint stats for a finished (or failed) query"""
+    if not failed:
+        record_query(endpoint, job, started, rows)
+    query_stats.record(
+        sql, job_config, endpoint, time.perf_counter() - started,
+        bytes_processed=getattr(job, "total_bytes_processed", None), failed=failed,
+    )
+
+
+class GuardedClient:
+    """
+    Drop-in wrapper around bigquery.Client.query that enforces per-endpoint byte and latency
+    budgets, bounds every query by the request's deadline and keeps BigQuery behind a circuit
+    breaker. When BigQuery fails, times out or the circuit is open, a request query is answered
+    with its last good result (the response is marked stale) and re-run in the background.
+    """
+
+    def __init__(
+        self,
+        client: bigquery.Client,
+        budgets: Optional[Dict[str, QueryBudget]] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.client = client
+        self.budgets = load_budgets() if budgets is None else budgets
+        self.breaker = bigquery_breaker if breaker is None else breaker
+        self._estimates = TTLCache(maxsize=1024, ttl=600)
+        # (endpoint, query key) -> (fetched_at, rows), sized in rows
+        self._last_results = LRUCache(maxsize=STALE_CACHE_ROWS, getsizeof=lambda entry: max(len(entry[1]), 1))
+        self._revalidating = set()
+        self._revalidator = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="bq-revalidate")
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def budget_for(self, endpoint: str) -> Optional[QueryBudget]:
+        if endpoint in self.budgets:
+            return self.budgets[endpoint]
+        for pattern, budget in self.budgets.items():
+            if pattern != "*" and fnmatch.fnmatchcase(endpoint, pattern):
+                return budget
+        return self.budgets.get("*")
+
+    def estimate(self, sql: str, job_config: Optional[bigquery.QueryJobConfig] = None, timeout: Optional[float] = None) -> int:
+        """Bytes the query would process, from a (cached) dry run bounded by timeout"""
+        key = _query_key(sql, job_config)
+        with self._lock:
+            estimate = self._estimates.get(key)
+        record_cache("bigquery_estimates", estimate is not None)
+        if estimate is None:
+            dry_config = bigquery.QueryJobConfig(
+                dry_run=True,
+                use_query_cache=False,
+                query_parameters=job_config.query_parameters if job_config else [],
+            )
+            started = time.perf_counter()
+            try:
+                with span("bq_dry_run"):
+                    estimate = int(self.client.query(sql, job_config=dry_config, timeout=timeout).total_bytes_processed or 0)
+            except Exception as e:
+                self._record_failure(e, time.perf_counter() - started, record_timeouts=self._timeout_is_telling(timeout))
+                raise
+            self.breaker.record(time.perf_counter() - started, failed=False)
+            with self._lock:
+                self._estimates[key] = estimate
+        return estimate
+
+    def _cached(self, endpoint: str, budget: QueryBudget, key: str) -> Optional[List[Any]]:
+        with self._lock:
+            entry = self._last_results.get((endpoint, key))
+        fresh = entry is not None and time.time() - entry[0] <= budget.cache_seconds
+        record_cache("bigquery_fallback_results", fresh)
+        return entry[1] if fresh else None
+
+    def _remember(self, endpoint: str, key: str, rows: List[Any]):
+        if len(rows) > self._last_results.maxsize:
+            return
+        with self._lock:
+            self._last_results[(endpoint, key)] = (time.time(), rows)
+
+    def _timeout_is_telling(self, timeout: Optional[float], budget_bound: bool = False) -> bool:
+        """
+        Whether running out of time says something about BigQuery itself. A tight latency budget
+        or a request that spent its deadline elsewhere must not open the circuit for everyone.
+        """
+        return not budget_bound and (timeout is None or timeout >= self.breaker.slow_seconds)
+
+    def _record_failure(self, error: Exception, seconds: float, record_timeouts: bool):
+        if not isinstance(error, _OUTAGES):
+            return  # a bad query, not an unhealthy BigQuery
+        if isinstance(error, _TIMEOUTS) and not record_timeouts:
+            return
+        self.breaker.record(seconds, failed=True)
+
+    def _timeout(self, budget: Optional[QueryBudget]) -> Tuple[float, bool]:
+        """Seconds the next query may wait for its rows, and whether the budget (not the deadline) set it"""
+        state = current_request.get()
+        if state is None:
+            remaining = BACKGROUND_QUERY_TIMEOUT_SECONDS
+        else:
+            remaining = REQUEST_DEADLINE_SECONDS - (time.monotonic() - state.started)
+        if budget is not None and budget.max_seconds is not None and budget.max_seconds <= remaining:
+            return budget.max_seconds, True
+        return max(remaining, 0.0), False
+
+    def _over_budget(self, endpoint: str, budget: QueryBudget, key: str, reason: str, status_code: int) -> Optional[GuardedJob]:
+        """Fallback for a query over budget; None means run it anyway to fill the cache"""
+        if budget.policy == "cached":
+            rows = self._cached(endpoint, budget, key)
+            if rows is not None:
+                BUDGET_DECISIONS.labels(endpoint, "served_cached").inc()
+                logger.warning("Serving cached result for %s: %s", endpoint, reason)
+                return GuardedJob(rows, from_cache=True)
+            if status_code != 504:
+                # Nothing to downgrade to yet: run it once and keep the result
+                BUDGET_DECISIONS.labels(endpoint, "filled_cache").inc()
+                return None
+        if budget.policy == "require_filters":
+            BUDGET_DECISIONS.labels(endpoint, "required_filters").inc()
+            raise QueryBudgetExceeded(
+                status_code=422,
+                detail=f"{reason}. Retry with cheaper parameters (filters, a smaller limit or fewer fields)."
+            )
+        BUDGET_DECISIONS.labels(endpoint, "rejected").inc()
+        raise QueryBudgetExceeded(status_code=status_code, detail=reason)
+
+    def _run(self, endpoint: str, key: str, sql: str, job_config=None, remember: bool = True, **kwargs) -> GuardedJob:
+        budget = self.budget_for(endpoint)
+        if budget is not None and budget.max_bytes is not None:
+            # The latency budget is for running the query; the dry run only gets the deadline
+            dry_run_timeout, _ = self._timeout(None)
+            if dry_run_timeout <= 0:
+                raise concurrent.futures.TimeoutError(f"The {REQUEST_DEADLINE_SECONDS}s request deadline has passed")
+            estimate = self.estimate(sql, job_config, timeout=dry_run_timeout)
+            ESTIMATED_BYTES.labels(endpoint).observe(estimate)
+            if estimate > budget.max_bytes:
+                reason = f"Query would process {estimate} bytes, over the {budget.max_bytes} byte budget for {endpoint}"
+                fallback = self._over_budget(endpoint, budget, key, reason, status_code=422)
+                if fallback is not None:
+                    return fallback
+
+        timeout, budget_bound = self._timeout(budget)
+        if timeout <= 0:
+            raise concurrent.futures.TimeoutError(f"The {REQUEST_DEADLINE_SECONDS}s request deadline has passed")
+        started = time.perf_counter()
+        job = None
+        try:
+            with span("bq_submit"):
+                job = self.client.query(sql, job_config=job_config, **kwargs)
+            with span("bq_execute"):
+                iterator = job.result(timeout=timeout)
+            with span("bq_fetch"):
+                rows = list(iterator)
+        except _TIMEOUTS as e:
+            if job is not None:
+                job.cancel()
+            self._record_failure(e, time.perf_counter() - started, self._timeout_is_telling(timeout, budget_bound))
+            _observe(endpoint, sql, job_config, job, started, failed=True)
+            if not budget_bound:
+                raise
+            reason = f"Query exceeded the {budget.max_seconds}s latency budget for {endpoint}"
+            return self._over_budget(endpoint, budget, key, reason, status_code=504)
+        except Exception as e:
+            self._record_failure(e, time.perf_counter() - started, record_timeouts=True)
+            _observe(endpoint, sql, job_config, job, started, failed=True)
+            raise
+        self.breaker.record(time.perf_counter() - started, failed=False)
+        _observe(endpoint, sql, job_config, job, started, len(rows))
+
+        if budget is not None:
+            BUDGET_DECISIONS.labels(endpoint, "allowed").inc()
+        if remember:
+            self._remember(endpoint, key, rows)
+        return GuardedJob(rows, job)
+
+    def _serve_stale(self, endpoint: str, key: str, sql: str, job_config, reason: str, detail: str) -> GuardedJob:
+        """Last good result for the query (marked stale) or BigQueryUnavailable"""
+        entry = None
+        if current_request.get() is not None:
+            with self._lock:
+                entry = self._last_results.get((endpoint, key))
+        age = time.time() - entry[0] if entry is not None else None
+        usable = age is not None and age <= STALE_MAX_SECONDS
+        record_cache("bigquery_stale_results", usable)
+        if not usable:
+            retry_after = max(math.ceil(self.breaker.retry_after()), 1)
+            raise BigQueryUnavailable(
+                status_code=504 if reason == "deadline" else 503,
+                detail=f"BigQuery is unavailable ({detail}) and there is no recent result to serve",
+                headers={"Retry-After": str(retry_after)},
+            )
+        STALE_RESULTS.labels(endpoint, reason).inc()
+        logger.warning("Serving a %ds old result for %s: %s", age, endpoint, detail)
+        mark_stale(age)
+        self._revalidate(endpoint, key, sql, job_config)
+        return GuardedJob(entry[1], from_cache=True)
+
+    def _revalidate(self, endpoint: str, key: str, sql: str, job_config):
+        """Re-run a query served stale in the background, once the circuit lets a call through"""
+        with self._lock:
+            if (endpoint, key) in self._revalidating:
+                return
+            self._revalidating.add((endpoint, key))
+        self._revalidator.submit(self._revalidate_later, endpoint, key, sql, job_config)
+
+    def _revalidate_later(self, endpoint: str, key: str, sql: str, job_config):
+        try:
+            time.sleep(max(self.breaker.retry_after(), 1.0))
+            if not self.breaker.allow():
+                return
+            token = current_endpoint.set(endpoint)
+            try:
+                self._run(endpoint, key, sql, job_config)
+            finally:
+                current_endpoint.reset(token)
+        except Exception as e:
+            logger.warning("Background refresh of a stale %s result failed: %s: %s", endpoint, type(e).__name__, e)
+        finally:
+            with self._lock:
+                self._revalidating.discard((endpoint, key))
+
+    def query(self, sql: str, job_config: Optional[bigquery.QueryJobConfig] = None, **kwargs) -> GuardedJob:
+        endpoint = current_endpoint.get()
+        key = _query_key(sql, job_config)
+        # Stale results only stand in for request queries. Outside a request (snapshot refreshes)
+        # the failure propagates so the caller keeps its data and retries later
+        in_request = current_request.get() is not None
+        if not self.breaker.allow():
+            return self._serve_stale(endpoint, key, sql, job_config, "circuit_open", "circuit open after repeated failures")
+        try:
+            return self._run(endpoint, key, sql, job_config, remember=in_request, **kwargs)
+        except _TIMEOUTS as e:
+            if not in_request:
+                raise
+            return self._serve_stale(endpoint, key, sql, job_config, "deadline", str(e) or "request deadline exceeded")
+        except _OUTAGES as e:
+            if not in_request:
+                raise
+            return self._serve_stale(endpoint, key, sql, job_config, "error", f"{type(e).__name__}: {e}")
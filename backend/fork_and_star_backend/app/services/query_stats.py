@@ -0,0 +1,199 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from google.cloud import bigquery
+from app.services.quantiles import KLLSketch
+
+slow_query_logger = logging.getLogger("fork_and_star.slow_queries")
+
+# Queries slower than this are written to the slow-query log with their parameters
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "2000"))
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", "200"))
+
+# Distinct fingerprints tracked; the least recently seen one is dropped past this
+MAX_FINGERPRINTS = 500
+
+# Quoted identifiers are kept, literals and parameters become "?"
+_TOKENS = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+    |(?P<ident>`[^`]*`)
+    |(?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+    |(?P<param>@\w+)
+    |(?P<number>\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def _normalize_token(match: re.Match) -> str:
+    kind = match.lastgroup
+    if kind == "comment":
+        return " "
+    if kind == "ident":
+        return match.group()
+    return "?"
+
+
+def normalize_sql(sql: str) -> str:
+    """SQL with comments dropped, literals and @parameters replaced by ? and whitespace collapsed"""
+    text = _TOKENS.sub(_normalize_token, sql)
+    text = _LISTS.sub("(?+)", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    """Short id of a query shape, from its normalize_sql() text"""
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+def query_parameters(job_config: Optional[bigquery.QueryJobConfig]) -> Dict[str, Any]:
+    """name -> value of a job's query parameters"""
+    params = {}
+    for param in (job_config.query_parameters if job_config else []):
+        if hasattr(param, "value"):
+            params[param.name] = param.value
+        elif hasattr(param, "values"):
+            params[param.name] = list(param.values)
+        else:
+            params[param.name] = param.to_api_repr()
+    return params
+
+
+class FingerprintStats:
+    """Running totals and latency/bytes sketches for one query shape"""
+
+    def __init__(self, fingerprint_id: str, normalized: str):
+        self.fingerprint = fingerprint_id
+        self.normalized = normalized
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.total_bytes = 0
+        self.endpoints: Dict[str, int] = {}
+        self.latency = KLLSketch()
+        self.bytes = KLLSketch()
+        self.last_seen = 0.0
+
+    def observe(self, endpoint: str, seconds: float, bytes_processed: Optional[int], failed: bool):
+        self.count += 1
+        self.errors += int(failed)
+        self.total_seconds += seconds
+        self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+        self.latency.update([seconds * 1000])
+        if bytes_processed is not None:
+            self.total_bytes += bytes_processed
+            self.bytes.update([bytes_processed])
+        self.last_seen = time.time()
+
+    def to_dict(self) -> dict:
+        p50, p95, p99 = self.latency.quantiles([0.5, 0.95, 0.99])
+        b50, b95, b99 = self.bytes.quantiles([0.5, 0.95, 0.99])
+        return {
+            "fingerprint": self.fingerprint,
+            "sql": self.normalized,
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": round(self.total_seconds * 1000, 2),
+            "latency_ms": {"p50": p50, "p95": p95, "p99": p99, "max": self.latency.quantile(1.0)},
+            "bytes": {"total": self.total_bytes, "p50": b50, "p95": b95, "p99": b99},
+            "endpoints": self.endpoints,
+            "last_seen": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.last_seen)),
+        }
+
+
+STATS_SORTS = {
+    "total_time": lambda s: s.total_seconds,
+    "count": lambda s: s.count,
+    "p95": lambda s: s.latency.quantile(0.95) or 0,
+    "bytes": lambda s: s.total_bytes,
+}
+
+
+class QueryStats:
+    """Per-fingerprint query statistics plus a ring buffer of slow queries"""
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, capacity: int = SLOW_QUERY_BUFFER, max_fingerprints: int = MAX_FINGERPRINTS):
+        self.slow_ms = slow_ms
+        self.capacity = capacity
+        self.max_fingerprints = max_fingerprints
+        self._stats: Dict[str, FingerprintStats] = {}
+        # SQL text -> (fingerprint, normalized text)
+        self._shapes: Dict[str, Tuple[str, str]] = {}
+        self._slow = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def _shape(self, sql: str) -> Tuple[str, str]:
+        # The same SQL text is issued over and over; normalize and hash each text once
+        shape = self._shapes.get(sql)
+        if shape is None:
+            normalized = normalize_sql(sql)
+            shape = (fingerprint(normalized), normalized)
+            if len(self._shapes) >= 4 * self.max_fingerprints:
+                self._shapes.clear()
+            self._shapes[sql] = shape
+        return shape
+
+    def record(
+        self,
+        sql: str,
+        job_config: Optional[bigquery.QueryJobConfig],
+        endpoint: str,
+        seconds: float,
+        bytes_processed: Optional[int] = None,
+        failed: bool = False,
+    ):
+        with self._lock:
+            fingerprint_id, normalized = self._shape(sql)
+            stats = self._stats.get(fingerprint_id)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    stale = min(self._stats.values(), key=lambda s: s.last_seen)
+                    del self._stats[stale.fingerprint]
+                stats = self._stats[fingerprint_id] = FingerprintStats(fingerprint_id, normalized)
+            stats.observe(endpoint, seconds, bytes_processed, failed)
+
+        duration_ms = seconds * 1000
+        if duration_ms < self.slow_ms:
+            return
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "fingerprint": fingerprint_id,
+            "endpoint": endpoint,
+            "duration_ms": round(duration_ms, 2),
+            "bytes_processed": bytes_processed,
+            "failed": failed,
+            "parameters": query_parameters(job_config),
+            "sql": sql.strip(),
+        }
+        with self._lock:
+            self._slow.append(entry)
+        slow_query_logger.warning(json.dumps(entry, default=str))
+
+    def summary(self, sort: str = "total_time", limit: int = 50) -> List[dict]:
+        with self._lock:
+            ranked = sorted(self._stats.values(), key=STATS_SORTS[sort], reverse=True)[:limit]
+            return [stats.to_dict() for stats in ranked]
+
+    def slow_queries(self, limit: Optional[int] = None) -> List[dict]:
+        """Newest first"""
+        with self._lock:
+            entries = list(self._slow)
+        entries.reverse()
+        return entries if limit is None else entries[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+
+
+query_stats = QueryStats()
@@ -0,0 +1,82 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional
+from google.cloud import bigquery
+from app.services.snapshot import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background BigQuery checks; probes only read the last result
+READINESS_INTERVAL = float(os.getenv("READINESS_INTERVAL", "60"))
+
+
+class ReadinessProbe:
+    """
+    Background BigQuery connectivity check plus snapshot upkeep. A metadata lookup
+    (tables.get) proves credentials and reachability without scanning any data; the
+    first round loads the catalog snapshot so the replica is warm before it is ready,
+    and later rounds reload it whenever the table's modified time moves.
+    """
+
+    def __init__(self, client: bigquery.Client, table: str, catalog: SnapshotStore, interval: float = READINESS_INTERVAL):
+        self.client = client
+        self.table = table
+        self.catalog = catalog
+        self.interval = interval
+        self.bigquery: dict = {"ok": False, "checked_at": None, "error": "not checked yet"}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self):
+        started = time.perf_counter()
+        try:
+            table = self.client.get_table(self.table)
+            self.bigquery = {
+                "ok": True,
+                "latency_seconds": round(time.perf_counter() - started, 3),
+                "checked_at": time.time(),
+                "num_rows": table.num_rows,
+                "modified": table.modified.isoformat() if table.modified else None,
+            }
+        except Exception as e:
+            logger.warning("BigQuery readiness check failed: %s", e)
+            self.bigquery = {"ok": False, "checked_at": time.time(), "error": str(e)}
+            return
+        try:
+            # Warm-up on the first round, background refresh whenever the table is rebuilt
+            self.catalog.refresh_if_modified(table.modified)
+        except Exception as e:
+            logger.warning("Catalog snapshot load failed, still serving version %s: %s", self.catalog.version, e)
+
+    def _run(self):
+        while True:
+            self.check()
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="readiness-probe", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def fresh(self) -> bool:
+        """The last check succeeded and is recent (a stalled checker must not look healthy)"""
+        checked_at = self.bigquery.get("checked_at")
+        return bool(self.bigquery["ok"] and checked_at and time.time() - checked_at < 3 * self.interval)
+
+    def status(self) -> dict:
+        snapshot = self.catalog.status()
+        bigquery_status = dict(self.bigquery)
+        checked_at = bigquery_status.pop("checked_at", None)
+        if checked_at:
+            bigquery_status["age_seconds"] = round(time.time() - checked_at, 1)
+        return {
+            "ready": self.fresh() and snapshot["loaded"],
+            "bigquery": bigquery_status,
+            "snapshot": snapshot,
+        }
@@ -0,0 +1,76 @@
+import math
+import time
+from contextvars import ContextVar
+from typing import Optional
+from starlette.routing import Match
+
+# Route template of the request being served (e.g. "/recommendations/green/{restaurant_name}"),
+# "background" outside of requests
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="background")
+
+
+class RequestState:
+    """Per-request facts filled in while serving it (sync endpoints share the object from the threadpool)"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        # Age of the oldest stale result the response was built from, None when all data was fresh
+        self.stale_seconds: Optional[float] = None
+
+    def mark_stale(self, age_seconds: float):
+        self.stale_seconds = max(age_seconds, self.stale_seconds or 0.0)
+
+
+current_request: ContextVar[Optional[RequestState]] = ContextVar("current_request", default=None)
+
+
+def mark_stale(age_seconds: float):
+    """Flag the current request's response as built from a stale result (a no-op outside of requests)"""
+    state = current_request.get()
+    if state is not None:
+        state.mark_stale(age_seconds)
+
+
+def resolve_endpoint(scope) -> str:
+    """Route template matching an HTTP scope, so labels stay low-cardinality"""
+    app = scope.get("app")
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return "unmatched"
+
+
+class RequestContextMiddleware:
+    """
+    Pure ASGI middleware that records the matched route in current_endpoint and a fresh
+    RequestState in current_request. Responses built from stale results are sent with
+    X-Data-Stale and X-Stale-Age-Seconds, no ETag and Cache-Control: no-store.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        state = RequestState()
+        token = current_endpoint.set(resolve_endpoint(scope))
+        state_token = current_request.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state.stale_seconds is not None:
+                kept = [(k, v) for k, v in message.get("headers", []) if k.lower() not in (b"etag", b"cache-control")]
+                message = {**message, "headers": kept + [
+                    (b"x-data-stale", b"true"),
+                    (b"x-stale-age-seconds", str(math.ceil(state.stale_seconds)).encode("latin-1")),
+                    (b"cache-control", b"no-store"),
+                ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(state_token)
+            current_endpoint.reset(token)
@@ -0,0 +1,166 @@
+import gzip
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+import anyio
+from cachetools import LRUCache
+from app.services.conditional import normalized_query
+from app.services.metrics import record_cache
+from app.services.profiler import profile_requested
+from app.services.request_context import current_endpoint, current_request
+from app.services.snapshot import SnapshotStore
+
+try:
+    import brotli
+except ImportError:  # optional: brotli variants are only built when the package is installed
+    brotli = None
+
+# Read-only GET routes whose payload depends only on the parameters and the data version.
+# RESPONSE_CACHE_ROUTES (comma-separated route templates) replaces this list.
+DEFAULT_CACHED_ROUTES = [
+    "/recommendations/filters/options",
+    "/recommendations/tags",
+    "/recommendations/clusters/analysis",
+    "/recommendations/maps/discovery",
+    "/recommendations/metrics/score-distribution",
+    "/recommendations/metrics/histogram",
+    "/recommendations/metrics/percentiles",
+    "/recommendations/analytics/market-gaps",
+    "/recommendations/predictions/rising-stars",
+    "/recommendations/analytics/sustainability/trends",
+]
+
+RESPONSE_CACHE_MB = float(os.getenv("RESPONSE_CACHE_MB", "64"))
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+# Headers that describe one particular response rather than the payload (CORS headers, which
+# depend on the caller's Origin, are dropped as well)
+_PER_RESPONSE_HEADERS = {b"content-length", b"content-encoding", b"server-timing", b"date", b"x-data-age-seconds"}
+
+
+def cached_routes(raw: Optional[str] = None) -> List[str]:
+    raw = os.getenv("RESPONSE_CACHE_ROUTES") if raw is None else raw
+    if not raw:
+        return list(DEFAULT_CACHED_ROUTES)
+    return [route.strip() for route in raw.split(",") if route.strip()]
+
+
+class EncodedResponse:
+    """Final response bytes for one key, in every encoding we can serve"""
+
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.bodies: Dict[bytes, bytes] = {b"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.bodies[b"gzip"] = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                self.bodies[b"br"] = brotli.compress(body, quality=5)
+        self.size = sum(len(variant) for variant in self.bodies.values())
+
+    def negotiate(self, accept_encoding: bytes) -> bytes:
+        offered = {part.split(b";")[0].strip() for part in accept_encoding.lower().split(b",")}
+        for encoding in (b"br", b"gzip"):
+            if encoding in self.bodies and encoding in offered:
+                return encoding
+        return b"identity"
+
+    async def send(self, send, accept_encoding: bytes, cache_status: bytes):
+        encoding = self.negotiate(accept_encoding)
+        body = self.bodies[encoding]
+        headers = list(self.headers) + [
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"vary", b"Accept-Encoding"),
+            (b"x-cache", cache_status),
+        ]
+        if encoding != b"identity":
+            headers.append((b"content-encoding", encoding))
+        await send({"type": "http.response.start", "status": self.status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+class ResponseCacheMiddleware:
+    """
+    Pure ASGI middleware caching the encoded bytes of successful GET responses on the
+    configured routes, keyed by route, normalized parameters and the request's data version.
+    A hit goes straight to the socket: no endpoint, no row conversion, no JSON encoding and
+    no compression. Entries of older data versions are dropped when the version changes.
+    """
+
+    def __init__(self, app, store: SnapshotStore, routes: Optional[List[str]] = None, max_mb: float = RESPONSE_CACHE_MB):
+        self.app = app
+        self.store = store
+        self.routes = set(cached_routes() if routes is None else routes)
+        self.enabled = max_mb > 0
+        self._entries = LRUCache(maxsize=max(int(max_mb * 1024 * 1024), 1), getsizeof=lambda entry: entry.size)
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _get(self, key) -> Optional[EncodedResponse]:
+        with self._lock:
+            if self._version is None or key[0] > self._version:
+                self._entries.clear()
+                self._version = key[0]
+            return self._entries.get(key)
+
+    def _put(self, key, entry: EncodedResponse):
+        if entry.size > self._entries.maxsize:
+            return
+        with self._lock:
+            if key[0] == self._version:
+                self._entries[key] = entry
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not self.enabled
+            or scope["type"] != "http"
+            or scope["method"] != "GET"
+            or current_endpoint.get() not in self.routes
+            or profile_requested(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+        version = self.store.pin()
+        if version is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = (version, current_endpoint.get(), normalized_query(scope.get("query_string", b"")))
+        accept_encoding = dict(scope.get("headers") or []).get(b"accept-encoding", b"")
+        entry = self._get(key)
+        record_cache("response_cache", entry is not None)
+        if entry is not None:
+            await entry.send(send, accept_encoding, b"HIT")
+            return
+
+        start_message = {}
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+
+        raw_headers = start_message.get("headers", [])
+        status = start_message.get("status", 500)
+        state = current_request.get()
+        stale = state is not None and state.stale_seconds is not None
+        if status != 200 or stale or any(name.lower() == b"content-encoding" for name, _ in raw_headers):
+            # Not cacheable (including responses built from stale BigQuery results): replay untouched
+            await send(start_message)
+            await send({"type": "http.response.body", "body": b"".join(chunks)})
+            return
+
+        headers = [
+            (name, value) for name, value in raw_headers
+            if name.lower() not in _PER_RESPONSE_HEADERS and not name.lower().startswith(b"access-control-")
+        ]
+        # Compression runs off the event loop
+        entry = await anyio.to_thread.run_sync(EncodedResponse, status, headers, b"".join(chunks))
+        self._put(key, entry)
+        await entry.send(send, accept_encoding, b"MISS")
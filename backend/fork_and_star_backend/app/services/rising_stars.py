@@ -0,0 +1,148 @@
+import numpy as np
+from typing import List, Optional
+from app.services.snapshot import CatalogSnapshot
+from app.services.cluster_profiles import build_cluster_profiles
+
+PREDICTION_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "cuisine": "cuisine",
+    "country": "country",
+    "current_stars": "stars",
+    "current_score": "score",
+    "momentum": "momentum",
+    "cluster": "cluster",
+    "badges": "badges",
+    "current_reputation": "reputation",
+    "umap_x": "umap_x",
+    "umap_y": "umap_y",
+}
+
+REPORTED_CATEGORIES = ["Very High Potential", "High Potential", "Medium Potential"]
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+class RisingStarFeatures:
+    """
+    Per-restaurant rising-star features for one data version: score/star ratio, cluster
+    averages and a momentum sort order, so each ranking is a vectorized expression.
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.snapshot = snapshot
+        stars, score, momentum = snapshot["stars"], snapshot["score"], snapshot["momentum"]
+        self.rows = np.flatnonzero(~np.isnan(momentum) & ~np.isnan(stars) & ~np.isnan(score))
+        self.stars = stars[self.rows]
+        self.momentum = momentum[self.rows]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.score_star_ratio = np.where(self.stars > 0, score[self.rows] / self.stars, 0.0)
+
+        # Cluster averages joined from the shared profile store (NaN when the row has no cluster)
+        profiles = snapshot.derived("cluster_profiles", build_cluster_profiles)
+        cluster = snapshot["cluster"][self.rows]
+        self.cluster_avg_stars = np.full(len(self.rows), np.nan)
+        self.cluster_avg_momentum = np.full(len(self.rows), np.nan)
+        if len(profiles.cluster_ids):
+            clustered = np.flatnonzero(~np.isnan(cluster))
+            position = np.searchsorted(profiles.cluster_ids, cluster[clustered].astype(np.int64))
+            self.cluster_avg_stars[clustered] = profiles.avg_stars[position]
+            self.cluster_avg_momentum[clustered] = profiles.avg_momentum[position]
+
+        # Rows ordered by momentum once; a star cap then only masks this order
+        self.by_momentum = np.argsort(self.momentum, kind="stable")
+        self.momentum_stats = self._momentum_stats(momentum[~np.isnan(momentum)])
+
+    def _momentum_stats(self, values: np.ndarray) -> dict:
+        if len(values) == 0:
+            return {
+                "total_restaurants": 0, "avg_momentum": None, "min_momentum": None, "max_momentum": None,
+                "momentum_80th_percentile": None, "momentum_90th_percentile": None,
+            }
+        return {
+            "total_restaurants": int(len(values)),
+            "avg_momentum": float(values.mean()),
+            "min_momentum": float(values.min()),
+            "max_momentum": float(values.max()),
+            "momentum_80th_percentile": float(np.quantile(values, 0.8, method="lower")),
+            "momentum_90th_percentile": float(np.quantile(values, 0.9, method="lower")),
+        }
+
+    def percent_rank(self, eligible: np.ndarray) -> np.ndarray:
+        """PERCENT_RANK() OVER (ORDER BY momentum) among the eligible feature rows"""
+        ordered = self.by_momentum[eligible[self.by_momentum]]
+        sorted_momentum = self.momentum[ordered]
+        ranks = np.zeros(len(self.rows))
+        if len(ordered) > 1:
+            # Rows with equal momentum share the rank of the first of them
+            ranks[ordered] = np.searchsorted(sorted_momentum, sorted_momentum, side="left") / (len(ordered) - 1)
+        return ranks
+
+    def rank(self, current_star_max: float) -> "RisingStarRanking":
+        return RisingStarRanking(self, current_star_max)
+
+
+class RisingStarRanking:
+    """Eligible restaurants for one star cap, scored and ordered best first"""
+
+    def __init__(self, features: RisingStarFeatures, current_star_max: float):
+        self.features = features
+        eligible = features.stars <= current_star_max
+        percentile = features.percent_rank(eligible)
+        ratio = features.score_star_ratio
+        stars, momentum = features.stars, features.momentum
+
+        # NaN cluster averages compare false, like the LEFT JOIN's NULLs
+        score = (
+            percentile * 0.4
+            + np.where(ratio > 20, 0.3, ratio / 20 * 0.3)
+            + np.where(stars >= features.cluster_avg_stars, 0.2, 0.1)
+            + np.where(momentum > features.cluster_avg_momentum, 0.1, 0.05)
+        )
+        category = np.select(
+            [
+                (percentile > 0.8) & (ratio > 15),
+                (percentile > 0.6) & (ratio > 10),
+                (percentile > 0.4) | (ratio > 8),
+            ],
+            REPORTED_CATEGORIES,
+            default="Low Potential",
+        )
+        advancement = np.select(
+            [stars < 3.5, stars < 4.0],
+            ["Breakthrough Candidate", "Recognition Candidate"],
+            default="Elite Advancement Candidate",
+        )
+
+        candidates = np.flatnonzero(eligible & (category != "Low Potential"))
+        self.order = candidates[np.argsort(-score[candidates], kind="stable")]
+        self.percentile = percentile
+        self.score = score
+        self.category = category
+        self.advancement = advancement
+
+    def top(self, limit: int, momentum_threshold: Optional[float] = None) -> List[dict]:
+        features = self.features
+        order = self.order
+        if momentum_threshold is not None:
+            order = order[features.momentum[order] >= momentum_threshold]
+        order = order[:max(limit, 0)]
+
+        predictions = features.snapshot.records(features.rows[order].tolist(), PREDICTION_FIELDS)
+        for prediction, i in zip(predictions, order.tolist()):
+            prediction.update({
+                "momentum_percentile": float(self.percentile[i]),
+                "score_star_ratio": float(features.score_star_ratio[i]),
+                "rising_star_score": float(self.score[i]),
+                "potential_category": str(self.category[i]),
+                "advancement_type": str(self.advancement[i]),
+                "cluster_avg_stars": _optional(features.cluster_avg_stars[i]),
+                "cluster_avg_momentum": _optional(features.cluster_avg_momentum[i]),
+            })
+        return predictions
+
+
+def build_rising_star_features(snapshot: CatalogSnapshot) -> RisingStarFeatures:
+    return RisingStarFeatures(snapshot)
@@ -0,0 +1,141 @@
+import numpy as np
+from typing import Dict, List, Optional
+from app.services.snapshot import CatalogSnapshot
+from app.services.grouping import group_count, group_mean, group_distinct, group_top_labels, group_top_rows
+
+SORT_COLUMNS = {
+    "score": "score",
+    "stars": "stars",
+    "momentum": "momentum",
+}
+
+RESTAURANT_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "cuisine": "cuisine",
+    "country": "country",
+    "stars": "stars",
+    "score": "score",
+    "momentum": "momentum",
+    "reputation": "reputation",
+    "badges": "badges",
+    "cluster": "cluster",
+    "score_color": "score_color",
+}
+
+PLURALS = {
+    "country": "countries",
+    "cuisine": "cuisines",
+}
+
+
+def _round(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+class Rollup:
+    """
+    Aggregates keyed by one label column (country or cuisine), matched case-insensitively,
+    with a breakdown by a second label column and ranked restaurant rows per sort key.
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot, dimension: str, breakdown: str):
+        self.snapshot = snapshot
+        self.dimension = dimension
+        self.breakdown = breakdown
+        labels = snapshot[dimension]
+
+        # Labels that differ only by case roll up together, like LOWER(x) = LOWER(@x)
+        lowered = [c.lower() for c in labels.categories.tolist()]
+        self.keys = sorted(set(lowered))
+        self.position = {key: i for i, key in enumerate(self.keys)}
+        group_of_code = np.array([self.position[key] for key in lowered], dtype=np.int64)
+
+        rows = np.flatnonzero(labels.codes >= 0)
+        inverse = group_of_code[labels.codes[rows]]
+        n = len(self.keys)
+
+        self.display = [names[0] for names in group_top_labels(inverse, n, labels, rows, 1)]
+        self.counts = group_count(inverse, n)
+        self.breakdown_available = group_distinct(inverse, n, snapshot[breakdown], rows)
+        self.clusters_represented = self._distinct_clusters(inverse, n, rows)
+        self.avg_stars = group_mean(inverse, n, snapshot["stars"][rows])
+        self.avg_score = group_mean(inverse, n, snapshot["score"][rows])
+        self.top_breakdown = group_top_labels(inverse, n, snapshot[breakdown], rows, 8)
+        self.reputation_types = group_top_labels(inverse, n, snapshot["reputation"], rows, 5)
+
+        self.ranked = {
+            sort_key: group_top_rows(inverse, n, snapshot[column], rows)
+            for sort_key, column in SORT_COLUMNS.items()
+        }
+        self.breakdowns = self._breakdowns(inverse, n, rows)
+
+    def _distinct_clusters(self, inverse: np.ndarray, n: int, rows: np.ndarray) -> np.ndarray:
+        cluster = self.snapshot["cluster"][rows]
+        present = ~np.isnan(cluster)
+        cluster_ids, cluster_codes = np.unique(cluster[present].astype(np.int64), return_inverse=True)
+        pairs = np.unique(inverse[present].astype(np.int64) * max(len(cluster_ids), 1) + cluster_codes)
+        return np.bincount(pairs // max(len(cluster_ids), 1), minlength=n)
+
+    def _breakdowns(self, inverse: np.ndarray, n: int, rows: np.ndarray) -> List[List[dict]]:
+        """Top 10 breakdown labels per group with their count and average stars"""
+        column = self.snapshot[self.breakdown]
+        codes = column.codes[rows]
+        present = codes >= 0
+        n_categories = max(len(column.categories), 1)
+        pairs, pair_index = np.unique(inverse[present].astype(np.int64) * n_categories + codes[present], return_inverse=True)
+        pair_counts = np.bincount(pair_index, minlength=len(pairs))
+        pair_stars = group_mean(pair_index, len(pairs), self.snapshot["stars"][rows][present])
+        groups = pairs // n_categories
+        order = np.lexsort((pairs % n_categories, -pair_counts, groups))
+
+        breakdowns: List[List[dict]] = [[] for _ in range(n)]
+        for p in order.tolist():
+            entries = breakdowns[groups[p]]
+            if len(entries) < 10:
+                entries.append({
+                    self.breakdown: str(column.categories[pairs[p] % n_categories]),
+                    "restaurant_count": int(pair_counts[p]),
+                    "avg_stars": _round(pair_stars[p]),
+                })
+        return breakdowns
+
+    def find(self, label: str) -> Optional[int]:
+        return self.position.get(label.lower())
+
+    def overview(self, i: int) -> dict:
+        return {
+            self.dimension: self.display[i],
+            "total_restaurants": int(self.counts[i]),
+            f"{PLURALS[self.breakdown]}_available": int(self.breakdown_available[i]),
+            "clusters_represented": int(self.clusters_represented[i]),
+            "avg_stars": _round(self.avg_stars[i]),
+            "avg_score": _round(self.avg_score[i]),
+            f"top_{PLURALS[self.breakdown]}": ",".join(self.top_breakdown[i]),
+            "reputation_types": ",".join(self.reputation_types[i]),
+        }
+
+    def top_restaurants(self, i: int, sort_by: str, limit: int) -> List[dict]:
+        rows = self.ranked[sort_by][i][:max(limit, 0)]
+        return self.snapshot.records(rows.tolist(), RESTAURANT_FIELDS)
+
+    def breakdown_for(self, i: int) -> List[dict]:
+        return self.breakdowns[i]
+
+
+class Rollups:
+    """Country and cuisine rollups built together in one pass over a snapshot"""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.version = snapshot.version
+        self.by: Dict[str, Rollup] = {
+            "country": Rollup(snapshot, "country", "cuisine"),
+            "cuisine": Rollup(snapshot, "cuisine", "country"),
+        }
+
+    def __getitem__(self, dimension: str) -> Rollup:
+        return self.by[dimension]
+
+
+def build_rollups(snapshot: CatalogSnapshot) -> Rollups:
+    return Rollups(snapshot)
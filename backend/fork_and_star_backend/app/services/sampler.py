@@ -0,0 +1,100 @@
+import numpy as np
+from typing import List, Optional
+from app.services.snapshot import CatalogSnapshot, Categorical
+
+
+def _rows_by_code(column: Categorical) -> List[np.ndarray]:
+    """Inverted index: category code -> rows holding it"""
+    order = np.argsort(column.codes, kind="stable")
+    bounds = np.searchsorted(column.codes[order], np.arange(len(column.categories) + 1))
+    return [order[bounds[c]:bounds[c + 1]] for c in range(len(column.categories))]
+
+
+def _floyd_sample(rng: np.random.Generator, n: int, k: int) -> List[int]:
+    """k distinct positions out of range(n) in O(k) time and memory (Floyd's algorithm)"""
+    chosen = set()
+    picks = []
+    for j in range(n - k, n):
+        t = int(rng.integers(0, j + 1))
+        if t in chosen:
+            t = j
+        chosen.add(t)
+        picks.append(t)
+    # Floyd yields a uniform subset but not a uniform order
+    rng.shuffle(picks)
+    return picks
+
+
+class DiscoverySampler:
+    """Filter indexes over the deduplicated catalog for "surprise me" style random draws"""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.snapshot = snapshot
+        self.by_cuisine = _rows_by_code(snapshot["cuisine"])
+        self.by_country = _rows_by_code(snapshot["country"])
+        stars = snapshot["stars"]
+        rated = np.flatnonzero(~np.isnan(stars))
+        self.by_stars = rated[np.argsort(stars[rated], kind="stable")]
+        self.sorted_stars = stars[self.by_stars]
+
+    def _label_rows(self, index: List[np.ndarray], column: Categorical, value: str) -> np.ndarray:
+        codes = column.codes_for(value)
+        if not codes:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([index[c] for c in codes])
+
+    def candidates(self, cuisine: Optional[str] = None, country: Optional[str] = None, min_stars: Optional[float] = None) -> Optional[np.ndarray]:
+        """Rows matching every filter, or None when no filter applies (the whole catalog)"""
+        snapshot = self.snapshot
+        sets = []
+        if cuisine:
+            sets.append(self._label_rows(self.by_cuisine, snapshot["cuisine"], cuisine))
+        if country:
+            sets.append(self._label_rows(self.by_country, snapshot["country"], country))
+        if min_stars is not None:
+            sets.append(self.by_stars[np.searchsorted(self.sorted_stars, min_stars, side="left"):])
+        if not sets:
+            return None
+
+        # Start from the smallest posting list and check the other filters per candidate
+        sets.sort(key=len)
+        rows = sets[0]
+        for other in sets[1:]:
+            rows = rows[np.isin(rows, other, assume_unique=True)]
+        return np.sort(rows)
+
+    def sample(
+        self,
+        count: int,
+        cuisine: Optional[str] = None,
+        country: Optional[str] = None,
+        min_stars: Optional[float] = None,
+        seed: Optional[int] = None,
+        weight_by_score: bool = False,
+    ) -> np.ndarray:
+        """Up to count distinct rows drawn at random from the filtered catalog"""
+        rng = np.random.default_rng(seed)
+        rows = self.candidates(cuisine, country, min_stars)
+        n = self.snapshot.size if rows is None else len(rows)
+        k = max(min(count, n), 0)
+
+        if weight_by_score and k > 0:
+            pool = np.arange(n) if rows is None else rows
+            weights = np.nan_to_num(self.snapshot["score"][pool], nan=0.0).clip(min=0.0)
+            positive = np.count_nonzero(weights)
+            if positive >= k:
+                # Efraimidis-Spirakis: keep the k largest u^(1/w) keys
+                keys = np.full(n, -np.inf)
+                nonzero = weights > 0
+                keys[nonzero] = np.log(rng.random(positive)) / weights[nonzero]
+                top = np.argpartition(-keys, k - 1)[:k]
+                picks = top[np.argsort(-keys[top])]
+                return pool[picks]
+            # Too few positively scored candidates to fill the page: draw uniformly instead
+
+        picks = _floyd_sample(rng, n, k)
+        return np.array(picks, dtype=np.int64) if rows is None else rows[picks]
+
+
+def build_sampler(snapshot: CatalogSnapshot) -> DiscoverySampler:
+    return DiscoverySampler(snapshot)
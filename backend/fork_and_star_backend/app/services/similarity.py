@@ -0,0 +1,61 @@
+import numpy as np
+from typing import Dict, List, Optional
+
+# Component weights for the overall pairwise similarity score
+SIMILARITY_WEIGHTS = {
+    "region": 0.3,
+    "cuisine": 0.3,
+    "green": 0.2,
+    "reputation": 0.2,
+}
+
+
+def _category_match(values: List[Optional[str]]) -> np.ndarray:
+    """1.0 where two restaurants share a (case-insensitive) label, 0.0 otherwise; missing labels never match"""
+    normalized = [v.strip().lower() if isinstance(v, str) and v.strip() else "" for v in values]
+    _, codes = np.unique(normalized, return_inverse=True)
+    present = np.array([v != "" for v in normalized])
+    match = (codes[:, None] == codes[None, :]) & present[:, None] & present[None, :]
+    return match.astype(np.float64)
+
+
+def _numeric_column(restaurants: List[dict], key: str) -> np.ndarray:
+    return np.array(
+        [np.nan if r.get(key) is None else float(r[key]) for r in restaurants],
+        dtype=np.float64,
+    )
+
+
+def pairwise_similarity(restaurants: List[dict]) -> Dict[str, np.ndarray]:
+    """
+    Compute N x N similarity matrices broken down by region, cuisine, green and reputation.
+    Expects dicts with country, cuisine, green_score and reputation keys.
+    """
+    green = _numeric_column(restaurants, "green_score")
+
+    components = {
+        "region": _category_match([r.get("country") for r in restaurants]),
+        "cuisine": _category_match([r.get("cuisine") for r in restaurants]),
+        # Green focus scores live in [0, 1], so closeness is 1 - |difference|
+        "green": 1.0 - np.abs(green[:, None] - green[None, :]),
+        "reputation": _category_match([r.get("reputation") for r in restaurants]),
+    }
+
+    overall = np.zeros((len(restaurants), len(restaurants)), dtype=np.float64)
+    for name, weight in SIMILARITY_WEIGHTS.items():
+        # A missing green score contributes nothing rather than poisoning the total
+        overall += weight * np.nan_to_num(components[name], nan=0.0)
+    components["overall"] = overall
+    return components
+
+
+def pairwise_difference(restaurants: List[dict], key: str) -> np.ndarray:
+    """N x N matrix of row minus column for a numeric field (NaN where either side is missing)"""
+    values = _numeric_column(restaurants, key)
+    return values[:, None] - values[None, :]
+
+
+def matrix_to_list(matrix: np.ndarray, digits: int = 3) -> List[List[Optional[float]]]:
+    """Round a matrix for JSON output, replacing NaN with None"""
+    rounded = np.round(matrix, digits)
+    return [[None if np.isnan(v) else float(v) for v in row] for row in rounded]
@@ -0,0 +1,391 @@
+import hashlib
+import logging
+import threading
+import time
+import numpy as np
+from cachetools import LRUCache
+from contextvars import ContextVar
+from google.cloud import bigquery
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from app.services.metrics import SNAPSHOT_REFRESH_SECONDS, SNAPSHOT_VERSION, record_cache
+from app.services.request_context import current_endpoint, current_request
+from app.services.timing import span
+
+logger = logging.getLogger(__name__)
+
+# One row per restaurant: Base_* attributes are repeated on every recommendation pair row
+CATALOG_QUERY = """
+    SELECT
+        Base_ID as id,
+        ANY_VALUE(Base_Name) as name,
+        ANY_VALUE(Base_Cuisine) as cuisine,
+        ANY_VALUE(Base_Country) as country,
+        ANY_VALUE(Base_Reputation_Label) as reputation,
+        ANY_VALUE(Base_Badge_List) as badges,
+        ANY_VALUE(Base_Score_Color) as score_color,
+        ANY_VALUE(Base_Momentum_Score) as momentum_label,
+        ANY_VALUE(Base_Cluster_Explainability_Label) as cluster_label,
+        ANY_VALUE(Base_Cluster) as cluster,
+        ANY_VALUE(Base_Star_Rating) as stars,
+        ANY_VALUE(Base_Recalculated_Score) as score,
+        ANY_VALUE(Base_Momentum_Score_Num) as momentum,
+        ANY_VALUE(Base_UMAP_1) as umap_x,
+        ANY_VALUE(Base_UMAP_2) as umap_y,
+        AVG(green_focus_score) as green
+    FROM `{table}`
+    WHERE Base_ID IS NOT NULL
+    GROUP BY Base_ID
+"""
+
+CATEGORICAL_COLUMNS = ["name", "cuisine", "country", "reputation", "badges", "score_color", "momentum_label", "cluster_label"]
+NUMERIC_COLUMNS = ["cluster", "stars", "score", "momentum", "umap_x", "umap_y", "green"]
+# Numeric columns that hold whole numbers and are returned as int
+INTEGER_COLUMNS = {"cluster"}
+
+
+class Categorical:
+    """Dictionary-encoded string column: int32 codes into a sorted array of categories, -1 for NULL"""
+
+    def __init__(self, codes: np.ndarray, categories: np.ndarray):
+        self.codes = codes
+        self.categories = categories
+        self._lower_index = None
+
+    @classmethod
+    def from_values(cls, values: List[Optional[str]]) -> "Categorical":
+        present = [v for v in values if v is not None]
+        categories = np.array(sorted(set(present)), dtype=str)
+        lookup = {c: i for i, c in enumerate(categories.tolist())}
+        codes = np.array([-1 if v is None else lookup[v] for v in values], dtype=np.int32)
+        return cls(codes, categories)
+
+    def value(self, row: int) -> Optional[str]:
+        code = self.codes[row]
+        return None if code < 0 else str(self.categories[code])
+
+    def codes_for(self, value: str, case_insensitive: bool = True) -> List[int]:
+        """Category codes matching value (several when labels differ only by case)"""
+        if not case_insensitive:
+            hits = np.flatnonzero(self.categories == value)
+            return hits.tolist()
+        if self._lower_index is None:
+            index: Dict[str, List[int]] = {}
+            for code, category in enumerate(self.categories.tolist()):
+                index.setdefault(category.lower(), []).append(code)
+            self._lower_index = index
+        return self._lower_index.get(value.lower(), [])
+
+    def mask(self, value: str, case_insensitive: bool = True) -> np.ndarray:
+        return np.isin(self.codes, self.codes_for(value, case_insensitive))
+
+
+class CatalogSnapshot:
+    """Immutable columnar view of the restaurant catalog for one data version"""
+
+    def __init__(self, columns: Dict[str, Any], version: int, loaded_at: float):
+        self.columns = columns
+        self.version = version
+        self.loaded_at = loaded_at
+        self.ids = columns["id"]
+        self.size = len(self.ids)
+        self.row_by_id = {int(rid): row for row, rid in enumerate(self.ids.tolist())}
+        self._derived: Dict[str, Any] = {}
+        # How each derived structure was built, so the next version can be prewarmed with the same set
+        self._builders: Dict[str, Callable[["CatalogSnapshot"], Any]] = {}
+        self._inherited: Dict[str, Any] = {}
+        self._memos: Dict[str, LRUCache] = {}
+        self._content_hash: Optional[str] = None
+        # Re-entrant so a builder can depend on another derived structure
+        self._lock = threading.RLock()
+
+    def __getitem__(self, column: str):
+        return self.columns[column]
+
+    @property
+    def content_hash(self) -> str:
+        """
+        Digest of the catalog data itself. Unlike version (a per-process counter), it is the same
+        in every worker and across restarts for the same data, so it can back HTTP validators.
+        """
+        if self._content_hash is None:
+            digest = hashlib.sha1(np.ascontiguousarray(self.ids).tobytes())
+            for column in CATEGORICAL_COLUMNS + NUMERIC_COLUMNS:
+                data = self.columns[column]
+                digest.update(column.encode("utf-8"))
+                if isinstance(data, Categorical):
+                    digest.update(np.ascontiguousarray(data.codes).tobytes())
+                    digest.update("\x00".join(data.categories.tolist()).encode("utf-8"))
+                else:
+                    digest.update(np.ascontiguousarray(data).tobytes())
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    def value(self, column: str, row: int):
+        """Python value of one cell (None for NULL)"""
+        data = self.columns[column]
+        if isinstance(data, Categorical):
+            return data.value(row)
+        raw = data[row]
+        if column == "id":
+            return int(raw)
+        if np.isnan(raw):
+            return None
+        return int(raw) if column in INTEGER_COLUMNS else float(raw)
+
+    def records(self, rows: Iterable[int], fields: Dict[str, str]) -> List[dict]:
+        """Materialize rows as dicts of alias -> value, like `SELECT column AS alias`"""
+        return [{alias: self.value(column, row) for alias, column in fields.items()} for row in rows]
+
+    def derived(self, key: str, builder: Callable[["CatalogSnapshot"], Any]) -> Any:
+        """Build a derived structure once per snapshot (and so once per data version)"""
+        value = self._derived.get(key)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(key)
+                if value is None:
+                    record_cache(f"derived:{key}", False)
+                    with span("derived_build"):
+                        value = builder(self)
+                    self._derived[key] = value
+                    self._builders[key] = builder
+                    return value
+        record_cache(f"derived:{key}", True)
+        return value
+
+    def memo(self, namespace: str, key: Any, builder: Callable[[], Any], maxsize: int = 32) -> Any:
+        """Cache a parameterized result for this data version (bounded LRU per namespace)"""
+        with self._lock:
+            cache = self._memos.get(namespace)
+            if cache is None:
+                cache = self._memos[namespace] = LRUCache(maxsize=maxsize)
+            if key in cache:
+                record_cache(f"memo:{namespace}", True)
+                return cache[key]
+        record_cache(f"memo:{namespace}", False)
+        with span("memo_build"):
+            value = builder()
+        with self._lock:
+            cache[key] = value
+        return value
+
+    def inherit(self, previous: "CatalogSnapshot"):
+        """Keep the previous version's incremental structures so builders can update rather than rebuild them"""
+        self._inherited = {
+            key: value for key, value in previous._derived.items()
+            if getattr(value, "incremental", False)
+        }
+
+    def inherited(self, key: str) -> Any:
+        """Previous version's structure for key (handed out once), or None"""
+        return self._inherited.pop(key, None)
+
+
+def build_snapshot(rows: Iterable[dict], version: int) -> CatalogSnapshot:
+    rows = list(rows)
+    columns: Dict[str, Any] = {"id": np.array([r["id"] for r in rows], dtype=np.int64)}
+    for column in CATEGORICAL_COLUMNS:
+        columns[column] = Categorical.from_values([r[column] for r in rows])
+    for column in NUMERIC_COLUMNS:
+        columns[column] = np.array(
+            [np.nan if r[column] is None else float(r[column]) for r in rows],
+            dtype=np.float64,
+        )
+    return CatalogSnapshot(columns, version=version, loaded_at=time.time())
+
+
+class SnapshotStore:
+    """
+    Lazily loads the catalog snapshot and hands out the current version. With a disk
+    (SnapshotDisk) the snapshot is read from memory-mapped files when they are current
+    and only rebuilt from BigQuery (and written back) when they are missing or stale.
+    """
+
+    def __init__(
+        self,
+        client: bigquery.Client,
+        table: str,
+        prewarm: Optional[Dict[str, Callable[[CatalogSnapshot], Any]]] = None,
+        disk=None,
+    ):
+        self.client = client
+        self.table = table
+        # Derived structures built as part of loading a snapshot rather than on first request
+        self.prewarm = dict(prewarm or {})
+        self.disk = disk
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+        # Source table's last-modified time as of the current snapshot
+        self._source_modified = None
+        self._lock = threading.Lock()
+
+    def query(self, source_modified=None) -> CatalogSnapshot:
+        """Build the next version from BigQuery"""
+        query = CATALOG_QUERY.format(table=self.table)
+        # Attributed to the snapshot rather than whichever request happened to trigger the load,
+        # and run as background work: no request deadline, no stale fallback, no cached copy
+        token = current_endpoint.set("snapshot")
+        request_token = current_request.set(None)
+        try:
+            with span("snapshot_rows"):
+                rows = [dict(row) for row in self.client.query(query).result()]
+        finally:
+            current_request.reset(request_token)
+            current_endpoint.reset(token)
+        self._version += 1
+        self._source_modified = source_modified
+        with span("snapshot_build"):
+            return build_snapshot(rows, version=self._version)
+
+    def load(self, source_modified=None) -> CatalogSnapshot:
+        """
+        Next snapshot: from disk when another process (or an earlier run) already wrote one at
+        least as new as source_modified, otherwise from BigQuery. Without source_modified
+        (a cold start) any newer on-disk version will do.
+        """
+        if self.disk is None:
+            return self.query(source_modified)
+        with self.disk.locked():
+            manifest = self.disk.current()
+            if manifest is not None and manifest["version"] > self._version:
+                on_disk = self.disk.source_modified(manifest)
+                if source_modified is None or (on_disk is not None and on_disk >= source_modified):
+                    with span("snapshot_map"):
+                        snapshot = self.disk.read(manifest)
+                    self._version = snapshot.version
+                    self._source_modified = on_disk
+                    return snapshot
+            # Versions stay monotonic across every process sharing the directory
+            self._version = max(self._version, manifest["version"] if manifest else 0)
+            snapshot = self.query(source_modified)
+            with span("snapshot_write"):
+                manifest = self.disk.write(snapshot, source_modified)
+            # Serve the mapped copy so this process shares pages with the other workers
+            return self.disk.read(manifest)
+
+    def _warm(self, snapshot: CatalogSnapshot, previous: Optional[CatalogSnapshot] = None) -> CatalogSnapshot:
+        # Prewarm hooks first, then everything requests had built on the previous version
+        builders = dict(self.prewarm)
+        if previous is not None:
+            for key, builder in previous._builders.items():
+                builders.setdefault(key, builder)
+        for key, builder in builders.items():
+            snapshot.derived(key, builder)
+        return snapshot
+
+    def _publish(self, snapshot: CatalogSnapshot):
+        # A single reference swap: readers see the old snapshot or the fully built new one
+        self._snapshot = snapshot
+        SNAPSHOT_VERSION.set(snapshot.version)
+
+    def refresh(self, source_modified=None) -> CatalogSnapshot:
+        """Reload and fully warm a new version off to the side, then swap it in"""
+        started = time.perf_counter()
+        with self._lock:
+            previous = self._snapshot
+            snapshot = self.load(source_modified)
+            if previous is not None:
+                snapshot.inherit(previous)
+            self._publish(self._warm(snapshot, previous))
+        SNAPSHOT_REFRESH_SECONDS.observe(time.perf_counter() - started)
+        return snapshot
+
+    def refresh_if_modified(self, modified) -> bool:
+        """Load, or reload when the source table's modified time moved past the loaded one"""
+        if self._snapshot is None:
+            # A cold start may come up from disk with an older source; compared below
+            self.get()
+        if modified is None or self._source_modified is None:
+            # Loaded without metadata (lazily by a request): nothing to compare against yet
+            self._source_modified = self._source_modified or modified
+            return False
+        if modified <= self._source_modified:
+            return False
+        logger.info("Catalog table modified at %s, refreshing snapshot", modified)
+        self.refresh(modified)
+        return True
+
+    def get(self) -> CatalogSnapshot:
+        """Current snapshot; within a request, the same one on every call"""
+        pinned = _pinned_snapshots.get()
+        if pinned is not None and id(self) in pinned:
+            return pinned[id(self)]
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._publish(self._warm(self.load()))
+                snapshot = self._snapshot
+        if pinned is not None:
+            pinned[id(self)] = snapshot
+        return snapshot
+
+    def pin_snapshot(self) -> Optional[CatalogSnapshot]:
+        """Pin the current request to the loaded snapshot (never loads one) and return it, or None"""
+        pinned = _pinned_snapshots.get()
+        snapshot = pinned.get(id(self)) if pinned is not None else None
+        if snapshot is None:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return None
+            if pinned is not None:
+                pinned[id(self)] = snapshot
+        return snapshot
+
+    def pin(self) -> Optional[int]:
+        """Pin the current request to the loaded snapshot (never loads one); its version or None"""
+        snapshot = self.pin_snapshot()
+        return None if snapshot is None else snapshot.version
+
+    @property
+    def version(self) -> Optional[int]:
+        snapshot = self._snapshot
+        return None if snapshot is None else snapshot.version
+
+    def status(self) -> dict:
+        """Warmth of the current snapshot (never triggers a load)"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "version": snapshot.version,
+            "rows": snapshot.size,
+            "age_seconds": round(time.time() - snapshot.loaded_at, 1),
+            "source_modified": self._source_modified.isoformat() if self._source_modified else None,
+            "derived": sorted(snapshot._derived),
+        }
+
+
+# Per-request map of store -> snapshot, so a request that calls get() several times never
+# mixes two data versions; set up (and read back for X-Data-Version) by DataVersionMiddleware
+_pinned_snapshots: ContextVar[Optional[Dict[int, CatalogSnapshot]]] = ContextVar("pinned_snapshots", default=None)
+
+
+class DataVersionMiddleware:
+    """Pure ASGI middleware that pins each request to one snapshot and reports it as X-Data-Version"""
+
+    def __init__(self, app, store: SnapshotStore):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        pinned: Dict[int, CatalogSnapshot] = {}
+        token = _pinned_snapshots.set(pinned)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                snapshot = pinned.get(id(self.store))
+                version = snapshot.version if snapshot is not None else self.store.version
+                headers = message.get("headers", [])
+                if version is not None and not any(name.lower() == b"x-data-version" for name, _ in headers):
+                    headers = list(headers) + [(b"x-data-version", str(version).encode("latin-1"))]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _pinned_snapshots.reset(token)
@@ -0,0 +1,127 @@
+import datetime
+import fcntl
+import json
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Optional
+import numpy as np
+from app.services.snapshot import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, Categorical, CatalogSnapshot
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Older version directories kept around for workers that still have them mapped
+KEEP_VERSIONS = 2
+
+
+class SnapshotDisk:
+    """
+    Catalog snapshots persisted as one .npy file per column block, memory-mapped read-only.
+
+    Layout under root: v<version>/ holds id.npy, <numeric>.npy, <categorical>.codes.npy,
+    <categorical>.categories.npy and manifest.json; CURRENT names the live directory and is
+    replaced atomically. Every worker maps the same files, so the OS page cache holds one
+    copy however many workers run, and a restart reads the columns back without BigQuery.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    @contextmanager
+    def locked(self):
+        """Cross-process lock so only one worker rebuilds a version at a time"""
+        with open(os.path.join(self.root, ".lock"), "w") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def current(self) -> Optional[dict]:
+        """Manifest of the live version (None when missing, unreadable or from another format)"""
+        try:
+            with open(os.path.join(self.root, "CURRENT")) as handle:
+                directory = handle.read().strip()
+            with open(os.path.join(self.root, directory, "manifest.json")) as handle:
+                manifest = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        expected = {"format": FORMAT_VERSION, "categorical": CATEGORICAL_COLUMNS, "numeric": NUMERIC_COLUMNS}
+        if any(manifest.get(key) != value for key, value in expected.items()):
+            logger.warning("Ignoring on-disk snapshot %s: written by a different schema", directory)
+            return None
+        manifest["directory"] = directory
+        return manifest
+
+    @staticmethod
+    def source_modified(manifest: dict) -> Optional[datetime.datetime]:
+        raw = manifest.get("source_modified")
+        return datetime.datetime.fromisoformat(raw) if raw else None
+
+    def read(self, manifest: dict) -> CatalogSnapshot:
+        path = os.path.join(self.root, manifest["directory"])
+
+        def mapped(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        columns = {"id": mapped("id")}
+        for column in CATEGORICAL_COLUMNS:
+            columns[column] = Categorical(mapped(f"{column}.codes"), mapped(f"{column}.categories"))
+        for column in NUMERIC_COLUMNS:
+            columns[column] = mapped(column)
+        return CatalogSnapshot(columns, version=manifest["version"], loaded_at=manifest["loaded_at"])
+
+    def write(self, snapshot: CatalogSnapshot, source_modified: Optional[datetime.datetime] = None) -> dict:
+        """Persist a snapshot as the new live version and return its manifest"""
+        directory = f"v{snapshot.version}"
+        staging = tempfile.mkdtemp(prefix=f".{directory}-", dir=self.root)
+        try:
+            np.save(os.path.join(staging, "id.npy"), np.ascontiguousarray(snapshot["id"]))
+            for column in CATEGORICAL_COLUMNS:
+                np.save(os.path.join(staging, f"{column}.codes.npy"), np.ascontiguousarray(snapshot[column].codes))
+                np.save(os.path.join(staging, f"{column}.categories.npy"), np.ascontiguousarray(snapshot[column].categories))
+            for column in NUMERIC_COLUMNS:
+                np.save(os.path.join(staging, f"{column}.npy"), np.ascontiguousarray(snapshot[column]))
+            manifest = {
+                "format": FORMAT_VERSION,
+                "version": snapshot.version,
+                "rows": snapshot.size,
+                "loaded_at": snapshot.loaded_at,
+                "source_modified": source_modified.isoformat() if source_modified else None,
+                "categorical": CATEGORICAL_COLUMNS,
+                "numeric": NUMERIC_COLUMNS,
+            }
+            with open(os.path.join(staging, "manifest.json"), "w") as handle:
+                json.dump(manifest, handle)
+            target = os.path.join(self.root, directory)
+            if os.path.exists(target):
+                shutil.rmtree(target)
+            os.rename(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        pointer = os.path.join(self.root, ".CURRENT.tmp")
+        with open(pointer, "w") as handle:
+            handle.write(directory)
+        os.replace(pointer, os.path.join(self.root, "CURRENT"))
+        self._prune(snapshot.version)
+        manifest["directory"] = directory
+        return manifest
+
+    def _prune(self, live_version: int):
+        # Unlinking is safe even while another worker has the files mapped
+        for name in os.listdir(self.root):
+            if name.startswith("v") and name[1:].isdigit() and int(name[1:]) <= live_version - KEEP_VERSIONS:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+
+def snapshot_disk_from_env() -> Optional[SnapshotDisk]:
+    """SnapshotDisk at SNAPSHOT_DIR, or None (in-memory only) when it is unset"""
+    root = os.getenv("SNAPSHOT_DIR")
+    return SnapshotDisk(root) if root else None
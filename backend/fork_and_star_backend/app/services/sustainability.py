@@ -0,0 +1,167 @@
+import numpy as np
+from typing import List, Optional
+from app.services.snapshot import CatalogSnapshot
+from app.services.grouping import group_index, group_count, group_mean, group_top_labels
+
+TOP_GREEN_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "cuisine": "cuisine",
+    "country": "country",
+    "green_score": "green",
+    "stars": "stars",
+    "overall_score": "score",
+    "badges": "badges",
+    "cluster": "cluster",
+}
+
+# Lower bounds of the green-level buckets, highest first
+GREEN_LEVELS = [
+    (0.8, "Very High Green (0.8+)"),
+    (0.6, "High Green (0.6-0.8)"),
+    (0.4, "Medium Green (0.4-0.6)"),
+    (0.2, "Low Green (0.2-0.4)"),
+    (-np.inf, "Very Low Green (0-0.2)"),
+]
+
+
+def _round(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _percentage(part: int, total: int) -> Optional[float]:
+    return round(part * 100.0 / total, 1) if total else None
+
+
+def _label_leaders(snapshot: CatalogSnapshot, rows: np.ndarray, dimension: str, limit: int, with_score: bool) -> List[dict]:
+    """Green leaders per country or cuisine among rows (5+ restaurants, best average green first)"""
+    labels = snapshot[dimension]
+    rows = rows[labels.codes[rows] >= 0]
+    inverse = labels.codes[rows]
+    n = len(labels.categories)
+    green = snapshot["green"][rows]
+
+    counts = group_count(inverse, n)
+    avg_green = group_mean(inverse, n, green)
+    avg_stars = group_mean(inverse, n, snapshot["stars"][rows])
+    avg_score = group_mean(inverse, n, snapshot["score"][rows])
+    high = np.bincount(inverse[green > 0.7], minlength=n)
+
+    groups = np.flatnonzero(counts >= 5)
+    groups = groups[np.lexsort((groups, -np.round(avg_green[groups], 3)))][:limit]
+    leaders = []
+    for g in groups.tolist():
+        entry = {
+            dimension: str(labels.categories[g]),
+            "restaurant_count": int(counts[g]),
+            "avg_green_score": _round(avg_green[g], 3),
+            "avg_stars": _round(avg_stars[g]),
+        }
+        if with_score:
+            entry["avg_overall_score"] = _round(avg_score[g])
+        entry["high_green_restaurants"] = int(high[g])
+        entry["green_percentage"] = _percentage(int(high[g]), int(counts[g]))
+        leaders.append(entry)
+    return leaders
+
+
+class SustainabilityBaseline:
+    """Green aggregates that do not depend on min_green_score, built once per data version"""
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        green = snapshot["green"]
+        self.green_rows = np.flatnonzero(~np.isnan(green))
+        # Green rows sorted by score, best first, so a threshold is a prefix of this order
+        self.by_green = self.green_rows[np.lexsort((snapshot.ids[self.green_rows], -green[self.green_rows]))]
+        self.sorted_green = green[self.by_green]
+        self.correlation = self._correlation(snapshot)
+        self.clusters = self._clusters(snapshot)
+        self.overall = self._overall(green[self.green_rows])
+
+    def _correlation(self, snapshot: CatalogSnapshot) -> List[dict]:
+        rows = self.green_rows[~np.isnan(snapshot["stars"][self.green_rows])]
+        green = snapshot["green"][rows]
+        level = np.select([green >= bound for bound, _ in GREEN_LEVELS], np.arange(len(GREEN_LEVELS)))
+        n = len(GREEN_LEVELS)
+        counts = group_count(level, n)
+        avg_stars = group_mean(level, n, snapshot["stars"][rows])
+        avg_score = group_mean(level, n, snapshot["score"][rows])
+        avg_momentum = group_mean(level, n, snapshot["momentum"][rows])
+        return [
+            {
+                "green_level": name,
+                "restaurant_count": int(counts[i]),
+                "avg_stars": _round(avg_stars[i]),
+                "avg_score": _round(avg_score[i]),
+                "avg_momentum": _round(avg_momentum[i]),
+            }
+            for i, (_, name) in enumerate(GREEN_LEVELS) if counts[i] > 0
+        ]
+
+    def _clusters(self, snapshot: CatalogSnapshot) -> List[dict]:
+        cluster = snapshot["cluster"]
+        rows = self.green_rows[~np.isnan(cluster[self.green_rows])]
+        cluster_ids, inverse = group_index(cluster[rows].astype(np.int64))
+        n = len(cluster_ids)
+        green = snapshot["green"][rows]
+        counts = group_count(inverse, n)
+        avg_green = group_mean(inverse, n, green)
+        avg_stars = group_mean(inverse, n, snapshot["stars"][rows])
+        high = np.bincount(inverse[green > 0.6], minlength=n)
+        descriptions = group_top_labels(inverse, n, snapshot["cluster_label"], rows, 1)
+
+        groups = np.flatnonzero(counts >= 10)
+        groups = groups[np.lexsort((groups, -np.round(avg_green[groups], 3)))][:10]
+        return [
+            {
+                "cluster_id": int(cluster_ids[g]),
+                "cluster_description": descriptions[g][0] if descriptions[g] else None,
+                "restaurant_count": int(counts[g]),
+                "avg_green_score": _round(avg_green[g], 3),
+                "avg_stars": _round(avg_stars[g]),
+                "high_green_count": int(high[g]),
+                "green_percentage": _percentage(int(high[g]), int(counts[g])),
+            }
+            for g in groups.tolist()
+        ]
+
+    def _overall(self, green: np.ndarray) -> dict:
+        total = len(green)
+        high = int(np.count_nonzero(green > 0.6))
+        return {
+            "total_restaurants": total,
+            "global_avg_green_score": _round(green.mean(), 3) if total else None,
+            "min_green_score": _round(green.min(), 3) if total else None,
+            "max_green_score": _round(green.max(), 3) if total else None,
+            "very_high_green_count": int(np.count_nonzero(green > 0.8)),
+            "high_green_count": high,
+            "medium_green_count": int(np.count_nonzero(green > 0.4)),
+            "high_green_percentage": _percentage(high, total),
+        }
+
+    def bucket(self, min_green_score: float) -> int:
+        """Number of restaurants at or above the threshold; thresholds with the same count select the same rows"""
+        # sorted_green is descending, so search its negation
+        return int(np.searchsorted(-self.sorted_green, -min_green_score, side="right"))
+
+
+class SustainabilityReport:
+    """Threshold-dependent green leaders, computed in one pass over the qualifying rows"""
+
+    def __init__(self, snapshot: CatalogSnapshot, baseline: SustainabilityBaseline, bucket: int):
+        self.snapshot = snapshot
+        self.top_rows = baseline.by_green[:bucket]
+        rows = np.sort(self.top_rows)
+        self.countries = _label_leaders(snapshot, rows, "country", 15, with_score=True)
+        self.cuisines = _label_leaders(snapshot, rows, "cuisine", 10, with_score=False)
+
+    def top_green(self, limit: int) -> List[dict]:
+        records = self.snapshot.records(self.top_rows[:max(limit, 0)].tolist(), TOP_GREEN_FIELDS)
+        for record in records:
+            record["green_score"] = None if record["green_score"] is None else round(record["green_score"], 3)
+            record["overall_score"] = None if record["overall_score"] is None else round(record["overall_score"], 2)
+        return records
+
+
+def build_sustainability_baseline(snapshot: CatalogSnapshot) -> SustainabilityBaseline:
+    return SustainabilityBaseline(snapshot)
@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from app.services.request_context import resolve_endpoint
+
+request_logger = logging.getLogger("fork_and_star.requests")
+
+# Requests slower than this land in the slow-request ring buffer (viewable under /admin)
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+SLOW_REQUEST_BUFFER = int(os.getenv("SLOW_REQUEST_BUFFER", "200"))
+
+
+class RequestTimings:
+    """
+    Per-stage durations of one request. Spans may nest; each stage is charged its
+    own time only (children are subtracted), so the stages add up to at most the total.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self._children: List[float] = []
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def stages_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+
+    def header(self) -> str:
+        parts = [f"{name};dur={ms}" for name, ms in self.stages_ms().items()]
+        parts.append(f"total;dur={round(self.total_ms(), 2)}")
+        return ", ".join(parts)
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """Time a stage of the current request (a no-op outside of requests)"""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    timings._children.append(0.0)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings.add(name, elapsed - timings._children.pop())
+        if timings._children:
+            timings._children[-1] += elapsed
+
+
+class SlowRequestLog:
+    """Ring buffer of the most recent slow requests"""
+
+    def __init__(self, threshold_ms: float = SLOW_REQUEST_MS, capacity: int = SLOW_REQUEST_BUFFER):
+        self.threshold_ms = threshold_ms
+        self.capacity = capacity
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def offer(self, entry: dict) -> bool:
+        if entry["total_ms"] < self.threshold_ms:
+            return False
+        with self._lock:
+            self._entries.append(entry)
+        return True
+
+    def recent(self, limit: Optional[int] = None) -> List[dict]:
+        """Newest first"""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries if limit is None else entries[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_requests = SlowRequestLog()
+
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware that collects span timings for each request, sends them as a
+    Server-Timing header, logs them as one JSON line and keeps slow requests in a ring buffer.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_timings.reset(token)
+            entry = {
+                "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "endpoint": resolve_endpoint(scope),
+                "status": status["code"],
+                "total_ms": round(timings.total_ms(), 2),
+                "stages_ms": timings.stages_ms(),
+            }
+            entry["slow"] = slow_requests.offer(entry)
+            request_logger.info(json.dumps(entry))
@@ -0,0 +1,153 @@
+"""
+Encode-time benchmark for the large recommendation payloads.
+
+Compares, per endpoint, the old path (jsonable_encoder + json.dumps, what FastAPI does with a
+returned dict), the generic orjson path the other endpoints now get (jsonable_encoder + orjson),
+and the typed path (model_construct + pydantic-core) used by /maps/discovery and /filter.
+Payloads are synthetic but shaped like the real responses.
+
+    python bench_serialization.py [--points 5000] [--page-size 1000] [--repeat 20]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from fastapi.encoders import jsonable_encoder
+from app.schemas.restaurant import (
+    ClusterMapSummary, DataFreshness, DiscoveryMapResponse, FilteredRestaurant, FilterResponse, HeatmapCell, MapPoint,
+)
+from app.services.serialization import dumps
+
+CUISINES = ["Japanese", "French", "Italian", "Modern American", "Nordic", "Peruvian", None]
+COUNTRIES = ["Japan", "France", "Italy", "USA", "Denmark", "Peru"]
+
+
+def map_rows(n: int):
+    return [
+        {
+            "id": i,
+            "name": f"Restaurant {i}",
+            "x": random.uniform(-10, 10),
+            "y": random.uniform(-10, 10),
+            "cuisine": random.choice(CUISINES),
+            "country": random.choice(COUNTRIES),
+            "stars": random.choice([1.0, 2.0, 3.0, None]),
+            "score": random.uniform(0, 100),
+            "cluster": i % 12,
+            "score_color": random.choice(["green", "yellow", "red"]),
+            "badges": "Michelin,50 Best",
+            "reputation": "Elite",
+            "momentum": random.uniform(-1, 1),
+        }
+        for i in range(n)
+    ]
+
+
+def filter_rows(n: int):
+    return [
+        {
+            "id": i,
+            "name": f"Restaurant {i}",
+            "cuisine": random.choice(CUISINES),
+            "country": random.choice(COUNTRIES),
+            "reputation": "Elite",
+            "stars": random.choice([1.0, 2.0, 3.0]),
+            "score_color": "green",
+            "badges": "Michelin",
+            "momentum": "Rising",
+            "cluster": i % 12,
+            "score": random.uniform(0, 100),
+        }
+        for i in range(n)
+    ]
+
+
+def discovery_payload(rows):
+    clusters = [
+        {
+            "cluster_id": c, "cluster_name": f"Cluster {c}", "restaurant_count": 100,
+            "centroid_x": 0.5, "centroid_y": -0.5, "min_x": -9.0, "max_x": 9.0, "min_y": -9.0, "max_y": 9.0,
+            "avg_stars": 2.1, "avg_score": 71.3, "top_cuisines": "French,Japanese", "top_countries": "France,Japan",
+        }
+        for c in range(12)
+    ]
+    heatmap = [
+        {"x": x / 2, "y": y / 2, "count": 3, "avg_stars": 1.5, "avg_score": 60.2, "cuisines": ["French", "Nordic"]}
+        for x in range(-20, 20) for y in range(-20, 20)
+    ]
+    return {
+        "map_config": {"bounds": {"min_x": -10, "max_x": 10}, "total_points": len(rows), "filters_applied": {}},
+        "restaurants": rows,
+        "clusters": clusters,
+        "cluster_profile_freshness": {"data_version": 1, "built_at": "2025-01-01T00:00:00Z", "age_seconds": 1.0},
+        "heatmap_data": heatmap,
+        "visualization_layers": {"restaurants": "Individual restaurant points with details"},
+    }
+
+
+def discovery_typed(payload):
+    return DiscoveryMapResponse.model_construct(
+        map_config=payload["map_config"],
+        restaurants=[MapPoint.model_construct(**row) for row in payload["restaurants"]],
+        clusters=[ClusterMapSummary.model_construct(**cluster) for cluster in payload["clusters"]],
+        cluster_profile_freshness=DataFreshness.model_construct(**payload["cluster_profile_freshness"]),
+        heatmap_data=[HeatmapCell.model_construct(**cell) for cell in payload["heatmap_data"]],
+        visualization_layers=payload["visualization_layers"],
+    )
+
+
+def filter_payload(rows):
+    return {"restaurants": rows, "page": 1, "limit": len(rows), "total_results": len(rows), "filters_applied": {"cuisine": "French"}}
+
+
+def filter_typed(payload):
+    return FilterResponse.model_construct(
+        restaurants=[FilteredRestaurant.model_construct(**row) for row in payload["restaurants"]],
+        page=payload["page"],
+        limit=payload["limit"],
+        total_results=payload["total_results"],
+        filters_applied=payload["filters_applied"],
+    )
+
+
+def starlette_dumps(content) -> bytes:
+    # JSONResponse.render before the switch
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def timed(fn, repeat: int) -> float:
+    """Median milliseconds per call"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=5000, help="restaurants on the discovery map")
+    parser.add_argument("--page-size", type=int, default=1000, help="restaurants in one /filter page")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    random.seed(0)
+
+    endpoints = {
+        "/recommendations/maps/discovery": (discovery_payload(map_rows(args.points)), discovery_typed),
+        "/recommendations/filter": (filter_payload(filter_rows(args.page_size)), filter_typed),
+    }
+    print(f"{'endpoint':34} {'encoder+json':>13} {'encoder+orjson':>15} {'typed':>8} {'speedup':>8} {'bytes':>9}")
+    for endpoint, (payload, typed) in endpoints.items():
+        baseline = starlette_dumps(jsonable_encoder(payload))
+        fast = dumps(typed(payload))
+        assert json.loads(fast) == json.loads(baseline), f"{endpoint}: typed output differs"
+        old = timed(lambda: starlette_dumps(jsonable_encoder(payload)), args.repeat)
+        generic = timed(lambda: dumps(jsonable_encoder(payload)), args.repeat)
+        new = timed(lambda: dumps(typed(payload)), args.repeat)
+        print(f"{endpoint:34} {old:11.2f}ms {generic:13.2f}ms {new:6.2f}ms {old / new:7.1f}x {len(fast):9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+_CUISINES = ["French", "Japanese", "Italian", None]
+_COUNTRIES = ["France", "Japan", "Italy"]
+
+
+def make_rows(n: int = 12):
+    """Small fixed catalog in the shape of CATALOG_QUERY rows"""
+    rows = []
+    for i in range(n):
+        rows.append({
+            "id": 100 + i,
+            "name": f"Restaurant {i}",
+            "cuisine": _CUISINES[i % len(_CUISINES)],
+            "country": _COUNTRIES[i % len(_COUNTRIES)],
+            "reputation": "Elite" if i % 2 else "Rising",
+            "badges": "Michelin" if i % 3 == 0 else None,
+            "score_color": "green" if i % 2 else "yellow",
+            "momentum_label": "Rising" if i % 4 == 0 else "Stable",
+            "cluster_label": f"Cluster {i % 3}",
+            "cluster": i % 3,
+            "stars": float(i % 4) if i != 5 else None,
+            "score": 50.0 + i * 3,
+            "momentum": (i % 5) / 5 - 0.4,
+            "umap_x": None if i == 7 else float(i % 6) - 2.5,
+            "umap_y": None if i == 7 else float(i % 4) - 1.5,
+            "green": None if i == 3 else float(i * 7 % 10),
+        })
+    return rows
+
+
+def make_market_rows(n: int = 400, seed: int = 7):
+    """Seeded catalog dense enough to populate grids, partitions and country x cuisine gaps"""
+    rng = np.random.default_rng(seed)
+    countries = ["France", "Japan", "Italy", "Spain", "Peru", "Denmark"]
+    cuisines = ["French", "Japanese", "Italian", "Nordic", "Peruvian", "Tapas", "Modern", "Fusion"]
+    rows = []
+    for i in range(n):
+        country = int(rng.integers(len(countries)))
+        cuisine = int(rng.integers(len(cuisines)))
+        if (country + cuisine) % 5 == 0:
+            cuisine = (cuisine + 1) % len(cuisines)  # leave some country x cuisine cells empty
+        missing = rng.random() < 0.08
+        rows.append({
+            "id": 1000 + i,
+            "name": f"Restaurant {i}",
+            "cuisine": None if rng.random() < 0.03 else cuisines[cuisine],
+            "country": countries[country],
+            "reputation": ["Elite", "Rising", "Established"][i % 3],
+            "badges": "Michelin" if i % 7 == 0 else None,
+            "score_color": ["green", "yellow", "red"][i % 3],
+            "momentum_label": "Rising" if i % 4 == 0 else "Stable",
+            "cluster_label": f"Cluster {i % 5}",
+            "cluster": None if i % 23 == 0 else i % 5,
+            "stars": None if missing else float(rng.integers(0, 6)),
+            "score": round(float(rng.uniform(20, 100)), 1),
+            "momentum": round(float(rng.uniform(-1, 1)), 2),
+            "umap_x": None if i % 31 == 0 else round(float(rng.normal(0, 3)), 2),
+            "umap_y": None if i % 31 == 0 else round(float(rng.normal(0, 3)), 2),
+            "green": None if rng.random() < 0.1 else round(float(rng.uniform(0, 1)), 3),
+        })
+    return rows
+
+
+@pytest.fixture
+def catalog_rows():
+    return make_rows()
+
+
+@pytest.fixture
+def market_rows():
+    return make_market_rows()
@@ -0,0 +1,174 @@
+import concurrent.futures
+from types import SimpleNamespace
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from google.api_core import exceptions as api_exceptions
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.services.query_guard import GuardedClient, QueryBudget
+from app.services.request_context import RequestContextMiddleware
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, **settings):
+    options = dict(window_seconds=60, min_calls=4, error_rate=0.5, slow_seconds=10, slow_rate=0.8, open_seconds=30)
+    options.update(settings)
+    return CircuitBreaker(clock=clock, **options)
+
+
+class FakeBigQuery:
+    """Answers every query with `rows`, or raises `error` while it is set"""
+
+    def __init__(self):
+        self.rows = [{"id": 1}]
+        self.error = None
+        self.calls = []
+
+    def query(self, sql, job_config=None, timeout=None, **kwargs):
+        self.calls.append(sql)
+        if self.error is not None and job_config is not None and job_config.dry_run:
+            raise self.error
+
+        def result(timeout=None, **kwargs):
+            if self.error is not None:
+                raise self.error
+            return list(self.rows)
+
+        return SimpleNamespace(result=result, cancel=lambda: None, total_bytes_processed=1, cache_hit=False, slot_millis=1)
+
+
+def make_app(breaker, budgets=None):
+    bigquery = FakeBigQuery()
+    guarded = GuardedClient(bigquery, budgets=budgets or {}, breaker=breaker)
+    revalidations = []
+    guarded._revalidator = SimpleNamespace(submit=lambda *args: revalidations.append(args))
+    app = FastAPI()
+
+    @app.get("/recommendations/demo")
+    def demo(q: str = "a"):
+        return {"rows": guarded.query(f"SELECT {q}").result()}
+
+    app.add_middleware(RequestContextMiddleware)
+    return TestClient(app), bigquery, revalidations
+
+
+def test_opens_once_error_rate_reaches_threshold():
+    breaker = make_breaker(Clock())
+    breaker.record(0.1, failed=False)
+    breaker.record(0.1, failed=False)
+    breaker.record(0.1, failed=True)
+    assert breaker.state == CLOSED  # below min_calls
+    breaker.record(0.1, failed=True)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_lets_a_single_trial_through():
+    clock = Clock()
+    breaker = make_breaker(clock, min_calls=1)
+    breaker.record(0.1, failed=True)
+    clock.now += 29
+    assert not breaker.allow()
+    assert breaker.retry_after() == 1
+
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record(0.1, failed=True)
+    assert breaker.state == OPEN
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(0.1, failed=False)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_trial_that_never_reports_back_is_replaced():
+    clock = Clock()
+    breaker = make_breaker(clock, min_calls=1)
+    breaker.record(0.1, failed=True)
+    clock.now += 30
+    assert breaker.allow()
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_serves_stale_result_while_bigquery_fails():
+    client, bigquery, revalidations = make_app(make_breaker(Clock()))
+    fresh = client.get("/recommendations/demo")
+    assert fresh.status_code == 200
+    assert "x-data-stale" not in fresh.headers
+
+    bigquery.error = api_exceptions.ServiceUnavailable("down")
+    stale = client.get("/recommendations/demo")
+    assert stale.status_code == 200
+    assert stale.json() == fresh.json()
+    assert stale.headers["x-data-stale"] == "true"
+    assert stale.headers["cache-control"] == "no-store"
+    assert len(revalidations) == 1
+
+
+def test_open_circuit_serves_stale_without_calling_bigquery():
+    breaker = make_breaker(Clock(), min_calls=1)
+    client, bigquery, _ = make_app(breaker)
+    client.get("/recommendations/demo")
+    breaker.record(0.1, failed=True)
+    assert breaker.state == OPEN
+
+    calls = len(bigquery.calls)
+    stale = client.get("/recommendations/demo")
+    assert stale.headers["x-data-stale"] == "true"
+    assert len(bigquery.calls) == calls
+
+
+def test_unavailable_without_usable_result():
+    breaker = make_breaker(Clock())
+    client, bigquery, _ = make_app(breaker)
+
+    bigquery.error = api_exceptions.ServiceUnavailable("down")
+    failed = client.get("/recommendations/demo")
+    assert failed.status_code == 503
+    assert "retry-after" in failed.headers
+
+    bigquery.error = concurrent.futures.TimeoutError()
+    timed_out = client.get("/recommendations/demo")
+    assert timed_out.status_code == 504
+    assert breaker.status()["window_calls"] == 2
+
+
+def test_budget_timeouts_do_not_count_against_bigquery():
+    breaker = make_breaker(Clock())
+    client, bigquery, _ = make_app(breaker, budgets={"/recommendations/demo": QueryBudget(max_seconds=1)})
+    bigquery.error = concurrent.futures.TimeoutError()
+    assert client.get("/recommendations/demo").status_code == 504
+    assert breaker.status()["window_calls"] == 0
+
+
+def test_failed_dry_runs_are_recorded():
+    breaker = make_breaker(Clock())
+    client, bigquery, _ = make_app(breaker, budgets={"/recommendations/demo": QueryBudget(max_bytes=10 ** 9)})
+    bigquery.error = api_exceptions.ServiceUnavailable("down")
+    assert client.get("/recommendations/demo").status_code == 503
+    assert breaker.status() == {"state": CLOSED, "window_calls": 1, "window_error_rate": 1.0}
+
+
+def test_queries_outside_requests_are_not_cached_or_served_stale():
+    bigquery = FakeBigQuery()
+    guarded = GuardedClient(bigquery, budgets={}, breaker=make_breaker(Clock()))
+    assert guarded.query("SELECT catalog").result() == [{"id": 1}]
+    assert len(guarded._last_results) == 0
+
+    bigquery.error = api_exceptions.ServiceUnavailable("down")
+    with pytest.raises(api_exceptions.ServiceUnavailable):
+        guarded.query("SELECT catalog")
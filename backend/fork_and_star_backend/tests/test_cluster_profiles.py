@@ -0,0 +1,85 @@
+import math
+from collections import Counter, defaultdict
+from app.services.cluster_profiles import build_cluster_profiles, build_map_cluster_profiles
+from app.services.snapshot import build_snapshot
+
+
+def _avg(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def reference_clusters(rows):
+    """GROUP BY Base_Cluster, one dict per cluster"""
+    groups = defaultdict(list)
+    for r in rows:
+        if r["cluster"] is not None:
+            groups[r["cluster"]].append(r)
+    stats = {}
+    for cluster_id, members in groups.items():
+        cuisines = Counter(r["cuisine"] for r in members if r["cuisine"] is not None)
+        stats[cluster_id] = {
+            "restaurant_count": len(members),
+            "avg_stars": round(_avg([r["stars"] for r in members]), 2),
+            "avg_score": round(_avg([r["score"] for r in members]), 2),
+            "avg_umap_x": _avg([r["umap_x"] for r in members]),
+            "avg_umap_y": _avg([r["umap_y"] for r in members]),
+            # Most frequent first, ties alphabetical
+            "top_cuisines": ",".join(sorted(cuisines, key=lambda c: (-cuisines[c], c))[:5]),
+        }
+    return stats
+
+
+def reference_related(stats, cluster_id, limit):
+    """The cluster_similarity query: weighted distance to every other cluster, closest first"""
+    source = stats[cluster_id]
+    scored = []
+    for other_id, other in stats.items():
+        if other_id == cluster_id:
+            continue
+        umap = math.hypot(other["avg_umap_x"] - source["avg_umap_x"], other["avg_umap_y"] - source["avg_umap_y"])
+        distance = (
+            umap * 0.4
+            + abs(other["avg_stars"] - source["avg_stars"]) * 0.3
+            + abs(other["avg_score"] - source["avg_score"]) / 10 * 0.2
+            + abs(other["restaurant_count"] - source["restaurant_count"]) / 50 * 0.1
+        )
+        scored.append((distance, other_id))
+    return [other_id for _, other_id in sorted(scored)[:limit]]
+
+
+def test_profiles_match_the_group_by(market_rows):
+    profiles = build_cluster_profiles(build_snapshot(market_rows, version=1))
+    expected = reference_clusters(market_rows)
+    assert profiles.by_size() == sorted(expected, key=lambda c: (-expected[c]["restaurant_count"], c))
+    for cluster_id, stats in expected.items():
+        profile = profiles.profile(cluster_id)
+        assert profile["restaurant_count"] == stats["restaurant_count"]
+        assert profile["avg_stars"] == stats["avg_stars"]
+        assert profile["avg_score"] == stats["avg_score"]
+        assert profile["avg_umap_x"] == round(stats["avg_umap_x"], 6)
+        assert profile["avg_umap_y"] == round(stats["avg_umap_y"], 6)
+        assert profile["top_cuisines"] == stats["top_cuisines"]
+
+
+def test_related_clusters_match_the_similarity_query(market_rows):
+    profiles = build_cluster_profiles(build_snapshot(market_rows, version=1))
+    expected = reference_clusters(market_rows)
+    for cluster_id in expected:
+        related = profiles.related(cluster_id, limit=3)
+        assert [entry["cluster_id"] for entry in related] == reference_related(expected, cluster_id, 3)
+        assert all(len(entry["sample_restaurants"]) <= 3 for entry in related)
+    assert 99 not in profiles
+
+
+def test_map_profiles_only_count_mapped_restaurants(market_rows):
+    profiles = build_map_cluster_profiles(build_snapshot(market_rows, version=1))
+    mapped = [r for r in market_rows if r["umap_x"] is not None and r["umap_y"] is not None]
+    assert len(mapped) < len(market_rows)
+    for cluster_id, stats in reference_clusters(mapped).items():
+        summary = profiles.map_summary(cluster_id)
+        members = [r for r in mapped if r["cluster"] == cluster_id]
+        assert summary["restaurant_count"] == stats["restaurant_count"]
+        assert summary["avg_stars"] == stats["avg_stars"]
+        assert summary["min_x"] == min(r["umap_x"] for r in members)
+        assert summary["max_y"] == max(r["umap_y"] for r in members)
@@ -0,0 +1,50 @@
+import math
+import pytest
+from app.services.green_recommendations import GreenCandidates, find_base_restaurant
+from app.services.snapshot import build_snapshot
+from app.services.sustainability import build_sustainability_baseline
+
+
+def reference_recommendations(rows, base, min_green_score):
+    """The green recommendation query scored in float64, row by row"""
+    scored = []
+    for r in rows:
+        if r["id"] == base["id"] or r["name"] is None or r["green"] is None or r["green"] < min_green_score:
+            continue
+        if None in (r["stars"], r["umap_x"], r["umap_y"]):
+            continue
+        geo = math.hypot(r["umap_x"] - base["umap_x"], r["umap_y"] - base["umap_y"])
+        score = (
+            (1 - abs(r["green"] - base["green_score"])) * 0.4
+            + 1 / (1 + geo) * 0.2
+            + (0.3 if r["cuisine"] is not None and r["cuisine"] == base["cuisine"] else 0.0)
+            + (0.2 if r["country"] == base["country"] else 0.0)
+            + r["stars"] / 5 * 0.1
+        )
+        scored.append((score, r["id"]))
+    return sorted(scored, key=lambda s: (-s[0], s[1]))
+
+
+@pytest.mark.parametrize("min_green_score", [0.0, 0.5])
+def test_recommendations_match_the_scoring_query(market_rows, min_green_score):
+    snapshot = build_snapshot(market_rows, version=1)
+    baseline = build_sustainability_baseline(snapshot)
+    candidates = GreenCandidates(snapshot, baseline, baseline.bucket(min_green_score))
+    base = find_base_restaurant(snapshot, "restaurant 1")
+    assert base["id"] == 1001
+
+    expected = reference_recommendations(market_rows, base, min_green_score)[:20]
+    recommendations = candidates.recommend(base, 20)
+    assert [r["id"] for r in recommendations] == [rid for _, rid in expected]
+    assert [r["recommendation_score"] for r in recommendations] == pytest.approx([score for score, _ in expected], abs=1e-5)
+    assert base["id"] not in {r["id"] for r in recommendations}
+
+
+def test_market_context_counts_the_qualifying_restaurants(market_rows):
+    snapshot = build_snapshot(market_rows, version=1)
+    baseline = build_sustainability_baseline(snapshot)
+    context = GreenCandidates(snapshot, baseline, baseline.bucket(0.5)).context
+    green = [r["green"] for r in market_rows if r["green"] is not None and r["green"] >= 0.5]
+    assert context["total_green_restaurants"] == len(green)
+    assert context["high_green_count"] == sum(1 for g in green if g > 0.6)
+    assert find_base_restaurant(snapshot, "No Such Place") is None
@@ -0,0 +1,54 @@
+import math
+import numpy as np
+import pytest
+from app.services.histograms import build_histogram, build_score_distribution, parse_bins
+from app.services.snapshot import build_snapshot
+
+
+def test_parse_bins_accepts_counts_and_edges():
+    assert parse_bins("10") == (10, None)
+    assert parse_bins("0, 2.5, inf") == (None, (0.0, 2.5, math.inf))
+    for spec in ["0", "201", "a", "3,1", "1,x"]:
+        with pytest.raises(ValueError):
+            parse_bins(spec)
+
+
+@pytest.mark.parametrize("bins", ["7", "20,40,60,80,100"])
+def test_histogram_matches_numpy(market_rows, bins):
+    snapshot = build_snapshot(market_rows, version=1)
+    histogram = build_histogram(snapshot, "score", bins)
+    scores = np.array([r["score"] for r in market_rows])
+    counts, edges = np.histogram(scores, bins=histogram.edges)
+    assert histogram.counts[0].tolist() == counts.tolist()
+    if bins == "7":
+        assert edges.tolist() == np.histogram_bin_edges(scores, bins=7).tolist()
+    first = scores[(scores >= edges[0]) & (scores < edges[1])]
+    bucket = histogram.buckets()[0]
+    assert (bucket["min"], bucket["max"], bucket["avg"]) == (first.min(), first.max(), round(first.mean(), 2))
+
+
+def test_grouped_histogram_splits_by_cluster(market_rows):
+    snapshot = build_snapshot(market_rows, version=1)
+    result = build_histogram(snapshot, "stars", "0,1,2,3,4,5", group_by="cluster", measure="score").to_dict()
+    for group in result["groups"]:
+        members = [r for r in market_rows if r["cluster"] == group["group"] and r["stars"] is not None]
+        assert group["total"] == len(members)
+        top = [r for r in members if r["stars"] >= 4]
+        assert group["buckets"][-1]["avg_score"] == round(sum(r["score"] for r in top) / len(top), 2)
+    with pytest.raises(ValueError):
+        build_histogram(snapshot, "stars", "5", group_by="cuisine")
+
+
+def test_score_distribution_matches_the_bucket_queries(market_rows):
+    distribution = build_score_distribution(build_snapshot(market_rows, version=1))
+    stars = [r["stars"] for r in market_rows if r["stars"] is not None]
+    # FLOOR(stars * 2) / 2 buckets, non-empty only
+    assert [(b["star_bucket"], b["count"]) for b in distribution["star_rating"]] == sorted(
+        (bucket, sum(1 for s in stars if math.floor(s * 2) / 2 == bucket)) for bucket in {math.floor(s * 2) / 2 for s in stars}
+    )
+    scores = [r["score"] for r in market_rows]
+    by_decile = {}
+    for s in scores:
+        decile = min(max(int(s // 10), 0), 9)
+        by_decile.setdefault(f"{decile * 10}-{decile * 10 + 10}", []).append(s)
+    assert {b["score_bucket"]: b["count"] for b in distribution["calculated_score"]} == {k: len(v) for k, v in by_decile.items()}
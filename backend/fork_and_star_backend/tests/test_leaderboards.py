@@ -0,0 +1,85 @@
+import pytest
+from app.services.leaderboards import METRIC_COLUMNS, build_leaderboards
+from app.services.snapshot import build_snapshot
+
+
+def reference_top(rows, metric, dimension="all", key="all"):
+    """WHERE metric IS NOT NULL [AND LOWER(dimension) = key] ORDER BY metric DESC, id"""
+    column = METRIC_COLUMNS[metric]
+    selected = [
+        r for r in rows
+        if r[column] is not None and (
+            dimension == "all"
+            or (dimension == "cluster" and r["cluster"] == key)
+            or (dimension not in ("all", "cluster") and r[dimension] is not None and r[dimension].lower() == key)
+        )
+    ]
+    return [r["id"] for r in sorted(selected, key=lambda r: (-r[METRIC_COLUMNS[metric]], r["id"]))]
+
+
+def partitions(rows):
+    keys = {("all", "all")}
+    for r in rows:
+        for dimension in ("country", "cuisine"):
+            if r[dimension] is not None:
+                keys.add((dimension, r[dimension].lower()))
+        if r["cluster"] is not None:
+            keys.add(("cluster", r["cluster"]))
+    return keys
+
+
+def assert_matches_reference(boards, rows):
+    for metric in METRIC_COLUMNS:
+        for dimension, key in partitions(rows):
+            expected = reference_top(rows, metric, dimension, key)
+            assert boards.top_ids(metric, dimension, key, limit=len(rows)).tolist() == expected, (metric, dimension, key)
+
+
+def test_leaderboards_match_the_ordered_queries(market_rows):
+    boards = build_leaderboards(build_snapshot(market_rows, version=1))
+    assert_matches_reference(boards, market_rows)
+    assert boards.top_ids("score", "country", "FRANCE", limit=3).tolist() == reference_top(market_rows, "score", "country", "france")[:3]
+    assert boards.top_ids("score", "country", "Atlantis").tolist() == []
+
+
+def test_positive_top_ids_drops_non_positive_values(market_rows):
+    boards = build_leaderboards(build_snapshot(market_rows, version=1))
+    by_id = {r["id"]: r for r in market_rows}
+    top = boards.positive_top_ids("momentum", limit=len(market_rows))
+    assert top == [i for i in reference_top(market_rows, "momentum") if by_id[i]["momentum"] > 0]
+    assert boards.has_positive_momentum
+
+
+def test_incremental_update_matches_a_fresh_build(market_rows):
+    first = build_snapshot(market_rows, version=1)
+    previous = first.derived("leaderboards", build_leaderboards)
+
+    changed = [dict(r) for r in market_rows[1:]]  # one restaurant removed
+    changed[0]["score"] = 99.9  # one rescored
+    changed[1]["country"] = "Japan"  # one moved partition
+    changed.append({**market_rows[0], "id": 9999, "cuisine": "Nordic"})  # one added
+    second = build_snapshot(changed, version=2)
+    second.inherit(first)
+    updated = second.derived("leaderboards", build_leaderboards)
+    fresh = build_leaderboards(build_snapshot(changed, version=2))
+
+    assert_matches_reference(updated, changed)
+    for metric in METRIC_COLUMNS:
+        assert updated.boards[metric].keys() == fresh.boards[metric].keys()
+    assert 0 < updated.rebuilt_partitions < fresh.rebuilt_partitions
+    # Untouched partitions are shared with the previous version rather than re-sorted
+    reused = {key for key, board in updated.boards["score"].items() if board is previous.boards["score"].get(key)}
+    assert reused
+    assert ("all", "all") not in reused
+    assert ("country", "japan") not in reused
+
+
+@pytest.mark.parametrize("metric", list(METRIC_COLUMNS))
+def test_unchanged_data_reuses_every_partition(market_rows, metric):
+    first = build_snapshot(market_rows, version=1)
+    previous = first.derived("leaderboards", build_leaderboards)
+    second = build_snapshot(market_rows, version=2)
+    second.inherit(first)
+    updated = second.derived("leaderboards", build_leaderboards)
+    assert updated.rebuilt_partitions == 0
+    assert all(updated.boards[metric][key] is previous.boards[metric][key] for key in previous.boards[metric])
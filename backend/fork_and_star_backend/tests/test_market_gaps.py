@@ -0,0 +1,150 @@
+import math
+from collections import defaultdict
+import numpy as np
+import pytest
+from app.services.market_gaps import _box3, cuisine_gaps, geographic_gaps, market_overview
+from app.services.snapshot import build_snapshot
+
+
+def _avg(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _round(value, digits):
+    return None if value is None else round(value, digits)
+
+
+def sql_order(gap):
+    """ORDER BY opportunity_score DESC, neighbor_avg_stars DESC (the rounded alias, NULLs last)"""
+    return -gap["opportunity_score"], gap["neighbor_avg_stars"] is None, -(gap["neighbor_avg_stars"] or 0)
+
+
+def reference_geographic_gaps(rows, grid_size, min_threshold):
+    """The grid_analysis / neighboring_grids / opportunity_analysis query, row by row"""
+    cells = defaultdict(list)
+    for r in rows:
+        if r["umap_x"] is not None and r["umap_y"] is not None:
+            cells[(math.floor(r["umap_x"] / grid_size) * grid_size, math.floor(r["umap_y"] / grid_size) * grid_size)].append(r)
+    grid = {
+        key: {
+            "count": len(members),
+            "avg_stars": _avg([r["stars"] for r in members]),
+            "avg_score": _avg([r["score"] for r in members]),
+            "cuisines": sorted({r["cuisine"] for r in members if r["cuisine"] is not None}),
+            "countries": sorted({r["country"] for r in members if r["country"] is not None}),
+        }
+        for key, members in cells.items()
+    }
+    gaps = []
+    for (gx, gy), cell in grid.items():
+        neighbours = [
+            other for (ox, oy), other in grid.items()
+            if abs(gx - ox) <= grid_size and abs(gy - oy) <= grid_size and (gx, gy) != (ox, oy)
+        ]
+        neighbour_count = _avg([n["count"] for n in neighbours])
+        neighbour_stars = _avg([n["avg_stars"] for n in neighbours])
+        below = cell["count"] < min_threshold
+        if below and neighbour_count is not None and neighbour_count >= min_threshold and neighbour_stars is not None and neighbour_stars >= 4.0:
+            level, score = "High Opportunity", 100
+        elif below and neighbour_count is not None and neighbour_count >= 2:
+            level, score = "Medium Opportunity", 75
+        else:
+            continue
+        gaps.append({
+            "grid_x": float(gx),
+            "grid_y": float(gy),
+            "restaurant_count": cell["count"],
+            "avg_stars": _round(cell["avg_stars"], 2),
+            "avg_score": _round(cell["avg_score"], 2),
+            "cuisine_diversity": len(cell["cuisines"]),
+            "cuisines_present": ",".join(cell["cuisines"][:5]) or None,
+            "countries_present": ",".join(cell["countries"][:3]) or None,
+            "neighbor_avg_count": _round(neighbour_count, 1),
+            "neighbor_avg_stars": _round(neighbour_stars, 2),
+            "opportunity_level": level,
+            "opportunity_score": score,
+        })
+    return gaps
+
+
+def reference_cuisine_gaps(rows, limit=15):
+    """The cuisine_country_matrix / country_stats / popular_cuisines query, row by row"""
+    matrix = defaultdict(list)
+    for r in rows:
+        if r["country"] is not None and r["cuisine"] is not None:
+            matrix[(r["country"], r["cuisine"])].append(r["stars"])
+    countries = defaultdict(lambda: {"total": 0, "cell_stars": []})
+    cuisines = defaultdict(lambda: {"countries": set(), "count": 0})
+    for (country, cuisine), stars in matrix.items():
+        countries[country]["total"] += len(stars)
+        countries[country]["cell_stars"].append(_avg(stars))
+        cuisines[cuisine]["countries"].add(country)
+        cuisines[cuisine]["count"] += len(stars)
+    popular = sorted((c for c, v in cuisines.items() if len(v["countries"]) >= 3), key=lambda c: (-cuisines[c]["count"], c))[:10]
+    gaps = []
+    for country, stats in countries.items():
+        if stats["total"] < 10:
+            continue
+        avg_stars = _avg(stats["cell_stars"])
+        for cuisine in popular:
+            if (country, cuisine) in matrix:
+                continue
+            gaps.append({
+                "country": country,
+                "cuisine": cuisine,
+                "country_total_restaurants": stats["total"],
+                "country_avg_stars": _round(avg_stars, 2),
+                "cuisine_global_popularity": cuisines[cuisine]["count"],
+                "gap_type": "Missing Popular Cuisine",
+                "opportunity_score": None if avg_stars is None else round(avg_stars * cuisines[cuisine]["count"] / 100, 2),
+            })
+    # ORDER BY opportunity_score DESC (NULLs last), ties by country then cuisine
+    gaps.sort(key=lambda g: (g["opportunity_score"] is None, -(g["opportunity_score"] or 0), g["country"], g["cuisine"]))
+    return gaps[:limit]
+
+
+def test_box3_sums_each_neighbourhood():
+    grid = np.arange(12, dtype=np.float64).reshape(3, 4)
+    expected = [[sum(grid[a, b] for a in range(max(i - 1, 0), min(i + 2, 3)) for b in range(max(j - 1, 0), min(j + 2, 4))) for j in range(4)] for i in range(3)]
+    assert _box3(grid).tolist() == expected
+
+
+@pytest.mark.parametrize("grid_size,min_threshold", [(1.0, 3), (0.5, 2), (2.0, 8)])
+def test_geographic_gaps_match_the_grid_query(market_rows, grid_size, min_threshold):
+    snapshot = build_snapshot(market_rows, version=1)
+    expected = reference_geographic_gaps(market_rows, grid_size, min_threshold)
+    assert len(expected) > 20
+    gaps = geographic_gaps(snapshot, grid_size, min_threshold, min_star_rating=0, limit=len(expected))
+
+    def position(gap):
+        return gap["grid_x"], gap["grid_y"]
+
+    assert sorted(gaps, key=position) == sorted(expected, key=position)
+    # Ties under the query's ORDER BY had no defined order; only the ordering keys must agree
+    assert [sql_order(g) for g in gaps] == sorted(sql_order(g) for g in expected)
+    assert geographic_gaps(snapshot, grid_size, min_threshold, min_star_rating=0) == gaps[:20]
+
+
+def test_min_star_rating_drops_cells_with_weaker_neighbours(market_rows):
+    snapshot = build_snapshot(market_rows, version=1)
+    gaps = geographic_gaps(snapshot, 1.0, 3, min_star_rating=2.5)
+    assert gaps
+    assert all(g["neighbor_avg_stars"] is None or g["neighbor_avg_stars"] >= 2.5 for g in gaps)
+    with pytest.raises(ValueError):
+        geographic_gaps(snapshot, 0, 3, 0)
+
+
+def test_cuisine_gaps_match_the_matrix_query(market_rows):
+    expected = reference_cuisine_gaps(market_rows)
+    assert expected
+    assert cuisine_gaps(build_snapshot(market_rows, version=1)) == expected
+
+
+def test_market_overview_counts_distinct_values(market_rows):
+    overview = market_overview(build_snapshot(market_rows, version=1))
+    assert overview["total_restaurants"] == len(market_rows)
+    assert overview["total_cuisines"] == len({r["cuisine"] for r in market_rows if r["cuisine"]})
+    assert overview["total_clusters"] == len({r["cluster"] for r in market_rows if r["cluster"] is not None})
+    assert overview["avg_stars"] == round(_avg([r["stars"] for r in market_rows]), 2)
+    assert overview["min_umap_x"] == round(min(r["umap_x"] for r in market_rows if r["umap_x"] is not None), 2)
@@ -0,0 +1,52 @@
+import time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from app.services.metrics import MetricsMiddleware, TimedJSONResponse, metrics_response, record_cache, record_query
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def make_client():
+    app = FastAPI(default_response_class=TimedJSONResponse)
+
+    @app.get("/restaurants/{restaurant_id}")
+    def restaurant(restaurant_id: int):
+        return {"id": restaurant_id}
+
+    app.add_middleware(MetricsMiddleware)
+    return TestClient(app)
+
+
+def test_requests_are_labelled_by_route_template():
+    client = make_client()
+    labels = {"method": "GET", "endpoint": "/restaurants/{restaurant_id}", "status": "200"}
+    before = sample("http_request_duration_seconds_count", **labels)
+    # No RequestContextMiddleware here, so encoding is attributed to the default endpoint
+    encoded = sample("http_response_serialization_seconds_count", endpoint="background")
+    client.get("/restaurants/1")
+    client.get("/restaurants/2")
+    assert sample("http_request_duration_seconds_count", **labels) == before + 2
+    assert sample("http_response_serialization_seconds_count", endpoint="background") == encoded + 2
+
+    unmatched = {"method": "GET", "endpoint": "unmatched", "status": "404"}
+    before = sample("http_request_duration_seconds_count", **unmatched)
+    client.get("/nowhere/3")
+    assert sample("http_request_duration_seconds_count", **unmatched) == before + 1
+
+
+def test_query_and_cache_metrics():
+    before_bytes = sample("bigquery_bytes_processed_sum", endpoint="/test")
+    before_hits = sample("bigquery_queries_total", endpoint="/test", cache_hit="true")
+    job = SimpleNamespace(total_bytes_processed=2048, slot_millis=5, cache_hit=True)
+    record_query("/test", job, time.perf_counter(), rows=3)
+    assert sample("bigquery_bytes_processed_sum", endpoint="/test") == before_bytes + 2048
+    assert sample("bigquery_queries_total", endpoint="/test", cache_hit="true") == before_hits + 1
+
+    before = sample("cache_requests_total", cache="test", result="miss")
+    record_cache("test", False)
+    assert sample("cache_requests_total", cache="test", result="miss") == before + 1
+    assert b"cache_requests_total" in metrics_response().body
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.middleware import install_middleware
+
+ORIGINS = ["http://localhost:3000", "http://127.0.0.1:3000"]
+
+
+def make_client():
+    app = FastAPI()
+    calls = []
+
+    @app.get("/recommendations/tags")
+    def tags():
+        calls.append(1)
+        return {"tags": ["michelin"] * 200}
+
+    snapshot = SimpleNamespace(version=1, content_hash="0123456789abcdef0123")
+    store = SimpleNamespace(pin=lambda: 1, pin_snapshot=lambda: snapshot, version=1)
+    install_middleware(app, store, ORIGINS)
+    return TestClient(app), calls
+
+
+def test_cached_hit_gets_cors_headers_for_each_origin():
+    client, calls = make_client()
+    first = client.get("/recommendations/tags", headers={"Origin": ORIGINS[1]})
+    second = client.get("/recommendations/tags", headers={"Origin": ORIGINS[0]})
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert len(calls) == 1
+    assert first.headers["access-control-allow-origin"] == ORIGINS[1]
+    assert second.headers["access-control-allow-origin"] == ORIGINS[0]
+
+
+def test_response_cached_without_origin_still_gets_cors_headers():
+    client, _ = make_client()
+    client.get("/recommendations/tags")
+    hit = client.get("/recommendations/tags", headers={"Origin": ORIGINS[0]})
+    assert hit.headers["x-cache"] == "HIT"
+    assert hit.headers["access-control-allow-origin"] == ORIGINS[0]
+    assert "Origin" in hit.headers["vary"]
+
+
+def test_not_modified_gets_cors_headers():
+    client, _ = make_client()
+    etag = client.get("/recommendations/tags", headers={"Origin": ORIGINS[0]}).headers["etag"]
+    not_modified = client.get("/recommendations/tags", headers={"Origin": ORIGINS[1], "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["access-control-allow-origin"] == ORIGINS[1]
+    assert not_modified.headers["etag"] == etag
@@ -0,0 +1,76 @@
+import threading
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.services.profiler import ProfiledRoute, ProfilerMiddleware, profile_requested
+
+TOKEN = "secret"
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def own_work():
+    busy(0.2)
+
+
+def other_work(stop):
+    while not stop.is_set():
+        busy(0.01)
+
+
+def make_app():
+    app = FastAPI()
+    app.router.route_class = ProfiledRoute
+
+    @app.get("/work")
+    def work(kind: str = "own", stop=None):
+        if kind == "own":
+            own_work()
+        else:
+            other_work(stop)
+        return {"kind": kind}
+
+    app.add_middleware(ProfilerMiddleware)
+    return app, work
+
+
+def test_profile_requires_the_flag_and_the_admin_token(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", TOKEN)
+    scope = {"query_string": b"_profile=1", "headers": [(b"x-admin-token", TOKEN.encode())]}
+    assert profile_requested(scope)
+    assert not profile_requested({**scope, "headers": [(b"x-admin-token", b"wrong")]})
+    assert not profile_requested({"query_string": b"", "headers": [(b"x-admin-token", TOKEN.encode())]})
+
+
+def test_only_the_profiled_requests_thread_is_sampled(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", TOKEN)
+    app, work = make_app()
+    # Another request running the same endpoint in another thread while this one is profiled
+    stop = threading.Event()
+    other = threading.Thread(target=work, kwargs={"kind": "other", "stop": stop})
+    other.start()
+    try:
+        response = TestClient(app).get("/work", headers={"X-Profile": "1", "X-Admin-Token": TOKEN})
+    finally:
+        stop.set()
+        other.join()
+
+    body = response.json()
+    assert body["status"] == 200
+    assert body["response"] == {"kind": "own"}
+    collapsed = body["profile"]["collapsed"]
+    assert "own_work" in collapsed
+    assert "other_work" not in collapsed
+    assert all(stack.startswith("work (") for stack in collapsed.splitlines() if "own_work" in stack)
+
+
+def test_unprofiled_requests_pass_through(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", TOKEN)
+    app, _ = make_app()
+    response = TestClient(app).get("/work", params={"_profile": "1"})
+    assert response.json() == {"kind": "own"}
+    assert "x-profile-samples" not in response.headers
@@ -0,0 +1,20 @@
+import numpy as np
+from app.services.quantiles import KLLSketch
+
+
+def sketch(values, seed):
+    result = KLLSketch(k=64, seed=seed)
+    result.update(values)
+    return result
+
+
+def test_merge_is_deterministic_and_leaves_inputs_untouched():
+    rng = np.random.default_rng(7)
+    a = sketch(rng.lognormal(size=20000), seed=1)
+    b = sketch(rng.lognormal(size=20000), seed=2)
+    state = a._rng.bit_generator.state
+
+    medians = {a.merge(b).quantile(0.5) for _ in range(4)}
+
+    assert len(medians) == 1
+    assert a._rng.bit_generator.state == state
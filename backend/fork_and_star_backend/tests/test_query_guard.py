@@ -0,0 +1,119 @@
+import concurrent.futures
+from types import SimpleNamespace
+import pytest
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.query_guard import GuardedClient, QueryBudget, QueryBudgetExceeded, load_budgets
+from app.services.request_context import RequestState, current_endpoint, current_request
+
+ENDPOINT = "/recommendations/maps/discovery"
+
+
+class FakeBigQuery:
+    """Dry runs report `bytes`; real runs return `rows`, or time out while `slow` is set"""
+
+    def __init__(self, bytes_processed=100):
+        self.bytes = bytes_processed
+        self.slow = False
+        self.dry_runs = 0
+        self.runs = 0
+
+    def query(self, sql, job_config=None, timeout=None, **kwargs):
+        if job_config is not None and job_config.dry_run:
+            self.dry_runs += 1
+            return SimpleNamespace(total_bytes_processed=self.bytes)
+        self.runs += 1
+        rows = [{"run": self.runs}]
+
+        def result(timeout=None, **kwargs):
+            if self.slow:
+                raise concurrent.futures.TimeoutError()
+            return rows
+
+        return SimpleNamespace(result=result, cancel=lambda: None, total_bytes_processed=self.bytes, cache_hit=False, slot_millis=1)
+
+
+@pytest.fixture
+def endpoint():
+    # Results are only remembered for queries made while serving a request
+    endpoint_token = current_endpoint.set(ENDPOINT)
+    request_token = current_request.set(RequestState())
+    yield ENDPOINT
+    current_request.reset(request_token)
+    current_endpoint.reset(endpoint_token)
+
+
+def guarded(bigquery, **budget):
+    return GuardedClient(bigquery, budgets={ENDPOINT: QueryBudget(**budget)}, breaker=CircuitBreaker())
+
+
+def test_load_budgets_overlays_json_and_validates():
+    budgets = load_budgets('{"/a/*": {"max_bytes": 10, "policy": "cached"}, "*": {"max_seconds": 5}}')
+    assert budgets["/a/*"] == QueryBudget(max_bytes=10, policy="cached")
+    assert budgets["*"].max_seconds == 5
+    assert load_budgets('{"*": null}') == {}
+    with pytest.raises(ValueError, match="Invalid policy"):
+        load_budgets('{"*": {"policy": "ignore"}}')
+    with pytest.raises(ValueError, match="not valid JSON"):
+        load_budgets("{")
+
+
+def test_budget_for_prefers_exact_then_glob_then_wildcard():
+    exact, glob, fallback = QueryBudget(max_bytes=1), QueryBudget(max_bytes=2), QueryBudget(max_bytes=3)
+    client = GuardedClient(None, budgets={"/a/b": exact, "/a/*": glob, "*": fallback})
+    assert client.budget_for("/a/b") is exact
+    assert client.budget_for("/a/c") is glob
+    assert client.budget_for("/z") is fallback
+    assert GuardedClient(None, budgets={"/a/*": glob}).budget_for("/z") is None
+
+
+def test_within_budget_runs_and_caches_the_estimate(endpoint):
+    bigquery = FakeBigQuery(bytes_processed=100)
+    client = guarded(bigquery, max_bytes=1000)
+    assert client.query("SELECT 1").result() == [{"run": 1}]
+    client.query("SELECT 1")
+    assert bigquery.dry_runs == 1
+    assert bigquery.runs == 2
+
+
+def test_reject_policy_returns_422_before_running(endpoint):
+    bigquery = FakeBigQuery(bytes_processed=10 ** 12)
+    with pytest.raises(QueryBudgetExceeded) as error:
+        guarded(bigquery, max_bytes=1000).query("SELECT 1")
+    assert error.value.status_code == 422
+    assert bigquery.runs == 0
+
+
+def test_require_filters_policy_asks_for_cheaper_parameters(endpoint):
+    bigquery = FakeBigQuery(bytes_processed=10 ** 12)
+    with pytest.raises(QueryBudgetExceeded) as error:
+        guarded(bigquery, max_bytes=1000, policy="require_filters").query("SELECT 1")
+    assert error.value.status_code == 422
+    assert "Retry with cheaper parameters" in error.value.detail
+
+
+def test_cached_policy_fills_once_then_serves_the_last_result(endpoint):
+    bigquery = FakeBigQuery(bytes_processed=10 ** 12)
+    client = guarded(bigquery, max_bytes=1000, policy="cached")
+    first = client.query("SELECT 1")
+    second = client.query("SELECT 1")
+    assert bigquery.runs == 1
+    assert second.from_cache
+    assert second.result() == first.result()
+
+
+def test_latency_budget_rejects_with_504(endpoint):
+    bigquery = FakeBigQuery()
+    bigquery.slow = True
+    with pytest.raises(QueryBudgetExceeded) as error:
+        guarded(bigquery, max_seconds=1).query("SELECT 1")
+    assert error.value.status_code == 504
+
+
+def test_latency_budget_falls_back_to_cached_result(endpoint):
+    bigquery = FakeBigQuery()
+    client = guarded(bigquery, max_seconds=1, policy="cached")
+    fresh = client.query("SELECT 1").result()
+    bigquery.slow = True
+    fallback = client.query("SELECT 1")
+    assert fallback.from_cache
+    assert fallback.result() == fresh
@@ -0,0 +1,43 @@
+from google.cloud import bigquery
+from app.services.query_stats import QueryStats, fingerprint, normalize_sql
+
+
+def test_normalize_sql_keeps_the_shape_only():
+    sql = """
+        SELECT name -- the label
+        FROM `project.dataset.table`
+        WHERE country = 'France' AND stars >= 2.5 AND id IN (1, 2, 3)
+        /* paging */ LIMIT @limit
+    """
+    assert normalize_sql(sql) == "SELECT name FROM `project.dataset.table` WHERE country = ? AND stars >= ? AND id IN (?+) LIMIT ?"
+    assert normalize_sql("SELECT 1 FROM t WHERE id IN (7, 8)") == normalize_sql("SELECT 2 FROM t WHERE id IN (9,10,11)")
+
+
+def test_queries_with_the_same_shape_share_a_fingerprint():
+    stats = QueryStats(slow_ms=100)
+    stats.record("SELECT * FROM t WHERE id = 1", None, "/a", 0.01, bytes_processed=10)
+    stats.record("SELECT *  FROM t WHERE id = 2", None, "/b", 0.02, bytes_processed=30, failed=True)
+    stats.record("SELECT * FROM u", None, "/a", 0.5)
+
+    summary = stats.summary(sort="count")
+    assert summary[0]["fingerprint"] == fingerprint("SELECT * FROM t WHERE id = ?")
+    assert (summary[0]["count"], summary[0]["errors"], summary[0]["bytes"]["total"]) == (2, 1, 40)
+    assert summary[0]["endpoints"] == {"/a": 1, "/b": 1}
+    assert stats.summary(sort="total_time")[0]["sql"] == "SELECT * FROM u"
+
+
+def test_slow_queries_are_logged_with_parameters():
+    stats = QueryStats(slow_ms=100, capacity=2)
+    config = bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter("limit", "INT64", 5)])
+    stats.record("SELECT 1 LIMIT @limit", config, "/a", 0.05)
+    stats.record("SELECT 2 LIMIT @limit", config, "/a", 0.2)
+    (entry,) = stats.slow_queries()
+    assert entry["parameters"] == {"limit": 5}
+    assert entry["sql"] == "SELECT 2 LIMIT @limit"
+
+
+def test_least_recently_seen_fingerprint_is_dropped():
+    stats = QueryStats(max_fingerprints=2)
+    for table in ("a", "b", "a", "c"):
+        stats.record(f"SELECT * FROM {table}", None, "/x", 0.01)
+    assert sorted(s["sql"] for s in stats.summary()) == ["SELECT * FROM a", "SELECT * FROM c"]
@@ -0,0 +1,75 @@
+import datetime
+from types import SimpleNamespace
+from app.services.readiness import ReadinessProbe
+from app.services.snapshot import SnapshotStore
+
+MODIFIED = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class FakeBigQuery:
+    """Table metadata plus the catalog query; either can be made to fail"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.modified = MODIFIED
+        self.metadata_error = None
+        self.query_error = None
+        self.queries = 0
+
+    def get_table(self, table):
+        if self.metadata_error:
+            raise self.metadata_error
+        return SimpleNamespace(num_rows=len(self.rows), modified=self.modified)
+
+    def query(self, sql, job_config=None, **kwargs):
+        if self.query_error:
+            raise self.query_error
+        self.queries += 1
+        return SimpleNamespace(result=lambda **kwargs: list(self.rows))
+
+
+def make_probe(rows):
+    bigquery = FakeBigQuery(rows)
+    return ReadinessProbe(bigquery, "catalog", SnapshotStore(bigquery, "catalog")), bigquery
+
+
+def test_ready_once_checked_and_warm(catalog_rows):
+    probe, bigquery = make_probe(catalog_rows)
+    assert not probe.status()["ready"]
+    probe.check()
+    status = probe.status()
+    assert status["ready"]
+    assert status["bigquery"]["num_rows"] == len(catalog_rows)
+    assert status["snapshot"]["version"] == 1
+    assert bigquery.queries == 1
+
+
+def test_failed_or_stale_checks_are_not_ready(catalog_rows):
+    probe, bigquery = make_probe(catalog_rows)
+    probe.check()
+    bigquery.metadata_error = RuntimeError("unreachable")
+    probe.check()
+    assert not probe.status()["ready"]
+    assert probe.status()["bigquery"]["error"] == "unreachable"
+
+    bigquery.metadata_error = None
+    probe.check()
+    probe.bigquery["checked_at"] -= 3 * probe.interval
+    assert not probe.fresh()
+
+
+def test_table_changes_reload_the_snapshot_and_failed_loads_keep_the_old_one(catalog_rows):
+    probe, bigquery = make_probe(catalog_rows)
+    probe.check()
+    probe.check()
+    assert probe.catalog.version == 1
+
+    bigquery.modified = MODIFIED + datetime.timedelta(hours=1)
+    bigquery.query_error = RuntimeError("quota")
+    probe.check()
+    assert probe.catalog.version == 1
+    assert probe.status()["ready"]
+
+    bigquery.query_error = None
+    probe.check()
+    assert probe.catalog.version == 2
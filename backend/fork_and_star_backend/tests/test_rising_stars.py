@@ -0,0 +1,60 @@
+import pytest
+from app.services.rising_stars import build_rising_star_features
+from app.services.snapshot import build_snapshot
+
+
+def _avg(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def reference_rising_stars(rows, current_star_max):
+    """The rising-stars query row by row: PERCENT_RANK over eligible momentum, weighted score, category"""
+    cluster_stars = {c: _avg([r["stars"] for r in rows if r["cluster"] == c]) for c in {r["cluster"] for r in rows}}
+    cluster_momentum = {c: _avg([r["momentum"] for r in rows if r["cluster"] == c]) for c in cluster_stars}
+    eligible = [
+        r for r in rows
+        if None not in (r["momentum"], r["stars"], r["score"]) and r["stars"] <= current_star_max
+    ]
+    predictions = []
+    for r in eligible:
+        below = sum(1 for other in eligible if other["momentum"] < r["momentum"])
+        percentile = below / (len(eligible) - 1) if len(eligible) > 1 else 0.0
+        ratio = r["score"] / r["stars"] if r["stars"] > 0 else 0.0
+        avg_stars = cluster_stars.get(r["cluster"]) if r["cluster"] is not None else None
+        avg_momentum = cluster_momentum.get(r["cluster"]) if r["cluster"] is not None else None
+        score = (
+            percentile * 0.4
+            + (0.3 if ratio > 20 else ratio / 20 * 0.3)
+            + (0.2 if avg_stars is not None and r["stars"] >= avg_stars else 0.1)
+            + (0.1 if avg_momentum is not None and r["momentum"] > avg_momentum else 0.05)
+        )
+        if percentile > 0.8 and ratio > 15:
+            category = "Very High Potential"
+        elif percentile > 0.6 and ratio > 10:
+            category = "High Potential"
+        elif percentile > 0.4 or ratio > 8:
+            category = "Medium Potential"
+        else:
+            continue
+        predictions.append({"id": r["id"], "rising_star_score": score, "potential_category": category, "momentum": r["momentum"]})
+    return sorted(predictions, key=lambda p: -p["rising_star_score"])
+
+
+@pytest.mark.parametrize("current_star_max", [1.0, 3.0, 5.0])
+def test_ranking_matches_the_rising_stars_query(market_rows, current_star_max):
+    features = build_rising_star_features(build_snapshot(market_rows, version=1))
+    expected = reference_rising_stars(market_rows, current_star_max)
+    assert expected
+    top = features.rank(current_star_max).top(len(market_rows))
+    assert [p["id"] for p in top] == [p["id"] for p in expected]
+    for actual, reference in zip(top, expected):
+        assert actual["rising_star_score"] == pytest.approx(reference["rising_star_score"])
+        assert actual["potential_category"] == reference["potential_category"]
+
+
+def test_momentum_threshold_filters_the_ranked_order(market_rows):
+    ranking = build_rising_star_features(build_snapshot(market_rows, version=1)).rank(3.0)
+    everyone = ranking.top(len(market_rows))
+    filtered = ranking.top(5, momentum_threshold=0.5)
+    assert [p["id"] for p in filtered] == [p["id"] for p in everyone if p["momentum"] >= 0.5][:5]
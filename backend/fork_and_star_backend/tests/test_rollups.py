@@ -0,0 +1,45 @@
+from collections import Counter
+from app.services.rollups import SORT_COLUMNS, build_rollups
+from app.services.snapshot import build_snapshot
+
+
+def _avg(values):
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 2) if values else None
+
+
+def test_country_rollup_matches_the_explore_queries(market_rows):
+    # A case variant of a label rolls up with it, like LOWER(Base_Country) = LOWER(@country)
+    for row in market_rows[::10]:
+        if row["country"] == "France":
+            row["country"] = "FRANCE"
+    rollup = build_rollups(build_snapshot(market_rows, version=1))["country"]
+    group = rollup.find("france")
+    members = [r for r in market_rows if r["country"].lower() == "france"]
+    assert {r["country"] for r in members} == {"France", "FRANCE"}
+
+    overview = rollup.overview(group)
+    assert overview["total_restaurants"] == len(members)
+    assert overview["cuisines_available"] == len({r["cuisine"] for r in members if r["cuisine"]})
+    assert overview["clusters_represented"] == len({r["cluster"] for r in members if r["cluster"] is not None})
+    assert overview["avg_stars"] == _avg([r["stars"] for r in members])
+    assert overview["avg_score"] == _avg([r["score"] for r in members])
+
+    cuisines = Counter(r["cuisine"] for r in members if r["cuisine"])
+    breakdown = rollup.breakdown_for(group)
+    assert [(b["cuisine"], b["restaurant_count"]) for b in breakdown] == sorted(cuisines.items(), key=lambda c: (-c[1], c[0]))[:10]
+    assert breakdown[0]["avg_stars"] == _avg([r["stars"] for r in members if r["cuisine"] == breakdown[0]["cuisine"]])
+
+    for sort_by, column in SORT_COLUMNS.items():
+        ranked = sorted((r for r in members if r[column] is not None), key=lambda r: -r[column])
+        assert [r["id"] for r in rollup.top_restaurants(group, sort_by, 5)] == [r["id"] for r in ranked[:5]]
+    assert rollup.find("Atlantis") is None
+
+
+def test_cuisine_rollup_breaks_down_by_country(market_rows):
+    rollup = build_rollups(build_snapshot(market_rows, version=1))["cuisine"]
+    group = rollup.find("NORDIC")
+    members = [r for r in market_rows if r["cuisine"] == "Nordic"]
+    assert rollup.overview(group)["cuisine"] == "Nordic"
+    assert rollup.overview(group)["countries_available"] == len({r["country"] for r in members})
+    assert sum(b["restaurant_count"] for b in rollup.breakdown_for(group)) == len(members)
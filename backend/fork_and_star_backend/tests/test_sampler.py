@@ -0,0 +1,22 @@
+import numpy as np
+from app.services.sampler import build_sampler
+from app.services.snapshot import build_snapshot
+
+
+def test_candidates_match_the_old_where_clause(catalog_rows):
+    sampler = build_sampler(build_snapshot(catalog_rows, version=1))
+    rows = sampler.candidates(cuisine="french", country="FRANCE", min_stars=1)
+    expected = [
+        i for i, r in enumerate(catalog_rows)
+        if r["cuisine"] == "French" and r["country"] == "France" and r["stars"] is not None and r["stars"] >= 1
+    ]
+    assert rows.tolist() == expected
+    assert sampler.candidates() is None
+
+
+def test_seeded_samples_are_distinct_and_reproducible(catalog_rows):
+    sampler = build_sampler(build_snapshot(catalog_rows, version=1))
+    first = sampler.sample(5, seed=42)
+    assert len(set(first.tolist())) == 5
+    assert np.array_equal(first, sampler.sample(5, seed=42))
+    assert len(sampler.sample(50, seed=1)) == len(catalog_rows)
@@ -0,0 +1,13 @@
+import pytest
+from app.schemas.restaurant import LIST_FIELDS, SEARCH_FIELDS, parse_fields
+
+
+def test_parse_fields_normalizes_known_columns():
+    assert parse_fields("name, id,NAME", LIST_FIELDS) == ["Name", "ID"]
+    assert parse_fields(None, LIST_FIELDS) == LIST_FIELDS
+    assert parse_fields(" ", SEARCH_FIELDS) == SEARCH_FIELDS
+
+
+def test_parse_fields_rejects_anything_but_column_names():
+    with pytest.raises(ValueError):
+        parse_fields("ID, (SELECT secret FROM other) AS Name", LIST_FIELDS)
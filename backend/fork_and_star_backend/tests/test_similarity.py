@@ -0,0 +1,44 @@
+import math
+from app.services.similarity import SIMILARITY_WEIGHTS, matrix_to_list, pairwise_difference, pairwise_similarity
+
+RESTAURANTS = [
+    {"country": "France", "cuisine": "French", "green_score": 0.8, "reputation": "Elite", "stars": 3.0},
+    {"country": "france ", "cuisine": "Nordic", "green_score": 0.2, "reputation": "Elite", "stars": None},
+    {"country": "Japan", "cuisine": "french", "green_score": None, "reputation": None, "stars": 1.0},
+    {"country": None, "cuisine": "", "green_score": 0.5, "reputation": "Rising", "stars": 2.0},
+]
+
+
+def same_label(a, b):
+    a, b = (v.strip().lower() if isinstance(v, str) else "" for v in (a, b))
+    return float(bool(a) and a == b)
+
+
+def reference_pair(a, b):
+    """One pair scored field by field"""
+    scores = {
+        "region": same_label(a["country"], b["country"]),
+        "cuisine": same_label(a["cuisine"], b["cuisine"]),
+        "green": None if a["green_score"] is None or b["green_score"] is None else 1 - abs(a["green_score"] - b["green_score"]),
+        "reputation": same_label(a["reputation"], b["reputation"]),
+    }
+    scores["overall"] = sum(weight * (scores[name] or 0.0) for name, weight in SIMILARITY_WEIGHTS.items())
+    return scores
+
+
+def test_matrices_match_pair_by_pair_scoring():
+    components = pairwise_similarity(RESTAURANTS)
+    for i, a in enumerate(RESTAURANTS):
+        for j, b in enumerate(RESTAURANTS):
+            for name, expected in reference_pair(a, b).items():
+                actual = components[name][i, j]
+                if expected is None:
+                    assert math.isnan(actual), (name, i, j)
+                else:
+                    assert math.isclose(actual, expected), (name, i, j)
+
+
+def test_differences_and_json_output_keep_missing_values_as_none():
+    difference = pairwise_difference(RESTAURANTS, "stars")
+    assert matrix_to_list(difference, digits=2)[0] == [0.0, None, 2.0, 1.0]
+    assert matrix_to_list(difference, digits=2)[1] == [None] * 4
@@ -0,0 +1,102 @@
+import datetime
+import os
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.services.snapshot import DataVersionMiddleware, SnapshotStore, build_snapshot
+from app.services.snapshot_disk import SnapshotDisk
+
+MODIFIED = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class FakeCatalog:
+    """Answers the catalog query with a fixed set of rows, counting how often it ran"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def query(self, sql, job_config=None, **kwargs):
+        self.queries += 1
+        return SimpleNamespace(result=lambda **kwargs: list(self.rows))
+
+
+def test_content_hash_follows_the_data_not_the_version(catalog_rows):
+    first = build_snapshot(catalog_rows, version=1)
+    restarted = build_snapshot(catalog_rows, version=1)
+    later = build_snapshot(catalog_rows, version=7)
+    assert first.content_hash == restarted.content_hash == later.content_hash
+
+    catalog_rows[0]["score"] += 1
+    assert build_snapshot(catalog_rows, version=1).content_hash != first.content_hash
+
+
+def test_refresh_if_modified_reloads_only_when_the_table_moves(catalog_rows):
+    client = FakeCatalog(catalog_rows)
+    store = SnapshotStore(client, "catalog")
+    assert not store.refresh_if_modified(MODIFIED)
+    assert store.version == 1
+    assert not store.refresh_if_modified(MODIFIED)
+    assert client.queries == 1
+
+    assert store.refresh_if_modified(MODIFIED + datetime.timedelta(hours=1))
+    assert store.version == 2
+    assert client.queries == 2
+
+
+def test_refresh_keeps_derived_structures_warm(catalog_rows):
+    store = SnapshotStore(FakeCatalog(catalog_rows), "catalog")
+    store.get().derived("ids", lambda snapshot: snapshot["id"].tolist())
+    refreshed = store.refresh()
+    assert "ids" in refreshed._derived
+
+
+def test_requests_stay_pinned_to_one_snapshot(catalog_rows):
+    store = SnapshotStore(FakeCatalog(catalog_rows), "catalog")
+    app = FastAPI()
+
+    @app.get("/versions")
+    def versions():
+        before = store.get().version
+        store.refresh()
+        return {"before": before, "after": store.get().version}
+
+    app.add_middleware(DataVersionMiddleware, store=store)
+    response = TestClient(app).get("/versions")
+    assert response.json() == {"before": 1, "after": 1}
+    assert response.headers["x-data-version"] == "1"
+    assert store.get().version == 2
+
+
+def test_disk_round_trip_preserves_the_snapshot(tmp_path, catalog_rows):
+    disk = SnapshotDisk(str(tmp_path))
+    snapshot = build_snapshot(catalog_rows, version=3)
+    manifest = disk.write(snapshot, MODIFIED)
+
+    assert disk.current()["version"] == 3
+    assert disk.source_modified(disk.current()) == MODIFIED
+    mapped = disk.read(manifest)
+    assert mapped.version == 3
+    assert mapped.loaded_at == snapshot.loaded_at
+    assert mapped.content_hash == snapshot.content_hash
+    assert mapped["cuisine"].categories.tolist() == snapshot["cuisine"].categories.tolist()
+
+
+def test_stores_sharing_a_disk_keep_versions_monotonic(tmp_path, catalog_rows):
+    first_client, second_client = FakeCatalog(catalog_rows), FakeCatalog(catalog_rows)
+    first = SnapshotStore(first_client, "catalog", disk=SnapshotDisk(str(tmp_path)))
+    second = SnapshotStore(second_client, "catalog", disk=SnapshotDisk(str(tmp_path)))
+
+    assert first.get().version == 1
+    # A second worker starting up maps the files the first one wrote
+    assert second.get().version == 1
+    assert second_client.queries == 0
+
+    later = MODIFIED + datetime.timedelta(hours=1)
+    assert first.refresh(MODIFIED).version == 2
+    assert second.refresh(later).version == 3
+    assert second_client.queries == 1
+    # The first worker picks up the newer version from disk instead of querying again
+    assert first.refresh(later).version == 3
+    assert first_client.queries == 2
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("v")) == ["v2", "v3"]
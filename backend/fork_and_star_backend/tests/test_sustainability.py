@@ -0,0 +1,84 @@
+from collections import defaultdict
+import pytest
+from app.services.snapshot import build_snapshot
+from app.services.sustainability import SustainabilityReport, build_sustainability_baseline
+
+
+def _avg(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _round(value, digits):
+    return None if value is None else round(value, digits)
+
+
+def reference_leaders(rows, dimension, min_green_score, limit, with_score):
+    """The country/cuisine green queries: HAVING restaurant_count >= 5 ORDER BY avg_green_score DESC"""
+    groups = defaultdict(list)
+    for r in rows:
+        if r[dimension] is not None and r["green"] is not None and r["green"] >= min_green_score:
+            groups[r[dimension]].append(r)
+    leaders = []
+    for label, members in groups.items():
+        if len(members) < 5:
+            continue
+        high = sum(1 for r in members if r["green"] > 0.7)
+        entry = {
+            dimension: label,
+            "restaurant_count": len(members),
+            "avg_green_score": round(_avg([r["green"] for r in members]), 3),
+            "avg_stars": _round(_avg([r["stars"] for r in members]), 2),
+        }
+        if with_score:
+            entry["avg_overall_score"] = round(_avg([r["score"] for r in members]), 2)
+        entry["high_green_restaurants"] = high
+        entry["green_percentage"] = round(high * 100.0 / len(members), 1)
+        leaders.append(entry)
+    return sorted(leaders, key=lambda e: (-e["avg_green_score"], e[dimension]))[:limit]
+
+
+def report(rows, min_green_score):
+    snapshot = build_snapshot(rows, version=1)
+    baseline = build_sustainability_baseline(snapshot)
+    return baseline, SustainabilityReport(snapshot, baseline, baseline.bucket(min_green_score))
+
+
+@pytest.mark.parametrize("min_green_score", [0.0, 0.35, 0.6])
+def test_leaders_and_top_green_match_the_queries(market_rows, min_green_score):
+    _, sustainability = report(market_rows, min_green_score)
+    assert sustainability.countries == reference_leaders(market_rows, "country", min_green_score, 15, with_score=True)
+    assert sustainability.cuisines == reference_leaders(market_rows, "cuisine", min_green_score, 10, with_score=False)
+
+    green = sorted((r for r in market_rows if r["green"] is not None and r["green"] >= min_green_score), key=lambda r: (-r["green"], r["id"]))
+    assert [r["id"] for r in sustainability.top_green(10)] == [r["id"] for r in green[:10]]
+
+
+def test_baseline_matches_the_threshold_free_queries(market_rows):
+    baseline, _ = report(market_rows, 0.0)
+    green = [r["green"] for r in market_rows if r["green"] is not None]
+    assert baseline.overall["total_restaurants"] == len(green)
+    assert baseline.overall["global_avg_green_score"] == round(sum(green) / len(green), 3)
+    assert baseline.overall["high_green_count"] == sum(1 for g in green if g > 0.6)
+
+    rated = [r for r in market_rows if r["green"] is not None and r["stars"] is not None]
+    very_high = [r for r in rated if r["green"] >= 0.8]
+    assert baseline.correlation[0]["green_level"] == "Very High Green (0.8+)"
+    assert baseline.correlation[0]["restaurant_count"] == len(very_high)
+    assert baseline.correlation[0]["avg_stars"] == round(_avg([r["stars"] for r in very_high]), 2)
+    assert sum(level["restaurant_count"] for level in baseline.correlation) == len(rated)
+
+    clusters = defaultdict(list)
+    for r in market_rows:
+        if r["cluster"] is not None and r["green"] is not None:
+            clusters[r["cluster"]].append(r["green"])
+    expected = sorted((c for c in clusters if len(clusters[c]) >= 10), key=lambda c: (-round(_avg(clusters[c]), 3), c))
+    assert [c["cluster_id"] for c in baseline.clusters] == expected[:10]
+
+
+def test_thresholds_with_the_same_rows_share_a_bucket(market_rows):
+    baseline, _ = report(market_rows, 0.0)
+    green = sorted({r["green"] for r in market_rows if r["green"] is not None})
+    assert baseline.bucket(green[-1] + 0.001) == 0
+    assert baseline.bucket(green[10]) == baseline.bucket(green[9] + 1e-9)
+    assert baseline.bucket(0.0) == sum(1 for r in market_rows if r["green"] is not None)
@@ -0,0 +1,55 @@
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.services.timing import RequestTimings, ServerTimingMiddleware, SlowRequestLog, current_timings, slow_requests, span
+
+
+def test_nested_spans_charge_each_stage_its_own_time():
+    timings = RequestTimings()
+    token = current_timings.set(timings)
+    try:
+        with span("outer"):
+            time.sleep(0.02)
+            with span("inner"):
+                time.sleep(0.03)
+    finally:
+        current_timings.reset(token)
+    # outer ran for 0.05s in all, 0.03s of it inside inner
+    assert 0.02 <= timings.stages["outer"] < 0.05
+    assert timings.stages["inner"] >= 0.03
+    assert sum(timings.stages.values()) * 1000 <= timings.total_ms()
+
+
+def test_span_outside_a_request_is_a_no_op():
+    with span("anything"):
+        pass
+    assert current_timings.get() is None
+
+
+def test_slow_request_log_keeps_the_newest_slow_entries():
+    log = SlowRequestLog(threshold_ms=100, capacity=2)
+    assert not log.offer({"total_ms": 50})
+    for total in (150, 200, 300):
+        assert log.offer({"total_ms": total})
+    assert [entry["total_ms"] for entry in log.recent()] == [300, 200]
+    assert log.recent(limit=1) == [{"total_ms": 300}]
+
+
+def test_middleware_sends_server_timing_and_records_slow_requests(monkeypatch):
+    app = FastAPI()
+
+    @app.get("/slow")
+    def slow():
+        with span("work"):
+            time.sleep(0.01)
+        return {}
+
+    app.add_middleware(ServerTimingMiddleware)
+    monkeypatch.setattr(slow_requests, "threshold_ms", 0)
+    slow_requests.clear()
+    response = TestClient(app).get("/slow?x=1")
+    assert response.headers["server-timing"].startswith("work;dur=")
+    assert "total;dur=" in response.headers["server-timing"]
+    entry = slow_requests.recent()[0]
+    assert (entry["endpoint"], entry["query"], entry["status"], entry["slow"]) == ("/slow", "x=1", 200, True)
+    slow_requests.clear()